@@ -0,0 +1,45 @@
+"""idempotency keys
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "005"
+down_revision = "004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "idempotency_keys",
+        sa.Column("restaurant_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("key", sa.String(255), nullable=False),
+        sa.Column("request_hash", sa.String(64), nullable=False),
+        sa.Column("status_code", sa.Integer(), nullable=False),
+        sa.Column("response", postgresql.JSONB(), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["restaurant_id"], ["restaurants.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("restaurant_id", "key"),
+    )
+    op.create_index(
+        "ix_idempotency_keys_restaurant_expires",
+        "idempotency_keys",
+        ["restaurant_id", "expires_at"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_idempotency_keys_restaurant_expires", "idempotency_keys")
+    op.drop_table("idempotency_keys")
@@ -0,0 +1,41 @@
+"""order line totals and order total
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "007"
+down_revision = "006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "order_items",
+        sa.Column("line_total", sa.Numeric(10, 2), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "orders",
+        sa.Column("total", sa.Numeric(10, 2), nullable=False, server_default="0"),
+    )
+    # Existing orders were priced at menu price only
+    op.execute("UPDATE order_items SET line_total = unit_price * quantity")
+    op.execute(
+        """
+        UPDATE orders SET total = t.total
+        FROM (
+            SELECT order_id, SUM(line_total) AS total FROM order_items GROUP BY order_id
+        ) AS t
+        WHERE orders.id = t.order_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("orders", "total")
+    op.drop_column("order_items", "line_total")
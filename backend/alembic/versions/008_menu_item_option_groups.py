@@ -0,0 +1,75 @@
+"""menu item <-> option group link table
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "008"
+down_revision = "007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "menu_item_option_groups",
+        sa.Column(
+            "menu_item_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("menu_items.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "option_group_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("option_groups.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("position", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.create_index(
+        "ix_menu_item_option_groups_option_group_id",
+        "menu_item_option_groups",
+        ["option_group_id"],
+    )
+    # Keep the array order; drop duplicates, ids of deleted groups and other restaurants' groups
+    op.execute(
+        """
+        INSERT INTO menu_item_option_groups (menu_item_id, option_group_id, position)
+        SELECT DISTINCT ON (mi.id, og.id) mi.id, og.id, e.ord - 1
+        FROM menu_items mi
+        CROSS JOIN LATERAL jsonb_array_elements_text(mi.option_group_ids) WITH ORDINALITY
+            AS e(group_id, ord)
+        JOIN option_groups og
+            ON og.id::text = e.group_id AND og.restaurant_id = mi.restaurant_id
+        WHERE jsonb_typeof(mi.option_group_ids) = 'array'
+        ORDER BY mi.id, og.id, e.ord
+        """
+    )
+    op.drop_column("menu_items", "option_group_ids")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "menu_items", sa.Column("option_group_ids", postgresql.JSONB(), nullable=True)
+    )
+    op.execute(
+        """
+        UPDATE menu_items SET option_group_ids = l.ids
+        FROM (
+            SELECT menu_item_id,
+                   jsonb_agg(option_group_id::text ORDER BY position, option_group_id) AS ids
+            FROM menu_item_option_groups GROUP BY menu_item_id
+        ) AS l
+        WHERE menu_items.id = l.menu_item_id
+        """
+    )
+    op.drop_index(
+        "ix_menu_item_option_groups_option_group_id", table_name="menu_item_option_groups"
+    )
+    op.drop_table("menu_item_option_groups")
@@ -0,0 +1,54 @@
+"""menu search: tsvector, trigram and tags GIN indexes
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "009"
+down_revision = "008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column("menu_items", sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True))
+    # Same expression as app.services.menu_search.refresh_search_vectors
+    op.execute(
+        """
+        UPDATE menu_items SET search_vector =
+            setweight(to_tsvector('simple', coalesce(label, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(array_to_string(tags, ' '), '')), 'B')
+            || setweight(to_tsvector('simple', coalesce((
+                SELECT string_agg(oi.name, ' ')
+                FROM option_items oi
+                JOIN menu_item_option_groups l ON l.option_group_id = oi.group_id
+                JOIN option_groups og ON og.id = oi.group_id
+                WHERE l.menu_item_id = menu_items.id AND oi.is_active AND og.is_active
+            ), '')), 'C')
+            || setweight(to_tsvector('simple', coalesce(description, '')), 'D')
+        """
+    )
+    op.create_index(
+        "ix_menu_items_search_vector", "menu_items", ["search_vector"], postgresql_using="gin"
+    )
+    op.create_index(
+        "ix_menu_items_label_trgm",
+        "menu_items",
+        ["label"],
+        postgresql_using="gin",
+        postgresql_ops={"label": "gin_trgm_ops"},
+    )
+    op.create_index("ix_menu_items_tags", "menu_items", ["tags"], postgresql_using="gin")
+
+
+def downgrade() -> None:
+    op.drop_index("ix_menu_items_tags", table_name="menu_items")
+    op.drop_index("ix_menu_items_label_trgm", table_name="menu_items")
+    op.drop_index("ix_menu_items_search_vector", table_name="menu_items")
+    op.drop_column("menu_items", "search_vector")
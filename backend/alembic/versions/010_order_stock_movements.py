@@ -0,0 +1,41 @@
+"""order stock movements: what each order took out of stock
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-17
+
+Orders already in a stock-consuming status have no rows: cancelling them restores
+nothing (their recipe at confirmation time is not known).
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "010"
+down_revision = "009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "order_stock_movements",
+        sa.Column("order_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("inventory_item_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("quantity", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["order_id"], ["orders.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(
+            ["inventory_item_id"], ["inventory_items.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("order_id", "inventory_item_id"),
+    )
+    op.create_index(
+        "ix_order_stock_movements_inventory_item_id",
+        "order_stock_movements",
+        ["inventory_item_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_order_stock_movements_inventory_item_id", "order_stock_movements")
+    op.drop_table("order_stock_movements")
@@ -2,12 +2,13 @@ from typing import Annotated
 from uuid import UUID
 
 from fastapi import Depends, HTTPException, status
-from sqlalchemy import select
+from sqlalchemy import and_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
 from app.core.security import CurrentUser, get_current_user
 from app.models.restaurant import Restaurant, RestaurantUser
+from app.services.membership import NOT_MEMBER, membership_cache
 
 
 async def _check_restaurant_access(
@@ -28,13 +29,31 @@ async def _check_restaurant_access(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Insufficient permissions",
         )
-    q = select(RestaurantUser).where(
-        RestaurantUser.restaurant_id == restaurant_id,
-        RestaurantUser.user_id == user.sub,
-        RestaurantUser.role.in_(["manager", "staff"]),
-    )
-    r = await db.execute(q)
-    if not r.scalar_one_or_none():
+    role = await membership_cache.get(restaurant_id, user.sub)
+    if role is None:
+        # One round trip for membership + restaurant existence; the Restaurant row lands
+        # in the session identity map, so get_restaurant_or_404 does not query again.
+        r = await db.execute(
+            select(Restaurant, RestaurantUser.role)
+            .outerjoin(
+                RestaurantUser,
+                and_(
+                    RestaurantUser.restaurant_id == Restaurant.id,
+                    RestaurantUser.user_id == user.sub,
+                    RestaurantUser.role.in_(["manager", "staff"]),
+                ),
+            )
+            .where(Restaurant.id == restaurant_id)
+        )
+        row = r.one_or_none()
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Access denied to this restaurant",
+            )
+        role = row.role or NOT_MEMBER
+        await membership_cache.set(restaurant_id, user.sub, role)
+    if role == NOT_MEMBER:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Access denied to this restaurant",
@@ -68,12 +87,29 @@ async def require_restaurant_staff(
     return db, user
 
 
+async def require_restaurant_manager_read(
+    restaurant_id: UUID,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    user: Annotated[CurrentUser, Depends(get_current_user)],
+) -> tuple[AsyncSession, CurrentUser]:
+    """require_restaurant_manager with a read-only session (list endpoints)."""
+    return await require_restaurant_manager(restaurant_id, db, user)
+
+
+async def require_restaurant_staff_read(
+    restaurant_id: UUID,
+    db: Annotated[AsyncSession, Depends(get_read_db)],
+    user: Annotated[CurrentUser, Depends(get_current_user)],
+) -> tuple[AsyncSession, CurrentUser]:
+    """require_restaurant_staff with a read-only session (list endpoints)."""
+    return await require_restaurant_staff(restaurant_id, db, user)
+
+
 async def get_restaurant_or_404(
     restaurant_id: UUID,
     db: AsyncSession,
 ) -> Restaurant:
-    r = await db.execute(select(Restaurant).where(Restaurant.id == restaurant_id))
-    obj = r.scalar_one_or_none()
+    obj = await db.get(Restaurant, restaurant_id)
     if not obj:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,26 +1,37 @@
 from typing import Annotated
-from uuid import UUID
+from uuid import UUID, uuid4
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
 from app.models.inventory import InventoryItem, InventoryLevel
 
-from app.api.deps import get_restaurant_or_404, require_restaurant_manager, require_restaurant_staff
+from app.api.deps import (
+    get_restaurant_or_404,
+    require_restaurant_manager,
+    require_restaurant_staff,
+    require_restaurant_staff_read,
+)
+from app.core.database import after_commit
 from app.core.security import CurrentUser
 from app.schemas.inventory import (
     AvailabilityResponse,
     InventoryItemCreate,
     InventoryItemRead,
+    InventoryLevelBulkItem,
+    InventoryLevelBulkResult,
     InventoryLevelRead,
     InventoryLevelUpsert,
 )
-from app.services.stock import get_availability
+from app.services.stock import availability_engines, get_availability
 
 router = APIRouter(prefix="/restaurants/{restaurant_id}", tags=["inventory"])
 
+MAX_BULK_LEVELS = 1000
+
 
 async def _get_inventory_item_or_404(
     db: AsyncSession, restaurant_id: UUID, item_id: UUID
@@ -41,7 +52,7 @@ async def _get_inventory_item_or_404(
 async def list_inventory_items(
     restaurant_id: UUID,
     db_user: Annotated[
-        tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff)
+        tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff_read)
     ],
 ) -> list:
     db, _ = db_user
@@ -79,6 +90,12 @@ async def create_inventory_item(
     level = InventoryLevel(inventory_item_id=item.id, quantity=0.0, in_stock=True)
     db.add(level)
     await db.flush()
+
+    async def _reset_availability() -> None:
+        # A new name may link ingredients that were not stock-tracked until now
+        availability_engines.invalidate(restaurant_id)
+
+    after_commit(db, _reset_availability)
     r = await db.execute(
         select(InventoryItem)
         .where(InventoryItem.id == item.id)
@@ -116,9 +133,90 @@ async def upsert_inventory_level(
     else:
         level.quantity = payload.quantity
         level.in_stock = payload.in_stock
+
+    async def _refresh_availability() -> None:
+        availability_engines.level_changed(
+            restaurant_id, inv.id, payload.quantity, payload.in_stock
+        )
+
+    after_commit(db, _refresh_availability)
     return level
 
 
+@router.put(
+    "/inventory/levels",
+    response_model=list[InventoryLevelBulkResult],
+)
+async def bulk_upsert_inventory_levels(
+    restaurant_id: UUID,
+    payload: list[InventoryLevelBulkItem],
+    db_user: Annotated[
+        tuple[AsyncSession, CurrentUser], Depends(require_restaurant_manager)
+    ],
+) -> list[InventoryLevelBulkResult]:
+    """Set many levels at once (e.g. a morning stock count): one ownership query, one upsert."""
+    db, _ = db_user
+    await get_restaurant_or_404(restaurant_id, db)
+    if len(payload) > MAX_BULK_LEVELS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BULK_LEVELS} levels per request",
+        )
+    # Last entry wins when an item is listed twice
+    wanted = {row.inventory_item_id: row for row in payload}
+    r = await db.execute(
+        select(InventoryItem.id).where(
+            InventoryItem.id.in_(wanted),
+            InventoryItem.restaurant_id == restaurant_id,
+        )
+    )
+    owned = set(r.scalars().all())
+
+    levels: dict[UUID, InventoryLevelRead] = {}
+    if owned:
+        stmt = pg_insert(InventoryLevel).values(
+            [
+                {
+                    "id": uuid4(),
+                    "inventory_item_id": item_id,
+                    "quantity": wanted[item_id].quantity,
+                    "in_stock": wanted[item_id].in_stock,
+                }
+                # Sorted so concurrent counts lock rows in the same order
+                for item_id in sorted(owned)
+            ]
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[InventoryLevel.inventory_item_id],
+            set_={"quantity": stmt.excluded.quantity, "in_stock": stmt.excluded.in_stock},
+        ).returning(
+            InventoryLevel.id,
+            InventoryLevel.inventory_item_id,
+            InventoryLevel.quantity,
+            InventoryLevel.in_stock,
+        )
+        r = await db.execute(stmt)
+        for row in r.mappings():
+            levels[row["inventory_item_id"]] = InventoryLevelRead(**row)
+
+        async def _refresh_availability() -> None:
+            for level in levels.values():
+                availability_engines.level_changed(
+                    restaurant_id, level.inventory_item_id, level.quantity, level.in_stock
+                )
+
+        after_commit(db, _refresh_availability)
+
+    return [
+        InventoryLevelBulkResult(
+            inventory_item_id=item_id,
+            status="updated" if item_id in levels else "not_found",
+            level=levels.get(item_id),
+        )
+        for item_id in wanted
+    ]
+
+
 @router.get("/availability", response_model=AvailabilityResponse)
 async def get_availability_endpoint(
     restaurant_id: UUID,
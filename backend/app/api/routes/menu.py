@@ -1,20 +1,39 @@
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.api.deps import get_restaurant_or_404, require_restaurant_manager, require_restaurant_staff
+from app.api.deps import (
+    get_restaurant_or_404,
+    require_restaurant_manager,
+    require_restaurant_manager_read,
+    require_restaurant_staff,
+    require_restaurant_staff_read,
+)
 from app.core.security import CurrentUser
-from app.models.menu import MenuCategory, OptionGroup, OptionItem, MenuItem
+from app.models.menu import MenuCategory, OptionGroup, OptionItem, MenuItem, MenuItemOptionGroup
 from app.schemas.menu import (
     MenuCategoryCreate, MenuCategoryRead, MenuCategoryUpdate,
     OptionGroupCreate, OptionGroupRead, OptionGroupUpdate, OptionGroupWithItems,
     OptionItemCreate, OptionItemRead, OptionItemUpdate,
-    MenuItemCreate, MenuItemRead, MenuItemUpdate, MenuItemFull,
+    MenuItemCreate, MenuItemRead, MenuItemUpdate, MenuItemFull, MenuItemSearchHit,
+    MenuSnapshot, MenuImportResult, MenuCloneRequest, MenuCloneResult,
+)
+from app.services.menu_clone import clone_menu
+from app.services.menu_import import (
+    MAX_IMPORT_BYTES,
+    export_menu,
+    import_menu,
+    parse_menu_csv,
+    parse_menu_json,
 )
+from app.services.menu_search import refresh_search_vectors, search_menu_items
+from app.services.menu_snapshot import get_menu_snapshot, menu_changed
+from app.services.order_matcher import order_matchers
 
 router = APIRouter(prefix="/restaurants/{restaurant_id}/menu", tags=["menu"])
 
@@ -62,10 +81,12 @@ async def _get_option_item_or_404(db: AsyncSession, group_id: UUID, option_id: U
 
 async def _get_menu_item_or_404(db: AsyncSession, restaurant_id: UUID, item_id: UUID) -> MenuItem:
     r = await db.execute(
-        select(MenuItem).where(
+        select(MenuItem)
+        .where(
             MenuItem.id == item_id,
             MenuItem.restaurant_id == restaurant_id,
         )
+        .options(selectinload(MenuItem.option_group_links))
     )
     m = r.scalar_one_or_none()
     if not m:
@@ -73,6 +94,129 @@ async def _get_menu_item_or_404(db: AsyncSession, restaurant_id: UUID, item_id:
     return m
 
 
+async def _option_group_links(
+    db: AsyncSession,
+    restaurant_id: UUID,
+    group_ids: list[UUID],
+    existing: list[MenuItemOptionGroup] | None = None,
+) -> list[MenuItemOptionGroup]:
+    """Links for `group_ids` in that order; the groups must belong to the restaurant."""
+    group_ids = list(dict.fromkeys(group_ids))
+    if group_ids:
+        r = await db.execute(
+            select(OptionGroup.id).where(
+                OptionGroup.id.in_(group_ids),
+                OptionGroup.restaurant_id == restaurant_id,
+            )
+        )
+        found = set(r.scalars())
+        missing = [str(g) for g in group_ids if g not in found]
+        if missing:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Option groups not found: {', '.join(missing)}",
+            )
+    reuse = {link.option_group_id: link for link in existing or []}
+    links = []
+    for position, gid in enumerate(group_ids):
+        link = reuse.get(gid) or MenuItemOptionGroup(option_group_id=gid)
+        link.position = position
+        links.append(link)
+    return links
+
+
+# ============ Snapshot ============
+
+@router.get(
+    "/snapshot",
+    response_model=MenuSnapshot,
+    responses={304: {"description": "Menu unchanged since the ETag in If-None-Match"}},
+)
+async def get_menu_snapshot_endpoint(
+    restaurant_id: UUID,
+    db_user: Annotated[tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff)],
+    if_none_match: Annotated[str | None, Header()] = None,
+) -> Response:
+    """Whole nested menu (categories -> items -> option groups -> options), compiled once per menu version"""
+    db, _ = db_user
+    restaurant = await get_restaurant_or_404(restaurant_id, db)
+    snap = await get_menu_snapshot(db, restaurant)
+    headers = {"ETag": snap.etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or snap.etag in (tag.strip() for tag in if_none_match.split(","))
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=snap.body, media_type="application/json", headers=headers)
+
+
+# ============ Import / Export ============
+
+@router.post(
+    "/import",
+    response_model=MenuImportResult,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "object", "title": "MenuImport"}},
+                "text/csv": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def import_menu_endpoint(
+    restaurant_id: UUID,
+    request: Request,
+    db_user: Annotated[tuple[AsyncSession, CurrentUser], Depends(require_restaurant_manager)],
+    dry_run: bool = False,
+) -> MenuImportResult:
+    """Create or update a whole menu from JSON or CSV (Content-Type: text/csv), matched by name, in one transaction; `dry_run=true` only returns the diff"""
+    db, _ = db_user
+    await get_restaurant_or_404(restaurant_id, db)
+    if int(request.headers.get("content-length") or 0) > MAX_IMPORT_BYTES:
+        raise HTTPException(status_code=413, detail="Menu file too large")
+    body = await request.body()
+    if len(body) > MAX_IMPORT_BYTES:
+        raise HTTPException(status_code=413, detail="Menu file too large")
+    if request.headers.get("content-type", "").startswith("text/csv"):
+        menu = parse_menu_csv(body)
+    else:
+        menu = parse_menu_json(body)
+    return await import_menu(db, restaurant_id, menu, dry_run=dry_run)
+
+
+@router.get("/export", response_class=StreamingResponse)
+async def export_menu_endpoint(
+    restaurant_id: UUID,
+    db_user: Annotated[tuple[AsyncSession, CurrentUser], Depends(require_restaurant_manager_read)],
+    fmt: Annotated[str, Query(alias="format", pattern="^(json|csv)$")] = "json",
+) -> StreamingResponse:
+    """Whole menu in the import format, streamed"""
+    db, _ = db_user
+    await get_restaurant_or_404(restaurant_id, db)
+    media_type = "text/csv; charset=utf-8" if fmt == "csv" else "application/json"
+    return StreamingResponse(
+        export_menu(restaurant_id, fmt),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="menu-{restaurant_id}.{fmt}"'},
+    )
+
+
+@router.post("/clone", response_model=MenuCloneResult, status_code=status.HTTP_201_CREATED)
+async def clone_menu_endpoint(
+    restaurant_id: UUID,
+    payload: MenuCloneRequest,
+    db_user: Annotated[tuple[AsyncSession, CurrentUser], Depends(require_restaurant_manager)],
+) -> MenuCloneResult:
+    """Copy the whole menu of another restaurant (managed by the caller) into this one, whose menu must be empty"""
+    db, user = db_user
+    await require_restaurant_manager(payload.source_restaurant_id, db, user)
+    await get_restaurant_or_404(restaurant_id, db)
+    await get_restaurant_or_404(payload.source_restaurant_id, db)
+    return await clone_menu(db, payload.source_restaurant_id, restaurant_id)
+
+
 # ============ Categories ============
 
 @router.post("/categories", response_model=MenuCategoryRead, status_code=status.HTTP_201_CREATED)
@@ -93,13 +237,15 @@ async def create_category(
     )
     db.add(cat)
     await db.flush()
+    version = await menu_changed(db, restaurant_id)
+    order_matchers.patch(db, restaurant_id, version, lambda m: m.set_category(cat))
     return cat
 
 
 @router.get("/categories", response_model=list[MenuCategoryRead])
 async def list_categories(
     restaurant_id: UUID,
-    db_user: Annotated[tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff)],
+    db_user: Annotated[tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff_read)],
 ) -> list[MenuCategory]:
     """List all menu categories"""
     db, _ = db_user
@@ -130,6 +276,8 @@ async def update_category(
         cat.display_order = payload.display_order
     if payload.is_active is not None:
         cat.is_active = payload.is_active
+    version = await menu_changed(db, restaurant_id)
+    order_matchers.patch(db, restaurant_id, version, lambda m: m.set_category(cat))
     return cat
 
 
@@ -143,6 +291,8 @@ async def delete_category(
     db, _ = db_user
     cat = await _get_category_or_404(db, restaurant_id, category_id)
     await db.delete(cat)
+    version = await menu_changed(db, restaurant_id)
+    order_matchers.patch(db, restaurant_id, version, lambda m: m.remove_category(category_id))
 
 
 # ============ Option Groups ============
@@ -166,13 +316,15 @@ async def create_option_group(
     )
     db.add(grp)
     await db.flush()
+    version = await menu_changed(db, restaurant_id)
+    order_matchers.patch(db, restaurant_id, version, lambda m: m.set_group(grp))
     return grp
 
 
 @router.get("/option-groups", response_model=list[OptionGroupWithItems])
 async def list_option_groups(
     restaurant_id: UUID,
-    db_user: Annotated[tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff)],
+    db_user: Annotated[tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff_read)],
 ) -> list[OptionGroup]:
     """List all option groups with their options"""
     db, _ = db_user
@@ -206,6 +358,9 @@ async def update_option_group(
         grp.max_select = payload.max_select
     if payload.is_active is not None:
         grp.is_active = payload.is_active
+        await refresh_search_vectors(db, restaurant_id, group_id=group_id)
+    version = await menu_changed(db, restaurant_id)
+    order_matchers.patch(db, restaurant_id, version, lambda m: m.set_group(grp))
     return grp
 
 
@@ -218,7 +373,16 @@ async def delete_option_group(
     """Delete an option group"""
     db, _ = db_user
     grp = await _get_option_group_or_404(db, restaurant_id, group_id)
+    r = await db.execute(
+        select(MenuItemOptionGroup.menu_item_id).where(
+            MenuItemOptionGroup.option_group_id == group_id
+        )
+    )
+    item_ids = list(r.scalars())
     await db.delete(grp)
+    await refresh_search_vectors(db, restaurant_id, item_ids)
+    version = await menu_changed(db, restaurant_id)
+    order_matchers.patch(db, restaurant_id, version, lambda m: m.remove_group(group_id))
 
 
 # ============ Option Items ============
@@ -240,7 +404,9 @@ async def create_option_item(
         is_active=payload.is_active,
     )
     db.add(opt)
-    await db.flush()
+    await refresh_search_vectors(db, restaurant_id, group_id=group_id)
+    version = await menu_changed(db, restaurant_id)
+    order_matchers.patch(db, restaurant_id, version, lambda m: m.set_option(opt))
     return opt
 
 
@@ -262,6 +428,10 @@ async def update_option_item(
         opt.price_extra = payload.price_extra
     if payload.is_active is not None:
         opt.is_active = payload.is_active
+    if payload.name is not None or payload.is_active is not None:
+        await refresh_search_vectors(db, restaurant_id, group_id=group_id)
+    version = await menu_changed(db, restaurant_id)
+    order_matchers.patch(db, restaurant_id, version, lambda m: m.set_option(opt))
     return opt
 
 
@@ -277,6 +447,9 @@ async def delete_option_item(
     await _get_option_group_or_404(db, restaurant_id, group_id)
     opt = await _get_option_item_or_404(db, group_id, option_id)
     await db.delete(opt)
+    await refresh_search_vectors(db, restaurant_id, group_id=group_id)
+    version = await menu_changed(db, restaurant_id)
+    order_matchers.patch(db, restaurant_id, version, lambda m: m.remove_option(option_id))
 
 
 # ============ Menu Items ============
@@ -290,12 +463,7 @@ async def create_menu_item(
     """Create a menu item (e.g., "Tacos XL", "Tenders 5 pièces")"""
     db, _ = db_user
     await get_restaurant_or_404(restaurant_id, db)
-    
-    # Convert option_group_ids to strings for JSONB storage
-    option_group_ids = None
-    if payload.option_group_ids:
-        option_group_ids = [str(gid) for gid in payload.option_group_ids]
-    
+    links = await _option_group_links(db, restaurant_id, payload.option_group_ids or [])
     item = MenuItem(
         restaurant_id=restaurant_id,
         category_id=payload.category_id,
@@ -307,36 +475,102 @@ async def create_menu_item(
         display_order=payload.display_order,
         tags=payload.tags,
         ingredients=payload.ingredients,
-        option_group_ids=option_group_ids,
+        option_group_links=links,
     )
     db.add(item)
     await db.flush()
+    await refresh_search_vectors(db, restaurant_id, [item.id])
+    version = await menu_changed(db, restaurant_id)
+    order_matchers.patch(db, restaurant_id, version, lambda m: m.set_item(item))
     return item
 
 
 @router.get("/items", response_model=list[MenuItemRead])
 async def list_menu_items(
     restaurant_id: UUID,
-    db_user: Annotated[tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff)],
+    db_user: Annotated[tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff_read)],
     category_id: UUID | None = None,
     active_only: bool = False,
+    tags: Annotated[list[str] | None, Query(description="Items having all these tags")] = None,
 ) -> list[MenuItem]:
-    """List menu items, optionally filtered by category"""
+    """List menu items, optionally filtered by category and tags"""
     db, _ = db_user
     await get_restaurant_or_404(restaurant_id, db)
     
-    query = select(MenuItem).where(MenuItem.restaurant_id == restaurant_id)
+    query = (
+        select(MenuItem)
+        .where(MenuItem.restaurant_id == restaurant_id)
+        .options(selectinload(MenuItem.option_group_links))
+    )
     
     if category_id:
         query = query.where(MenuItem.category_id == category_id)
     if active_only:
         query = query.where(MenuItem.is_active == True)
+    if tags:
+        query = query.where(MenuItem.tags.contains(tags))
     
     query = query.order_by(MenuItem.display_order, MenuItem.label)
     r = await db.execute(query)
     return list(r.scalars().all())
 
 
+@router.get("/items/search", response_model=list[MenuItemSearchHit])
+async def search_menu_items_endpoint(
+    restaurant_id: UUID,
+    response: Response,
+    db_user: Annotated[tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff_read)],
+    q: Annotated[str | None, Query(max_length=200, description="Words or word prefixes; typos tolerated on labels")] = None,
+    tags: Annotated[list[str] | None, Query(description="Items having all these tags")] = None,
+    active_only: bool = True,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+) -> list[MenuItemSearchHit]:
+    """
+    Search menu items by label, tags, option names and description, best match first.
+    The total number of matches is returned in the X-Total-Count header.
+    """
+    db, _ = db_user
+    await get_restaurant_or_404(restaurant_id, db)
+    total, hits = await search_menu_items(
+        db, restaurant_id, q=q, tags=tags, active_only=active_only, offset=offset, limit=limit
+    )
+    response.headers["X-Total-Count"] = str(total)
+    return [
+        MenuItemSearchHit(**MenuItemRead.model_validate(mi).__dict__, rank=rank)
+        for mi, rank in hits
+    ]
+
+
+@router.get("/items/full", response_model=list[MenuItemFull])
+async def list_menu_items_full(
+    restaurant_id: UUID,
+    db_user: Annotated[tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff_read)],
+    category_id: UUID | None = None,
+    active_only: bool = False,
+) -> list[MenuItem]:
+    """List menu items with their category and option groups (with options); one query per level"""
+    db, _ = db_user
+    await get_restaurant_or_404(restaurant_id, db)
+    query = (
+        select(MenuItem)
+        .where(MenuItem.restaurant_id == restaurant_id)
+        .options(
+            selectinload(MenuItem.category),
+            selectinload(MenuItem.option_group_links)
+            .selectinload(MenuItemOptionGroup.option_group)
+            .selectinload(OptionGroup.options),
+        )
+    )
+    if category_id:
+        query = query.where(MenuItem.category_id == category_id)
+    if active_only:
+        query = query.where(MenuItem.is_active == True)
+    query = query.order_by(MenuItem.display_order, MenuItem.label)
+    r = await db.execute(query)
+    return list(r.scalars().all())
+
+
 @router.get("/items/{item_id}", response_model=MenuItemRead)
 async def get_menu_item(
     restaurant_id: UUID,
@@ -378,8 +612,13 @@ async def update_menu_item(
     if payload.category_id is not None:
         item.category_id = payload.category_id
     if payload.option_group_ids is not None:
-        item.option_group_ids = [str(gid) for gid in payload.option_group_ids]
+        item.option_group_links = await _option_group_links(
+            db, restaurant_id, payload.option_group_ids, item.option_group_links
+        )
     
+    await refresh_search_vectors(db, restaurant_id, [item.id])
+    version = await menu_changed(db, restaurant_id)
+    order_matchers.patch(db, restaurant_id, version, lambda m: m.set_item(item))
     return item
 
 
@@ -393,3 +632,5 @@ async def delete_menu_item(
     db, _ = db_user
     item = await _get_menu_item_or_404(db, restaurant_id, item_id)
     await db.delete(item)
+    version = await menu_changed(db, restaurant_id)
+    order_matchers.patch(db, restaurant_id, version, lambda m: m.remove_item(item_id))
@@ -1,19 +1,54 @@
+import asyncio
+import base64
+import contextlib
+import json
+import re
+from collections.abc import AsyncIterator
+from datetime import datetime
 from typing import Annotated
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, Header, Query, status
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from app.api.deps import get_restaurant_or_404, require_restaurant_staff
+from app.api.deps import (
+    get_restaurant_or_404,
+    require_restaurant_staff,
+    require_restaurant_staff_read,
+)
 from app.core.security import CurrentUser
 from app.models.order import Order
-from app.schemas.order import OrderCreate, OrderList, OrderRead, OrderStatusUpdate
-from app.services.ordering import create_order, update_order_status
+from app.schemas.order import (
+    OrderBulkStatusResult,
+    OrderBulkStatusUpdate,
+    OrderCreate,
+    OrderDraft,
+    OrderDraftLine,
+    OrderList,
+    OrderParseRequest,
+    OrderRead,
+    OrderStatusUpdate,
+)
+from app.services.events import OrderEvent, order_events
+from app.services.idempotency import (
+    claim_idempotency_key,
+    request_fingerprint,
+    store_idempotent_response,
+)
+from app.services.order_matcher import get_order_matcher
+from app.services.ordering import (
+    bulk_update_order_status,
+    create_order,
+    update_order_status,
+)
 
 router = APIRouter(prefix="/restaurants/{restaurant_id}/orders", tags=["orders"])
 
+SSE_KEEPALIVE_SECONDS = 15
+
 
 async def _get_order_or_404(
     db: AsyncSession, restaurant_id: UUID, order_id: UUID
@@ -31,23 +66,56 @@ async def _get_order_or_404(
     return o
 
 
+def _encode_cursor(order: Order) -> str:
+    raw = f"{order.created_at.isoformat()}|{order.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    from fastapi import HTTPException
+
+    try:
+        created_at, order_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), UUID(order_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
 @router.get("", response_model=OrderList)
 async def list_orders(
     restaurant_id: UUID,
     db_user: Annotated[
-        tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff)
+        tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff_read)
     ],
+    status_in: Annotated[list[str] | None, Query(alias="status")] = None,
+    created_after: datetime | None = None,
+    created_before: datetime | None = None,
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=200)] = 50,
 ) -> dict:
+    """Newest orders first, paginated by keyset on (created_at, id): pass `next_cursor` back as `cursor`."""
     db, _ = db_user
     await get_restaurant_or_404(restaurant_id, db)
+    q = select(Order).where(Order.restaurant_id == restaurant_id)
+    if status_in:
+        q = q.where(Order.status.in_(status_in))
+    if created_after is not None:
+        q = q.where(Order.created_at >= created_after)
+    if created_before is not None:
+        q = q.where(Order.created_at < created_before)
+    if cursor:
+        q = q.where(tuple_(Order.created_at, Order.id) < tuple_(*_decode_cursor(cursor)))
     r = await db.execute(
-        select(Order)
-        .where(Order.restaurant_id == restaurant_id)
-        .options(selectinload(Order.items))
-        .order_by(Order.id.desc())
+        q.options(selectinload(Order.items))
+        .order_by(Order.created_at.desc(), Order.id.desc())
+        .limit(limit + 1)
     )
     orders = list(r.scalars().all())
-    return {"orders": orders}
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = _encode_cursor(orders[-1])
+    return {"orders": orders, "next_cursor": next_cursor}
 
 
 @router.post("", response_model=OrderRead, status_code=status.HTTP_201_CREATED)
@@ -57,17 +125,112 @@ async def create_order_endpoint(
     db_user: Annotated[
         tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff)
     ],
-) -> Order:
+    idempotency_key: Annotated[str | None, Header(min_length=1, max_length=255)] = None,
+) -> Order | JSONResponse:
+    """Create a draft order. Retries sent with the same Idempotency-Key (per restaurant)
+    get the first response back instead of creating another order."""
     db, _ = db_user
     await get_restaurant_or_404(restaurant_id, db)
+    if idempotency_key is None:
+        return await create_order(db, restaurant_id, payload)
+
+    request_hash = request_fingerprint(payload)
+    stored = await claim_idempotency_key(db, restaurant_id, idempotency_key, request_hash)
+    if stored is not None:
+        return JSONResponse(
+            stored.response,
+            status_code=stored.status_code,
+            headers={"Idempotent-Replayed": "true"},
+        )
     order = await create_order(db, restaurant_id, payload)
-    await db.refresh(order)
-    r = await db.execute(
-        select(Order)
-        .where(Order.id == order.id)
-        .options(selectinload(Order.items))
+    await store_idempotent_response(
+        db,
+        restaurant_id,
+        idempotency_key,
+        request_hash,
+        status.HTTP_201_CREATED,
+        OrderRead.model_validate(order).model_dump(mode="json"),
+    )
+    return order
+
+
+@router.post("/parse", response_model=OrderDraft)
+async def parse_order(
+    restaurant_id: UUID,
+    payload: OrderParseRequest,
+    db_user: Annotated[
+        tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff_read)
+    ],
+) -> OrderDraft:
+    """Read a typed or spoken order ("2 tacos XL poulet, un coca") into a draft payload
+    for POST /orders. Nothing is created; options are not checked against group rules."""
+    db, _ = db_user
+    await get_restaurant_or_404(restaurant_id, db)
+    matcher = await get_order_matcher(db, restaurant_id)
+    result = matcher.match(payload.text)
+    return OrderDraft(
+        items=[
+            OrderDraftLine(
+                menu_item_id=line.menu_item_id,
+                quantity=line.quantity,
+                option_ids=line.option_ids,
+                label=line.label,
+                options=line.options,
+                matched_text=line.matched_text,
+                alternatives=line.alternatives,
+            )
+            for line in result.lines
+        ],
+        unmatched=result.unmatched,
+    )
+
+
+async def _sse(events: AsyncIterator[OrderEvent]) -> AsyncIterator[str]:
+    """Format events as SSE, emitting a comment line when the stream is idle."""
+    pending: asyncio.Future | None = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(anext(events))
+            done, _ = await asyncio.wait({pending}, timeout=SSE_KEEPALIVE_SECONDS)
+            if not done:
+                yield ": keepalive\n\n"
+                continue
+            task, pending = pending, None
+            try:
+                event = task.result()
+            except StopAsyncIteration:
+                return
+            yield f"id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data)}\n\n"
+    finally:
+        if pending is not None:
+            pending.cancel()
+            with contextlib.suppress(BaseException):
+                await pending
+        await events.aclose()
+
+
+@router.get("/events")
+async def stream_order_events(
+    restaurant_id: UUID,
+    db_user: Annotated[
+        tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff)
+    ],
+    last_event_id: Annotated[str | None, Header()] = None,
+) -> StreamingResponse:
+    """Server-Sent Events stream of order changes; resumes after the `Last-Event-ID` header."""
+    db, _ = db_user
+    await get_restaurant_or_404(restaurant_id, db)
+    # Access is checked; don't hold a pooled connection for the lifetime of the stream
+    await db.close()
+    if last_event_id and not re.fullmatch(r"\d+-\d+", last_event_id):
+        last_event_id = None
+    return StreamingResponse(
+        _sse(order_events.subscribe(restaurant_id, last_event_id)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    return r.scalars().one()
+
 
 @router.get("/{order_id}", response_model=OrderRead)
 async def get_order(
@@ -81,6 +244,19 @@ async def get_order(
     return await _get_order_or_404(db, restaurant_id, order_id)
 
 
+@router.patch("/status", response_model=OrderBulkStatusResult)
+async def bulk_update_order_status_endpoint(
+    restaurant_id: UUID,
+    payload: OrderBulkStatusUpdate,
+    db_user: Annotated[
+        tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff)
+    ],
+) -> OrderBulkStatusResult:
+    """Move many orders to one status (e.g. a whole table to ready) in one statement."""
+    db, _ = db_user
+    return await bulk_update_order_status(db, restaurant_id, payload)
+
+
 @router.patch("/{order_id}/status", response_model=OrderRead)
 async def update_order_status_endpoint(
     restaurant_id: UUID,
@@ -89,14 +265,6 @@ async def update_order_status_endpoint(
     db_user: Annotated[
         tuple[AsyncSession, CurrentUser], Depends(require_restaurant_staff)
     ],
-) -> Order:
+) -> OrderRead:
     db, _ = db_user
-    await get_restaurant_or_404(restaurant_id, db)
-    order = await update_order_status(db, restaurant_id, order_id, payload.status)
-    await db.refresh(order)
-    r = await db.execute(
-        select(Order)
-        .where(Order.id == order.id)
-        .options(selectinload(Order.items))
-    )
-    return r.scalars().one()
+    return await update_order_status(db, restaurant_id, order_id, payload.status)
@@ -1,19 +1,75 @@
 from typing import Annotated
-from uuid import UUID
+from uuid import UUID, uuid4
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_restaurant_or_404, require_restaurant_manager, require_restaurant_staff
-from app.core.database import get_db
+from app.api.deps import (
+    get_restaurant_or_404,
+    require_restaurant_manager,
+    require_restaurant_manager_read,
+    require_restaurant_staff,
+)
+from app.core.database import get_db, get_read_db
 from app.core.security import CurrentUser, RequirePlatformAdmin, get_current_user
 from app.models.restaurant import Restaurant, RestaurantUser
 from app.schemas.restaurant import RestaurantCreate, RestaurantRead, RestaurantUpdate
+from app.services.membership import membership_changed
 
 router = APIRouter(prefix="/restaurants", tags=["restaurants"])
 
 
+async def _reassign_members(
+    db: AsyncSession,
+    restaurant_id: UUID,
+    manager_user_ids: list[str] | None,
+    staff_user_ids: list[str] | None,
+) -> None:
+    """Replace the manager and/or staff lists, touching only the users that changed.
+
+    A given list replaces every user holding that role; a user can hold one role per
+    restaurant, and when a user appears in both lists staff wins.
+    """
+    r = await db.execute(
+        select(RestaurantUser.user_id, RestaurantUser.role).where(
+            RestaurantUser.restaurant_id == restaurant_id
+        )
+    )
+    current = dict(r.tuples().all())
+    desired = dict(current)
+    for role, user_ids in (("manager", manager_user_ids), ("staff", staff_user_ids)):
+        if user_ids is None:
+            continue
+        desired = {uid: rl for uid, rl in desired.items() if rl != role}
+        desired.update((uid, role) for uid in user_ids)
+
+    dropped = current.keys() - desired.keys()
+    upserts = {uid: role for uid, role in desired.items() if current.get(uid) != role}
+    if dropped:
+        await db.execute(
+            delete(RestaurantUser).where(
+                RestaurantUser.restaurant_id == restaurant_id,
+                RestaurantUser.user_id.in_(dropped),
+            )
+        )
+    if upserts:
+        stmt = pg_insert(RestaurantUser).values(
+            [
+                {"id": uuid4(), "restaurant_id": restaurant_id, "user_id": uid, "role": role}
+                for uid, role in sorted(upserts.items())
+            ]
+        )
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[RestaurantUser.restaurant_id, RestaurantUser.user_id],
+                set_={"role": stmt.excluded.role},
+            )
+        )
+    membership_changed(db, restaurant_id, dropped | upserts.keys())
+
+
 @router.post("", response_model=RestaurantRead, status_code=status.HTTP_201_CREATED)
 async def create_restaurant(
     payload: RestaurantCreate,
@@ -43,7 +99,7 @@ async def create_restaurant(
 
 @router.get("", response_model=list[RestaurantRead])
 async def list_restaurants(
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     user: Annotated[CurrentUser, Depends(get_current_user)],
 ) -> list[Restaurant]:
     """
@@ -80,7 +136,7 @@ async def get_restaurant(
 @router.get("/{restaurant_id}/managers", response_model=list[str])
 async def get_restaurant_managers(
     restaurant_id: UUID,
-    db: Annotated[AsyncSession, Depends(get_db)],
+    db: Annotated[AsyncSession, Depends(get_read_db)],
     user: Annotated[CurrentUser, Depends(RequirePlatformAdmin)],
 ) -> list[str]:
     """Get list of manager user IDs for a restaurant (admin only)."""
@@ -96,7 +152,7 @@ async def get_restaurant_managers(
 async def get_restaurant_staff(
     restaurant_id: UUID,
     db_user: Annotated[
-        tuple[AsyncSession, CurrentUser], Depends(require_restaurant_manager)
+        tuple[AsyncSession, CurrentUser], Depends(require_restaurant_manager_read)
     ],
 ) -> list[str]:
     """Get list of staff user IDs for a restaurant (admin or manager)."""
@@ -136,52 +192,18 @@ async def update_restaurant(
         obj.description = payload.description
     if payload.is_active is not None:
         obj.is_active = payload.is_active
+    if "order_transitions" in payload.model_fields_set:
+        obj.order_transitions = payload.order_transitions
     
     # Update managers (ONLY admin can do this)
-    if payload.manager_user_ids is not None:
-        if not is_admin:
-            raise HTTPException(
-                status_code=403,
-                detail="Only platform_admin can manage restaurant managers"
-            )
-        # Delete only managers for this restaurant
-        await db.execute(
-            delete(RestaurantUser).where(
-                RestaurantUser.restaurant_id == restaurant_id,
-                RestaurantUser.role == "manager"
-            )
+    if payload.manager_user_ids is not None and not is_admin:
+        raise HTTPException(
+            status_code=403,
+            detail="Only platform_admin can manage restaurant managers"
         )
-        # Add new managers (delete existing assignment first to avoid duplicates)
-        for uid in payload.manager_user_ids:
-            # Delete any existing assignment for this user
-            await db.execute(
-                delete(RestaurantUser).where(
-                    RestaurantUser.restaurant_id == restaurant_id,
-                    RestaurantUser.user_id == uid
-                )
-            )
-            ru = RestaurantUser(restaurant_id=restaurant_id, user_id=uid, role="manager")
-            db.add(ru)
-    
-    # Update staff (admin OR manager can do this)
-    if payload.staff_user_ids is not None:
-        # Delete only staff for this restaurant
-        await db.execute(
-            delete(RestaurantUser).where(
-                RestaurantUser.restaurant_id == restaurant_id,
-                RestaurantUser.role == "staff"
-            )
+    if payload.manager_user_ids is not None or payload.staff_user_ids is not None:
+        await _reassign_members(
+            db, restaurant_id, payload.manager_user_ids, payload.staff_user_ids
         )
-        # Add new staff (delete existing assignment first to avoid duplicates)
-        for uid in payload.staff_user_ids:
-            # Delete any existing assignment for this user
-            await db.execute(
-                delete(RestaurantUser).where(
-                    RestaurantUser.restaurant_id == restaurant_id,
-                    RestaurantUser.user_id == uid
-                )
-            )
-            ru = RestaurantUser(restaurant_id=restaurant_id, user_id=uid, role="staff")
-            db.add(ru)
-    
+
     return obj
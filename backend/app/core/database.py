@@ -1,15 +1,35 @@
-from collections.abc import AsyncGenerator
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import logging
+from collections.abc import AsyncGenerator, Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import DeclarativeBase
 
 from app.core.config import settings
 
-engine = create_async_engine(
-    settings.database_url,
-    echo=settings.environment == "development",
-    pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
+logger = logging.getLogger(__name__)
+
+
+def _create_engine(url: str) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=settings.environment == "development",
+        pool_pre_ping=True,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle=settings.db_pool_recycle,
+        pool_timeout=settings.db_pool_timeout,
+    )
+
+
+engine = _create_engine(settings.database_url)
+# Replica when configured, else the primary's pool
+read_engine = (
+    _create_engine(settings.database_read_url) if settings.database_read_url else engine
 )
 
 async_session_maker = async_sessionmaker(
@@ -20,11 +40,33 @@ async_session_maker = async_sessionmaker(
     autoflush=False,
 )
 
+# Transactions start as BEGIN READ ONLY (no extra round trip with asyncpg)
+read_session_maker = async_sessionmaker(
+    read_engine.execution_options(postgresql_readonly=True),
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autocommit=False,
+    autoflush=False,
+)
+
 
 class Base(DeclarativeBase):
     pass
 
 
+def after_commit(session: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """Run `callback` once the request's transaction has committed (cache invalidation, events)."""
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+async def _run_after_commit(session: AsyncSession) -> None:
+    for callback in session.info.pop("after_commit", []):
+        try:
+            await callback()
+        except Exception:
+            logger.exception("after_commit callback failed")
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
         try:
@@ -33,3 +75,13 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
         except Exception:
             await session.rollback()
             raise
+        await _run_after_commit(session)
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Session for handlers that only read: READ ONLY transaction, replica if configured.
+
+    Never committed; the transaction is rolled back when the session closes.
+    """
+    async with read_session_maker() as session:
+        yield session
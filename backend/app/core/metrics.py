@@ -0,0 +1,334 @@
+"""Prometheus text-format metrics, hand-rolled to keep the request path cheap.
+
+Each worker keeps its own counters and histograms (a bisect and two list increments per
+request). Every sample carries a `pid` label. With Redis enabled, each worker publishes
+its samples every `metrics_publish_interval` seconds, so whichever worker answers
+`/metrics` reports all live workers. Sum `without (pid)` in queries. When Redis is
+unavailable, `/metrics` still answers with the serving worker's own samples.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterable
+
+from redis.exceptions import RedisError
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.database import engine, read_engine
+from app.core.redis import get_redis
+from app.core.security import jwks_store, token_cache
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (sample name, labels, value)
+Sample = tuple[str, dict[str, str], float]
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, name: str, help_: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help_
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, labels: tuple[str, ...] = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in self._values.items():
+            yield self.name, dict(zip(self.labelnames, labels)), value
+
+
+class Histogram:
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        self.name = name
+        self.help = help_
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [count per bucket..., count above last bucket, sum]
+        self._series: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, labels: tuple[str, ...], value: float) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, series in self._series.items():
+            base = dict(zip(self.labelnames, labels))
+            total = 0
+            for bound, n in zip(self.buckets, series):
+                total += n
+                yield f"{self.name}_bucket", {**base, "le": str(bound)}, total
+            total += series[len(self.buckets)]
+            yield f"{self.name}_bucket", {**base, "le": "+Inf"}, total
+            yield f"{self.name}_sum", base, series[-1]
+            yield f"{self.name}_count", base, total
+
+
+class Gauge:
+    """Read at scrape time from `collect()`, which returns {labels: value}.
+
+    Also used for counters kept elsewhere (type_="counter"), e.g. cache hit counts.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_: str,
+        collect: Callable[[], dict[tuple[str, ...], float]],
+        labelnames: tuple[str, ...] = (),
+        type_: str = "gauge",
+    ) -> None:
+        self.name = name
+        self.help = help_
+        self.labelnames = labelnames
+        self.collect = collect
+        self.type = type_
+
+    def samples(self) -> Iterable[Sample]:
+        for labels, value in self.collect().items():
+            yield self.name, dict(zip(self.labelnames, labels)), value
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: list[Counter | Histogram | Gauge] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def collect(self) -> dict:
+        """This worker's families: {name: {"type", "help", "samples": [Sample, ...]}}."""
+        pid = str(os.getpid())
+        families = {}
+        for metric in self._metrics:
+            try:
+                samples = [(n, {**lbl, "pid": pid}, v) for n, lbl, v in metric.samples()]
+            except Exception:
+                logger.exception("Collecting metric %s failed", metric.name)
+                continue
+            families[metric.name] = {"type": metric.type, "help": metric.help, "samples": samples}
+        return families
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render(workers: Iterable[dict]) -> str:
+    """Merge per-worker families into one exposition (each family's samples grouped)."""
+    merged: dict[str, dict] = {}
+    for families in workers:
+        for name, family in families.items():
+            target = merged.setdefault(
+                name, {"type": family["type"], "help": family["help"], "samples": []}
+            )
+            target["samples"].extend(family["samples"])
+    lines: list[str] = []
+    for name, family in merged.items():
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        for sample_name, labels, value in family["samples"]:
+            label_str = ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items())
+            lines.append(f"{sample_name}{{{label_str}}} {value}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+_route_labels = ("method", "route", "status")
+if settings.metrics_per_restaurant:
+    _route_labels += ("restaurant_id",)
+
+request_latency = registry.register(
+    Histogram(
+        "orderlingo_http_request_duration_seconds",
+        "HTTP request latency by route template and status.",
+        _route_labels,
+    )
+)
+
+orders_created = registry.register(
+    Counter(
+        "orderlingo_orders_created_total",
+        "Orders created.",
+        ("restaurant_id",) if settings.metrics_per_restaurant else (),
+    )
+)
+
+metrics_redis_errors = registry.register(
+    Counter(
+        "orderlingo_metrics_redis_errors_total",
+        "Failed Redis calls while sharing metrics between workers, by operation.",
+        ("operation",),
+    )
+)
+
+
+def _pool_connections() -> dict[tuple[str, ...], float]:
+    engines = {"primary": engine}
+    if read_engine is not engine:
+        engines["read"] = read_engine
+    out: dict[tuple[str, ...], float] = {}
+    for name, eng in engines.items():
+        pool = eng.sync_engine.pool
+        out[(name, "checked_out")] = pool.checkedout()
+        out[(name, "checked_in")] = pool.checkedin()
+        out[(name, "overflow")] = max(pool.overflow(), 0)
+    return out
+
+
+registry.register(
+    Gauge(
+        "orderlingo_db_pool_connections",
+        "DB pool connections by state (overflow = connections beyond pool_size).",
+        _pool_connections,
+        ("engine", "state"),
+    )
+)
+registry.register(
+    Gauge(
+        "orderlingo_jwks_keys",
+        "Signing keys in the JWKS store.",
+        lambda: {(): len(jwks_store.kids)},
+    )
+)
+registry.register(
+    Gauge(
+        "orderlingo_jwks_expires_in_seconds",
+        "Seconds until the cached JWKS is stale.",
+        lambda: {(): jwks_store.expires_in},
+    )
+)
+registry.register(
+    Gauge(
+        "orderlingo_jwks_fetches_total",
+        "JWKS fetches from Keycloak.",
+        lambda: {(): jwks_store.fetches},
+        type_="counter",
+    )
+)
+registry.register(
+    Gauge(
+        "orderlingo_token_cache_entries",
+        "Verified tokens cached.",
+        lambda: {(): len(token_cache)},
+    )
+)
+registry.register(
+    Gauge(
+        "orderlingo_token_cache_lookups_total",
+        "Verified-token cache lookups by result.",
+        lambda: {("hit",): token_cache.hits, ("miss",): token_cache.misses},
+        ("result",),
+        type_="counter",
+    )
+)
+
+
+def restaurant_labels(restaurant_id) -> tuple[str, ...]:
+    """Label values for per-tenant metrics (empty unless metrics_per_restaurant)."""
+    return (str(restaurant_id),) if settings.metrics_per_restaurant else ()
+
+
+class MetricsMiddleware:
+    """Observes request latency; labels come from the matched route, not the raw path."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            labels = (
+                scope["method"],
+                getattr(route, "path", None) or "<unmatched>",
+                str(status_code),
+            )
+            if settings.metrics_per_restaurant:
+                labels += (str(scope.get("path_params", {}).get("restaurant_id", "")),)
+            request_latency.observe(labels, time.perf_counter() - start)
+
+
+def _worker_key(pid: str) -> str:
+    return f"metrics:worker:{pid}"
+
+
+async def _published_by_others(redis) -> list[dict]:
+    own = str(os.getpid())
+    pids = [p for p in await redis.smembers("metrics:workers") if p != own]
+    if not pids:
+        return []
+    raw = await redis.mget([_worker_key(p) for p in pids])
+    gone = [p for p, r in zip(pids, raw) if r is None]
+    if gone:
+        await redis.srem("metrics:workers", *gone)
+    return [json.loads(r) for r in raw if r is not None]
+
+
+async def collect_all() -> list[dict]:
+    """This worker's families, plus those other workers published to Redis."""
+    redis = get_redis()
+    others: list[dict] = []
+    if redis is not None:
+        try:
+            others = await _published_by_others(redis)
+        except RedisError:
+            metrics_redis_errors.inc(("collect",))
+            logger.warning(
+                "Reading published metrics failed, serving this worker's only", exc_info=True
+            )
+    return [registry.collect()] + others
+
+
+async def run_publisher() -> None:
+    """Background loop (Redis only): share this worker's samples with the others."""
+    redis = get_redis()
+    if redis is None:
+        return
+    pid = str(os.getpid())
+    interval = settings.metrics_publish_interval
+    while True:
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.set(_worker_key(pid), json.dumps(registry.collect()), ex=interval * 3)
+                pipe.sadd("metrics:workers", pid)
+                await pipe.execute()
+        except Exception:
+            metrics_redis_errors.inc(("publish",))
+            logger.exception("Publishing metrics failed")
+        await asyncio.sleep(interval)
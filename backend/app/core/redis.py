@@ -0,0 +1,22 @@
+from redis.asyncio import Redis
+
+from app.core.config import settings
+
+_client: Redis | None = None
+
+
+def get_redis() -> Redis | None:
+    """Shared Redis client, or None when Redis is disabled (in-process fallbacks apply)."""
+    global _client
+    if not settings.redis_enabled:
+        return None
+    if _client is None:
+        _client = Redis.from_url(settings.redis_url, decode_responses=True)
+    return _client
+
+
+async def close_redis() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
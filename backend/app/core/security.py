@@ -1,34 +1,145 @@
+import asyncio
+import hashlib
+import logging
+import time
 from typing import Annotated
 
 import httpx
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from jose import JWTError, jwk, jwt
+from jose.backends.base import Key
+from jose.exceptions import JWKError
 from pydantic import BaseModel
 
+from app.core.cache import TTLCache
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 http_bearer = HTTPBearer(auto_error=False)
 
 
-class JWKSCache:
-    """In-memory JWKS cache. Refresh on decode failure (e.g. key rotation)."""
+class JWKSUnavailable(Exception):
+    """No signing keys yet and the last fetch failed (retried after the minimum interval)."""
+
+
+class JWKSKeyStore:
+    """Keycloak signing keys, pre-constructed and indexed by `kid`.
+
+    Keys are considered fresh for `ttl` seconds; `run_refresher()` (started from the
+    app lifespan) refetches them `refresh_margin` seconds before they expire.
+    Concurrent misses share a single in-flight fetch over one pooled client, and an
+    unknown `kid` triggers at most one refetch per `min_refresh_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        jwks_uri: str,
+        ttl: float = 600,
+        refresh_margin: float = 60,
+        min_refresh_interval: float = 10,
+        client: httpx.AsyncClient | None = None,
+    ) -> None:
+        self.jwks_uri = jwks_uri
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.min_refresh_interval = min_refresh_interval
+        self.fetches = 0
+        self._client = client
+        self._keys: dict[str, tuple[str | None, Key]] = {}
+        self._expires_at = 0.0
+        self._last_fetch = float("-inf")
+        self._last_error: Exception | None = None
+        self._inflight: asyncio.Future | None = None
+
+    @property
+    def kids(self) -> list[str]:
+        return list(self._keys)
+
+    @property
+    def expires_in(self) -> float:
+        """Seconds until the cached key set is stale (negative once it is)."""
+        return self._expires_at - time.monotonic()
 
-    _keys: dict | None = None
+    def load(self, jwks: dict) -> None:
+        """Replace the key set from a JWKS document; tokens signed by dropped keys are evicted."""
+        keys: dict[str, tuple[str | None, Key]] = {}
+        for k in jwks.get("keys", []):
+            kid = k.get("kid")
+            if not kid or k.get("use", "sig") != "sig":
+                continue
+            try:
+                keys[kid] = (k.get("alg"), jwk.construct(k, k.get("alg", "RS256")))
+            except JWKError:
+                logger.warning("Skipping unusable JWKS key %s", kid)
+        removed = self._keys.keys() - keys.keys()
+        self._keys = keys
+        self._expires_at = time.monotonic() + self.ttl
+        if removed:
+            token_cache.discard_where(lambda _, entry: entry[0] in removed)
 
-    @classmethod
-    async def get_keys(cls) -> dict:
-        if cls._keys is not None:
-            return cls._keys
-        async with httpx.AsyncClient() as client:
-            r = await client.get(settings.keycloak_jwks_uri)
+    async def get_key(self, kid: str | None) -> tuple[str | None, Key] | None:
+        if time.monotonic() >= self._expires_at:
+            await self.refresh()
+        entry = self._keys.get(kid)
+        if entry is None and time.monotonic() - self._last_fetch >= self.min_refresh_interval:
+            await self.refresh()
+            entry = self._keys.get(kid)
+        if not self._keys and self._last_error is not None:
+            # Keycloak is down, not the token: let callers answer 503, not 401
+            raise JWKSUnavailable("JWKS fetch failed") from self._last_error
+        return entry
+
+    async def refresh(self) -> None:
+        """Refetch the JWKS; callers arriving while a fetch is running wait for that one."""
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._fetch())
+        await asyncio.shield(self._inflight)
+
+    async def _fetch(self) -> None:
+        self._last_fetch = time.monotonic()
+        self.fetches += 1
+        try:
+            r = await self._get_client().get(self.jwks_uri)
             r.raise_for_status()
-            cls._keys = r.json()
-        return cls._keys
+            self.load(r.json())
+            self._last_error = None
+        except Exception as e:
+            self._last_error = e
+            # Retry after the minimum interval, not on every request (also on a cold start)
+            self._expires_at = time.monotonic() + self.min_refresh_interval
+            if not self._keys:
+                raise
+            # Keep serving the last known keys
+            logger.exception("JWKS refresh failed, keeping %d cached keys", len(self._keys))
+        finally:
+            self._inflight = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=5.0)
+        return self._client
+
+    async def run_refresher(self) -> None:
+        """Background loop: refresh keys shortly before they expire."""
+        while True:
+            now = time.monotonic()
+            delay = max(
+                self._expires_at - self.refresh_margin - now,
+                self._last_fetch + self.min_refresh_interval - now,
+            )
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("JWKS background refresh failed")
 
-    @classmethod
-    def invalidate(cls) -> None:
-        cls._keys = None
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
 
 class TokenPayload(BaseModel):
@@ -40,6 +151,17 @@ class TokenPayload(BaseModel):
     email: str | None = None
 
 
+# digest(token) -> (kid, TokenPayload); see _decode_token
+token_cache = TTLCache(maxsize=settings.token_cache_size, ttl=settings.token_cache_ttl)
+
+jwks_store = JWKSKeyStore(
+    settings.keycloak_jwks_uri,
+    ttl=settings.jwks_cache_ttl,
+    refresh_margin=settings.jwks_refresh_margin,
+    min_refresh_interval=settings.jwks_min_refresh_interval,
+)
+
+
 def _roles_from_token(payload: dict) -> list[str]:
     roles: list[str] = []
     # Realm-level roles
@@ -54,14 +176,10 @@ def _roles_from_token(payload: dict) -> list[str]:
 
 
 async def _decode_token(token: str) -> TokenPayload:
-    try:
-        keys = await JWKSCache.get_keys()
-    except Exception as e:
-        JWKSCache.invalidate()
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="Auth provider unavailable",
-        ) from e
+    digest = hashlib.sha256(token.encode()).digest()
+    cached = token_cache.get(digest)
+    if cached is not None:
+        return cached[1]
 
     try:
         unverified = jwt.get_unverified_header(token)
@@ -73,18 +191,19 @@ async def _decode_token(token: str) -> TokenPayload:
             detail="Invalid token",
         ) from e
 
-    jwk_dict = None
-    for k in keys.get("keys", []):
-        if k.get("kid") == kid:
-            jwk_dict = k
-            break
-    if not jwk_dict:
-        JWKSCache.invalidate()
+    try:
+        entry = await jwks_store.get_key(kid)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Auth provider unavailable",
+        ) from e
+    if entry is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Unknown signing key",
         )
-    key = jwk.construct(jwk_dict)
+    key_alg, key = entry
 
     options = {"verify_aud": True, "verify_exp": True}
     audience = settings.keycloak_audience
@@ -96,7 +215,7 @@ async def _decode_token(token: str) -> TokenPayload:
         payload = jwt.decode(
             token,
             key,
-            algorithms=[algo],
+            algorithms=[key_alg or algo],
             audience=audience,
             options=options,
         )
@@ -115,7 +234,7 @@ async def _decode_token(token: str) -> TokenPayload:
             detail=f"Invalid issuer (expected {expected_issuer!r}, got {actual_issuer!r})",
         )
 
-    return TokenPayload(
+    result = TokenPayload(
         sub=payload.get("sub", ""),
         realm_access=payload.get("realm_access"),
         resource_access=payload.get("resource_access"),
@@ -123,6 +242,13 @@ async def _decode_token(token: str) -> TokenPayload:
         preferred_username=payload.get("preferred_username"),
         email=payload.get("email"),
     )
+    exp = payload.get("exp")
+    token_cache.set(
+        digest,
+        (kid, result),
+        expires_at=float(exp) if isinstance(exp, (int, float)) else None,
+    )
+    return result
 
 
 class CurrentUser(BaseModel):
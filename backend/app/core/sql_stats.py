@@ -0,0 +1,207 @@
+"""Per-request SQL instrumentation.
+
+Engine cursor events record every statement into the current request's `QueryStats`
+(held in a contextvar; SQLAlchemy's async greenlets inherit the caller's context, so
+events fire with the request's stats in scope). The ASGI middleware adds a
+`Server-Timing: db;...` header, logs repeated statement shapes (likely N+1 loops) and
+folds each request into per-route aggregates served by `/metrics/sql`.
+"""
+import logging
+import re
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_WS = re.compile(r"\s+")
+_PARAM = re.compile(r"\$\d+|%\([^)]*\)s|\?")
+_PARAM_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_VALUES_LIST = re.compile(r"\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+")
+
+
+def statement_shape(statement: str) -> str:
+    """SQL with parameters and IN/VALUES lists collapsed, so loops over ids look alike."""
+    shape = _PARAM.sub("?", _WS.sub(" ", statement).strip())
+    shape = _PARAM_LIST.sub("?...", shape)
+    return _VALUES_LIST.sub("(?...)", shape)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_ms: float = 0.0
+    slowest_ms: float = 0.0
+    slowest_sql: str | None = None
+    shapes: Counter[str] = field(default_factory=Counter)
+    statements: list[str] = field(default_factory=list)
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms >= self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_sql = statement
+        self.shapes[statement_shape(statement)] += 1
+        self.statements.append(statement)
+
+    def repeated(self, threshold: int) -> dict[str, int]:
+        return {shape: n for shape, n in self.shapes.items() if n >= threshold}
+
+
+@dataclass
+class RouteStats:
+    requests: int = 0
+    queries: int = 0
+    max_queries: int = 0
+    db_ms: float = 0.0
+    max_db_ms: float = 0.0
+    repeated_hits: int = 0  # requests with a statement shape repeated >= threshold
+    slowest_sql: str | None = None
+
+    def add(self, stats: QueryStats, repeated: bool) -> None:
+        self.requests += 1
+        self.queries += stats.count
+        self.db_ms += stats.total_ms
+        self.max_queries = max(self.max_queries, stats.count)
+        if stats.total_ms >= self.max_db_ms:
+            self.max_db_ms = stats.total_ms
+            self.slowest_sql = stats.slowest_sql
+        self.repeated_hits += repeated
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "avg_queries": round(self.queries / self.requests, 2) if self.requests else 0,
+            "max_queries": self.max_queries,
+            "avg_db_ms": round(self.db_ms / self.requests, 3) if self.requests else 0,
+            "max_db_ms": round(self.max_db_ms, 3),
+            "repeated_hits": self.repeated_hits,
+            "slowest_sql": self.slowest_sql,
+        }
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("sql_stats", default=None)
+_budget_watch: ContextVar[list | None] = ContextVar("sql_budget_watch", default=None)
+
+# (method, route template) -> RouteStats, per worker
+route_stats: dict[tuple[str, str], RouteStats] = {}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    # Kept on the execution context: a failed statement takes its start time with it
+    # instead of leaving it behind on the pooled connection
+    if _current.get() is not None and context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current.get()
+    start = getattr(context, "_query_start", None)
+    if stats is None or start is None:
+        return
+    stats.record(statement, (time.perf_counter() - start) * 1000)
+
+
+def instrument_engine(engine: Engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _route_template(scope: Scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "<unmatched>"
+
+
+def _finish(scope: Scope, stats: QueryStats) -> None:
+    key = (scope["method"], _route_template(scope))
+    repeated = stats.repeated(settings.sql_repeat_threshold)
+    if repeated:
+        logger.warning(
+            "%s %s repeated SQL (possible N+1): %s",
+            *key,
+            "; ".join(f"{n}x {shape[:200]}" for shape, n in repeated.items()),
+        )
+    route_stats.setdefault(key, RouteStats()).add(stats, bool(repeated))
+
+    watch = _budget_watch.get()
+    if watch is not None:
+        watch.append((key, stats))
+    budget = settings.sql_query_budget
+    if budget and stats.count > budget:
+        message = f"{key[0]} {key[1]} ran {stats.count} queries (budget {budget})"
+        if settings.environment == "test":
+            raise QueryBudgetExceeded(message + ":\n" + "\n".join(stats.statements))
+        logger.warning(message)
+
+
+class SQLStatsMiddleware:
+    """Collects SQL stats per HTTP request and adds a Server-Timing header."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = QueryStats()
+        token = _current.set(stats)
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append(
+                    (
+                        b"server-timing",
+                        f'db;dur={stats.total_ms:.1f};desc="{stats.count} queries"'.encode(),
+                    )
+                )
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+        _finish(scope, stats)
+
+
+@contextmanager
+def assert_query_budget(max_queries: int) -> Iterator[list]:
+    """Test helper: fail if any request handled inside the block runs more than `max_queries`.
+
+        with assert_query_budget(4):
+            await client.post(f"/restaurants/{rid}/orders", json=payload)
+
+    Requires the app to run in the caller's context (e.g. httpx.ASGITransport).
+    """
+    seen: list[tuple[tuple[str, str], QueryStats]] = []
+    token = _budget_watch.set(seen)
+    try:
+        yield seen
+    finally:
+        _budget_watch.reset(token)
+    over = [(key, stats) for key, stats in seen if stats.count > max_queries]
+    if over:
+        raise QueryBudgetExceeded(
+            "\n\n".join(
+                f"{method} {path} ran {stats.count} queries (budget {max_queries}):\n"
+                + "\n".join(stats.statements)
+                for (method, path), stats in over
+            )
+        )
@@ -1,17 +1,33 @@
+import asyncio
 from contextlib import asynccontextmanager
 from typing import Annotated
 
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, Header, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
 from app.api.routes import inventory, menu, orders, restaurants, users
 from app.core.config import settings
-from app.core.security import CurrentUser, get_current_user
+from app.core.database import engine, read_engine
+from app.core.metrics import MetricsMiddleware, collect_all, render, run_publisher
+from app.core.redis import close_redis
+from app.core.security import CurrentUser, RequirePlatformAdmin, get_current_user, jwks_store
+from app.core.sql_stats import SQLStatsMiddleware, instrument_engine, route_stats
+from app.services.user_directory import user_directory
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    jwks_refresher = asyncio.create_task(jwks_store.run_refresher())
+    user_syncer = asyncio.create_task(user_directory.run_syncer())
+    metrics_publisher = asyncio.create_task(run_publisher())
     yield
+    jwks_refresher.cancel()
+    user_syncer.cancel()
+    metrics_publisher.cancel()
+    await jwks_store.aclose()
+    await user_directory.aclose()
+    await close_redis()
 
 
 app = FastAPI(
@@ -32,6 +48,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.sql_stats_enabled:
+    instrument_engine(engine.sync_engine)
+    instrument_engine(read_engine.sync_engine)
+    app.add_middleware(SQLStatsMiddleware)
+if settings.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
 app.include_router(restaurants.router)
 app.include_router(menu.router)
 app.include_router(inventory.router)
@@ -63,3 +86,24 @@ async def debug_token(user: Annotated[CurrentUser, Depends(get_current_user)]):
         "email": user.email,
         "roles": user.roles,
     }
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics(authorization: Annotated[str | None, Header()] = None):
+    """Prometheus exposition for all live workers (see app.core.metrics)."""
+    if not settings.metrics_enabled or not (settings.metrics_token or settings.metrics_public):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if settings.metrics_token and authorization != f"Bearer {settings.metrics_token}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return PlainTextResponse(
+        render(await collect_all()), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/metrics/sql")
+async def sql_metrics(user: Annotated[CurrentUser, Depends(RequirePlatformAdmin)]):
+    """Per-route SQL stats for this worker (query counts, DB time, repeated shapes)."""
+    return {
+        f"{method} {path}": stats.as_dict()
+        for (method, path), stats in sorted(route_stats.items())
+    }
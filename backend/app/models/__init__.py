@@ -1,7 +1,8 @@
 from app.models.restaurant import Restaurant, RestaurantUser
-from app.models.menu import MenuCategory, OptionGroup, OptionItem, MenuItem
+from app.models.menu import MenuCategory, OptionGroup, OptionItem, MenuItem, MenuItemOptionGroup
 from app.models.inventory import InventoryItem, InventoryLevel
-from app.models.order import Order, OrderItem
+from app.models.order import Order, OrderItem, OrderStockMovement
+from app.models.idempotency import IdempotencyKey
 
 __all__ = [
     "Restaurant",
@@ -10,8 +11,11 @@ __all__ = [
     "OptionGroup",
     "OptionItem",
     "MenuItem",
+    "MenuItemOptionGroup",
     "InventoryItem",
     "InventoryLevel",
     "Order",
     "OrderItem",
+    "OrderStockMovement",
+    "IdempotencyKey",
 ]
@@ -2,7 +2,7 @@ import uuid
 from decimal import Decimal
 
 from sqlalchemy import ForeignKey, Index, Integer, Numeric, String, Text
-from sqlalchemy.dialects.postgresql import ARRAY, JSONB, UUID
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, TSVECTOR, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -88,6 +88,29 @@ class OptionItem(Base):
     )
 
 
+class MenuItemOptionGroup(Base):
+    """Option group offered by a menu item, in the item's display order"""
+    __tablename__ = "menu_item_option_groups"
+
+    menu_item_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("menu_items.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    option_group_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("option_groups.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    position: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
+
+    option_group: Mapped["OptionGroup"] = relationship("OptionGroup")
+
+    __table_args__ = (
+        Index("ix_menu_item_option_groups_option_group_id", "option_group_id"),
+    )
+
+
 class MenuItem(Base):
     """Menu item (e.g., "Tacos XL", "Tenders 5 pièces", "Coca-Cola")"""
     __tablename__ = "menu_items"
@@ -113,17 +136,43 @@ class MenuItem(Base):
     display_order: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     tags: Mapped[list[str] | None] = mapped_column(ARRAY(String), nullable=True)
     ingredients: Mapped[dict | list | None] = mapped_column(JSONB, nullable=True)
-    # Link to option groups (many-to-many via JSONB array of group IDs)
-    option_group_ids: Mapped[list | None] = mapped_column(JSONB, nullable=True)
+    # Label, tags, active option names and description; kept up to date by
+    # app.services.menu_search.refresh_search_vectors
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR, nullable=True, deferred=True
+    )
 
     restaurant: Mapped["Restaurant"] = relationship("Restaurant", back_populates="menu_items")
     category: Mapped["MenuCategory"] = relationship("MenuCategory", back_populates="items")
     order_items: Mapped[list["OrderItem"]] = relationship(
         "OrderItem", back_populates="menu_item", cascade="all, delete-orphan"
     )
+    # Offered option groups; load with selectinload (chain .option_group for the groups)
+    option_group_links: Mapped[list["MenuItemOptionGroup"]] = relationship(
+        "MenuItemOptionGroup",
+        order_by=MenuItemOptionGroup.position,
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+    @property
+    def option_group_ids(self) -> list[uuid.UUID]:
+        return [link.option_group_id for link in self.option_group_links]
+
+    @property
+    def option_groups(self) -> list["OptionGroup"]:
+        return [link.option_group for link in self.option_group_links]
 
     __table_args__ = (
         Index("ix_menu_items_restaurant_id", "restaurant_id"),
         Index("ix_menu_items_restaurant_active", "restaurant_id", "is_active"),
         Index("ix_menu_items_category_id", "category_id"),
+        Index("ix_menu_items_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_menu_items_label_trgm",
+            "label",
+            postgresql_using="gin",
+            postgresql_ops={"label": "gin_trgm_ops"},
+        ),
+        Index("ix_menu_items_tags", "tags", postgresql_using="gin"),
     )
@@ -1,7 +1,8 @@
 import uuid
+from datetime import datetime
 from decimal import Decimal
 
-from sqlalchemy import ForeignKey, Index, Numeric, String
+from sqlalchemy import DateTime, ForeignKey, Index, Numeric, String, func
 from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -21,6 +22,19 @@ class Order(Base):
     )
     status: Mapped[str] = mapped_column(String(32), nullable=False, default="draft")
     # draft -> confirmed -> preparing -> ready -> delivered | cancelled
+    # Sum of line totals, priced server-side at creation
+    total: Mapped[Decimal] = mapped_column(
+        Numeric(10, 2), nullable=False, default=0, server_default="0"
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
 
     restaurant: Mapped["Restaurant"] = relationship("Restaurant", back_populates="orders")
     items: Mapped[list["OrderItem"]] = relationship(
@@ -30,7 +44,10 @@ class Order(Base):
     __table_args__ = (
         Index("ix_orders_restaurant_id", "restaurant_id"),
         Index("ix_orders_restaurant_status", "restaurant_id", "status"),
+        Index("ix_orders_restaurant_created", "restaurant_id", "created_at", "id"),
     )
+    # Server-side timestamps come back via RETURNING instead of a later SELECT
+    __mapper_args__ = {"eager_defaults": True}
 
 
 class OrderItem(Base):
@@ -50,7 +67,12 @@ class OrderItem(Base):
         nullable=False,
     )
     quantity: Mapped[int] = mapped_column(nullable=False, default=1)
+    # Menu price + chosen options' price_extra
     unit_price: Mapped[Decimal] = mapped_column(Numeric(10, 2), nullable=False)
+    line_total: Mapped[Decimal] = mapped_column(
+        Numeric(10, 2), nullable=False, default=0, server_default="0"
+    )
+    # Chosen options as priced: [{id, group_id, name, price_extra}]
     options: Mapped[dict | list | None] = mapped_column(JSONB, nullable=True)
 
     order: Mapped["Order"] = relationship("Order", back_populates="items")
@@ -60,3 +82,29 @@ class OrderItem(Base):
         Index("ix_order_items_order_id", "order_id"),
         Index("ix_order_items_menu_item_id", "menu_item_id"),
     )
+
+
+class OrderStockMovement(Base):
+    """Stock taken out for an order, per inventory item (substitutes included).
+
+    Written when the order enters a stock-consuming status and put back as recorded when
+    it leaves one, so later recipe edits do not change what a cancellation restores.
+    """
+
+    __tablename__ = "order_stock_movements"
+
+    order_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("orders.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    inventory_item_id: Mapped[uuid.UUID] = mapped_column(
+        UUID(as_uuid=True),
+        ForeignKey("inventory_items.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    quantity: Mapped[float] = mapped_column(nullable=False)
+
+    __table_args__ = (
+        Index("ix_order_stock_movements_inventory_item_id", "inventory_item_id"),
+    )
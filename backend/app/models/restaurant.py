@@ -1,7 +1,7 @@
 import uuid
 
-from sqlalchemy import ForeignKey, Index, String
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import ForeignKey, Index, Integer, String
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -17,6 +17,10 @@ class Restaurant(Base):
     slug: Mapped[str] = mapped_column(String(128), nullable=False, unique=True)
     description: Mapped[str | None] = mapped_column(String(1024), nullable=True)
     is_active: Mapped[bool] = mapped_column(default=True, nullable=False)
+    # Bumped by every menu write; keys compiled menu caches (snapshot, ...)
+    menu_version: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    # {status: [next statuses]}; None = default order workflow (see services.ordering)
+    order_transitions: Mapped[dict | None] = mapped_column(JSONB, nullable=True)
 
     users: Mapped[list["RestaurantUser"]] = relationship(
         "RestaurantUser", back_populates="restaurant", cascade="all, delete-orphan"
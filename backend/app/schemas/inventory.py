@@ -17,6 +17,10 @@ class InventoryLevelUpsert(BaseModel):
     in_stock: bool = True
 
 
+class InventoryLevelBulkItem(InventoryLevelUpsert):
+    inventory_item_id: UUID
+
+
 class InventoryLevelRead(BaseModel):
     id: UUID
     inventory_item_id: UUID
@@ -26,6 +30,12 @@ class InventoryLevelRead(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class InventoryLevelBulkResult(BaseModel):
+    inventory_item_id: UUID
+    status: str  # updated | not_found
+    level: InventoryLevelRead | None = None
+
+
 class InventoryItemRead(InventoryItemBase):
     id: UUID
     restaurant_id: UUID
@@ -129,7 +129,90 @@ class MenuItemRead(MenuItemBase):
     model_config = {"from_attributes": True}
 
 
+class MenuItemSearchHit(MenuItemRead):
+    rank: float
+
+
 # Full menu item with category and option groups
 class MenuItemFull(MenuItemRead):
     category: MenuCategoryRead | None = None
     option_groups: list[OptionGroupWithItems] = []
+
+
+# ============ Menu Snapshot ============
+
+class MenuSnapshotItem(MenuItemRead):
+    option_groups: list[OptionGroupWithItems] = []
+
+
+class MenuSnapshotCategory(MenuCategoryRead):
+    items: list[MenuSnapshotItem] = []
+
+
+class MenuSnapshot(BaseModel):
+    restaurant_id: UUID
+    version: int
+    categories: list[MenuSnapshotCategory]
+    uncategorized_items: list[MenuSnapshotItem] = []
+
+
+# ============ Import / Export ============
+# Entities are referenced by name; fields left out of an import are not changed.
+
+MAX_IMPORT_ENTITIES = 5000
+
+
+class MenuImportOptionGroup(OptionGroupCreate):
+    options: list[OptionItemCreate] = Field(default=[], max_length=500)
+
+
+class MenuImportItem(BaseModel):
+    label: str = Field(..., min_length=1, max_length=255)
+    # Category name; items are matched by (category, label)
+    category: str | None = Field(None, min_length=1, max_length=100)
+    description: str | None = None
+    price: Decimal = Field(..., ge=0)
+    image_url: str | None = None
+    is_active: bool = True
+    display_order: int = 0
+    tags: list[str] | None = None
+    ingredients: dict | list | None = None
+    # Option group names, in display order
+    option_groups: list[str] = []
+
+
+class MenuImport(BaseModel):
+    categories: list[MenuCategoryCreate] = Field(default=[], max_length=MAX_IMPORT_ENTITIES)
+    option_groups: list[MenuImportOptionGroup] = Field(default=[], max_length=MAX_IMPORT_ENTITIES)
+    items: list[MenuImportItem] = Field(default=[], max_length=MAX_IMPORT_ENTITIES)
+
+
+class MenuImportChange(BaseModel):
+    kind: str  # category | option_group | option | item
+    action: str  # create | update
+    name: str
+    parent: str | None = None  # option: group name, item: category name
+    fields: dict[str, list] = {}  # update: field -> [old, new]
+
+
+class MenuImportResult(BaseModel):
+    dry_run: bool
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    changes: list[MenuImportChange] = []
+
+
+# ============ Clone ============
+
+class MenuCloneRequest(BaseModel):
+    source_restaurant_id: UUID
+
+
+class MenuCloneResult(BaseModel):
+    source_restaurant_id: UUID
+    categories: int
+    option_groups: int
+    options: int
+    items: int
+    option_group_links: int
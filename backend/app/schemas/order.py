@@ -1,3 +1,4 @@
+from datetime import datetime
 from decimal import Decimal
 from uuid import UUID
 
@@ -10,18 +11,44 @@ ORDER_STATUSES = ("draft", "confirmed", "preparing", "ready", "delivered", "canc
 class OrderItemCreate(BaseModel):
     menu_item_id: UUID
     quantity: int = Field(..., ge=1)
-    options: dict | list | None = None
+    # Chosen OptionItem ids; priced and stored as normalized options
+    option_ids: list[UUID] = Field(default_factory=list, max_length=50)
+
+    # Unknown fields are rejected: an old client sending `options` must not get its
+    # order priced without them
+    model_config = {"extra": "forbid"}
 
 
 class OrderCreate(BaseModel):
     items: list[OrderItemCreate] = Field(..., min_length=1)
 
 
+class OrderParseRequest(BaseModel):
+    text: str = Field(..., min_length=1, max_length=1000)
+
+
+class OrderDraftLine(OrderItemCreate):
+    label: str
+    options: list[str] = []
+    # The words this line was read from, and other items that matched them as well
+    matched_text: str = ""
+    alternatives: list[UUID] = []
+
+
+class OrderDraft(BaseModel):
+    """Draft `OrderCreate` payload read from an utterance; review before submitting."""
+
+    items: list[OrderDraftLine]
+    # Words that named nothing on the menu (or were negated, e.g. "sans oignons")
+    unmatched: list[str] = []
+
+
 class OrderItemRead(BaseModel):
     id: UUID
     menu_item_id: UUID
     quantity: int
     unit_price: Decimal
+    line_total: Decimal
     options: dict | list | None = None
 
     model_config = {"from_attributes": True}
@@ -31,6 +58,9 @@ class OrderRead(BaseModel):
     id: UUID
     restaurant_id: UUID
     status: str
+    total: Decimal
+    created_at: datetime
+    updated_at: datetime
     items: list[OrderItemRead] = []
 
     model_config = {"from_attributes": True}
@@ -38,7 +68,27 @@ class OrderRead(BaseModel):
 
 class OrderList(BaseModel):
     orders: list[OrderRead]
+    # Opaque keyset cursor for the next (older) page; None on the last page
+    next_cursor: str | None = None
 
 
 class OrderStatusUpdate(BaseModel):
     status: str = Field(..., pattern="^(confirmed|preparing|ready|delivered|cancelled)$")
+
+
+class OrderBulkStatusUpdate(OrderStatusUpdate):
+    order_ids: list[UUID] = Field(..., min_length=1, max_length=500)
+    # All or nothing: any missing order or invalid transition rejects the whole batch
+    atomic: bool = False
+
+
+class OrderStatusOutcome(BaseModel):
+    id: UUID
+    outcome: str  # updated | not_found | invalid_transition
+    previous_status: str | None = None
+    updated_at: datetime | None = None
+
+
+class OrderBulkStatusResult(BaseModel):
+    status: str
+    results: list[OrderStatusOutcome]
@@ -1,7 +1,9 @@
 import re
 from uuid import UUID
 
-from pydantic import BaseModel, Field, model_validator
+from pydantic import BaseModel, Field, field_validator, model_validator
+
+from app.schemas.order import ORDER_STATUSES
 
 
 def _slug(v: str) -> str:
@@ -35,6 +37,21 @@ class RestaurantUpdate(BaseModel):
     is_active: bool | None = None
     manager_user_ids: list[str] | None = None
     staff_user_ids: list[str] | None = None
+    # {status: [next statuses]}; send null explicitly to go back to the default workflow
+    order_transitions: dict[str, list[str]] | None = None
+
+    @field_validator("order_transitions")
+    @classmethod
+    def check_transitions(cls, v: dict[str, list[str]] | None):
+        if v is None:
+            return v
+        for current, nexts in v.items():
+            unknown = {current, *nexts} - set(ORDER_STATUSES)
+            if unknown:
+                raise ValueError(f"statut inconnu : {', '.join(sorted(unknown))}")
+            if current in nexts:
+                raise ValueError(f"transition de {current} vers lui-même")
+        return v
 
     @model_validator(mode="after")
     def normalize_slug(self):
@@ -48,6 +65,7 @@ class RestaurantUpdate(BaseModel):
 class RestaurantRead(RestaurantBase):
     id: UUID
     slug: str
+    order_transitions: dict[str, list[str]] | None = None
 
     model_config = {"from_attributes": True}
 
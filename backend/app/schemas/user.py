@@ -0,0 +1,10 @@
+from pydantic import BaseModel
+
+
+class KeycloakUser(BaseModel):
+    id: str
+    username: str
+    email: str | None = None
+    firstName: str | None = None
+    lastName: str | None = None
+    enabled: bool
@@ -0,0 +1,196 @@
+"""Per-restaurant order event stream.
+
+Publishers go through a broker (Redis Streams, or in-memory for tests and single-worker
+runs). Each worker keeps one upstream listener per restaurant that has connected
+clients and fans events out to them, so N dashboards on a worker cost one subscription.
+Event ids are Redis-stream style ("<ms>-<seq>") and increase monotonically, which lets
+clients resume with Last-Event-ID.
+"""
+import asyncio
+import json
+import logging
+from collections import deque
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from uuid import UUID
+
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class OrderEvent:
+    id: str
+    type: str  # order.created | order.status_changed
+    data: dict
+
+
+def _id_key(event_id: str) -> tuple[int, int]:
+    ms, _, seq = event_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class InMemoryBroker:
+    """Process-local broker; keeps the last HISTORY_SIZE events per restaurant."""
+
+    def __init__(self) -> None:
+        self._seq = 0
+        self._history: dict[UUID, deque[OrderEvent]] = {}
+        self._listeners: dict[UUID, set[asyncio.Queue]] = {}
+
+    async def publish(self, restaurant_id: UUID, type_: str, data: dict) -> str:
+        self._seq += 1
+        event = OrderEvent(id=f"{self._seq}-0", type=type_, data=data)
+        self._history.setdefault(restaurant_id, deque(maxlen=HISTORY_SIZE)).append(event)
+        for queue in self._listeners.get(restaurant_id, ()):
+            queue.put_nowait(event)
+        return event.id
+
+    async def latest_id(self, restaurant_id: UUID) -> str:
+        history = self._history.get(restaurant_id)
+        return history[-1].id if history else "0-0"
+
+    async def history_since(self, restaurant_id: UUID, last_id: str) -> list[OrderEvent]:
+        key = _id_key(last_id)
+        return [e for e in self._history.get(restaurant_id, ()) if _id_key(e.id) > key]
+
+    async def listen(self, restaurant_id: UUID, after_id: str) -> AsyncIterator[OrderEvent]:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._listeners.setdefault(restaurant_id, set()).add(queue)
+        try:
+            for event in await self.history_since(restaurant_id, after_id):
+                yield event
+            while True:
+                yield await queue.get()
+        finally:
+            listeners = self._listeners[restaurant_id]
+            listeners.discard(queue)
+            if not listeners:
+                del self._listeners[restaurant_id]
+
+
+class RedisBroker:
+    """Redis Streams broker: one capped stream per restaurant, shared by all workers."""
+
+    block_ms = 15000
+
+    @staticmethod
+    def _key(restaurant_id: UUID) -> str:
+        return f"order-events:{restaurant_id}"
+
+    @staticmethod
+    def _event(entry_id: str, fields: dict) -> OrderEvent:
+        return OrderEvent(id=entry_id, type=fields["type"], data=json.loads(fields["data"]))
+
+    async def publish(self, restaurant_id: UUID, type_: str, data: dict) -> str:
+        return await get_redis().xadd(
+            self._key(restaurant_id),
+            {"type": type_, "data": json.dumps(data)},
+            maxlen=HISTORY_SIZE,
+            approximate=True,
+        )
+
+    async def latest_id(self, restaurant_id: UUID) -> str:
+        entries = await get_redis().xrevrange(self._key(restaurant_id), count=1)
+        return entries[0][0] if entries else "0-0"
+
+    async def history_since(self, restaurant_id: UUID, last_id: str) -> list[OrderEvent]:
+        entries = await get_redis().xrange(self._key(restaurant_id), min=f"({last_id}")
+        return [self._event(entry_id, fields) for entry_id, fields in entries]
+
+    async def listen(self, restaurant_id: UUID, after_id: str) -> AsyncIterator[OrderEvent]:
+        key = self._key(restaurant_id)
+        while True:
+            streams = await get_redis().xread({key: after_id}, block=self.block_ms)
+            for _, entries in streams:
+                for entry_id, fields in entries:
+                    after_id = entry_id
+                    yield self._event(entry_id, fields)
+
+
+class _Channel:
+    def __init__(self) -> None:
+        self.clients: set[asyncio.Queue] = set()
+        self.ready = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+
+class OrderEventHub:
+    """Fans one upstream listener per restaurant out to every local client."""
+
+    client_queue_size = 256
+
+    def __init__(self, broker: InMemoryBroker | RedisBroker) -> None:
+        self.broker = broker
+        self._channels: dict[UUID, _Channel] = {}
+
+    async def publish(self, restaurant_id: UUID, type_: str, data: dict) -> None:
+        await self.broker.publish(restaurant_id, type_, data)
+
+    async def _pump(self, restaurant_id: UUID, channel: _Channel) -> None:
+        try:
+            start = await self.broker.latest_id(restaurant_id)
+            channel.ready.set()
+            async for event in self.broker.listen(restaurant_id, start):
+                for queue in list(channel.clients):
+                    if queue.full():
+                        # Slow client: end its stream; it reconnects with Last-Event-ID
+                        channel.clients.discard(queue)
+                        self._close(queue)
+                    else:
+                        queue.put_nowait(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Order event listener for %s failed", restaurant_id)
+            if self._channels.get(restaurant_id) is channel:
+                del self._channels[restaurant_id]
+            for queue in channel.clients:
+                self._close(queue)
+            channel.ready.set()
+
+    @staticmethod
+    def _close(queue: asyncio.Queue) -> None:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def subscribe(
+        self, restaurant_id: UUID, last_event_id: str | None = None
+    ) -> AsyncIterator[OrderEvent]:
+        """Replay events after `last_event_id` (if any), then yield live events."""
+        channel = self._channels.get(restaurant_id)
+        if channel is None:
+            channel = self._channels[restaurant_id] = _Channel()
+            channel.task = asyncio.create_task(self._pump(restaurant_id, channel))
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.client_queue_size)
+        channel.clients.add(queue)
+        try:
+            await channel.ready.wait()
+            last_key = (-1, -1)
+            if last_event_id:
+                for event in await self.broker.history_since(restaurant_id, last_event_id):
+                    last_key = _id_key(event.id)
+                    yield event
+            while True:
+                event = await queue.get()
+                if event is None:
+                    return
+                if _id_key(event.id) <= last_key:
+                    continue  # already replayed from history
+                yield event
+        finally:
+            channel.clients.discard(queue)
+            if not channel.clients and self._channels.get(restaurant_id) is channel:
+                del self._channels[restaurant_id]
+                channel.task.cancel()
+
+
+def _make_broker() -> InMemoryBroker | RedisBroker:
+    return RedisBroker() if get_redis() is not None else InMemoryBroker()
+
+
+order_events = OrderEventHub(_make_broker())
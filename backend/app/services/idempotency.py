@@ -0,0 +1,80 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.idempotency import IdempotencyKey
+
+
+def request_fingerprint(payload: BaseModel) -> str:
+    body = json.dumps(payload.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+async def claim_idempotency_key(
+    db: AsyncSession, restaurant_id: UUID, key: str, request_hash: str
+) -> IdempotencyKey | None:
+    """Lock (restaurant, key) for this transaction and return the stored response, if any.
+
+    A concurrent request with the same key blocks here until the first one commits,
+    then sees its stored response. Reusing a key for a different body is rejected.
+    """
+    await db.execute(
+        select(func.pg_advisory_xact_lock(func.hashtextextended(f"{restaurant_id}:{key}", 0)))
+    )
+    r = await db.execute(
+        select(IdempotencyKey).where(
+            IdempotencyKey.restaurant_id == restaurant_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.expires_at > func.now(),
+        )
+    )
+    stored = r.scalar_one_or_none()
+    if stored is not None and stored.request_hash != request_hash:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request body",
+        )
+    return stored
+
+
+async def store_idempotent_response(
+    db: AsyncSession,
+    restaurant_id: UUID,
+    key: str,
+    request_hash: str,
+    status_code: int,
+    body: dict,
+) -> None:
+    """Save the response in the request's transaction (one statement, also purging the
+    restaurant's expired keys)."""
+    purge = (
+        delete(IdempotencyKey)
+        .where(
+            IdempotencyKey.restaurant_id == restaurant_id,
+            IdempotencyKey.expires_at <= func.now(),
+            IdempotencyKey.key != key,
+        )
+        .cte("purged")
+    )
+    values = {
+        "request_hash": request_hash,
+        "status_code": status_code,
+        "response": body,
+        "expires_at": datetime.now(timezone.utc)
+        + timedelta(seconds=settings.idempotency_key_ttl),
+    }
+    stmt = pg_insert(IdempotencyKey).values(restaurant_id=restaurant_id, key=key, **values)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[IdempotencyKey.restaurant_id, IdempotencyKey.key],
+            set_={**values, "created_at": func.now()},
+        ).add_cte(purge)
+    )
@@ -0,0 +1,112 @@
+import logging
+import time
+from collections.abc import Iterable
+from uuid import UUID
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import after_commit
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+NOT_MEMBER = ""
+
+
+class MembershipCache:
+    """(user sub, restaurant_id) -> restaurant role ("manager" | "staff" | NOT_MEMBER).
+
+    The in-process tier is always used. When Redis is enabled, a second tier keeps one
+    hash per restaurant (field = user sub, value = "role|expires_at") so that a whole
+    restaurant can be invalidated with a single DEL, and the in-process TTL shrinks to
+    `membership_cache_local_ttl` to bound staleness on other workers.
+
+    Redis is only a cache: when it fails, lookups fall back to the local tier and the DB.
+    """
+
+    def __init__(self) -> None:
+        local_ttl = (
+            settings.membership_cache_local_ttl
+            if settings.redis_enabled
+            else settings.membership_cache_ttl
+        )
+        self._local = TTLCache(maxsize=settings.membership_cache_size, ttl=local_ttl)
+
+    @staticmethod
+    def _redis_key(restaurant_id: UUID) -> str:
+        return f"membership:{restaurant_id}"
+
+    async def get(self, restaurant_id: UUID, sub: str) -> str | None:
+        """Cached role, NOT_MEMBER, or None on a miss."""
+        role = self._local.get((sub, restaurant_id))
+        if role is not None:
+            return role
+        redis = get_redis()
+        if redis is None:
+            return None
+        try:
+            raw = await redis.hget(self._redis_key(restaurant_id), sub)
+        except RedisError:
+            logger.warning("Membership cache read failed, falling back to the DB", exc_info=True)
+            return None
+        if raw is None:
+            return None
+        role, _, expires_at = raw.rpartition("|")
+        if float(expires_at) <= time.time():
+            return None
+        self._local.set((sub, restaurant_id), role, expires_at=float(expires_at))
+        return role
+
+    async def set(self, restaurant_id: UUID, sub: str, role: str) -> None:
+        self._local.set((sub, restaurant_id), role)
+        redis = get_redis()
+        if redis is None:
+            return
+        key = self._redis_key(restaurant_id)
+        expires_at = time.time() + settings.membership_cache_ttl
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                pipe.hset(key, sub, f"{role}|{expires_at}")
+                pipe.expire(key, settings.membership_cache_ttl)
+                await pipe.execute()
+        except RedisError:
+            logger.warning("Membership cache write failed", exc_info=True)
+
+    async def invalidate(self, restaurant_id: UUID, subs: Iterable[str] | None = None) -> None:
+        """Drop cached memberships for `subs`, or for every user of the restaurant."""
+        redis = get_redis()
+        if subs is None:
+            self._local.discard_where(lambda key, _: key[1] == restaurant_id)
+        else:
+            subs = list(subs)
+            for sub in subs:
+                self._local.pop((sub, restaurant_id))
+            if not subs:
+                return
+        if redis is None:
+            return
+        try:
+            if subs is None:
+                await redis.delete(self._redis_key(restaurant_id))
+            else:
+                await redis.hdel(self._redis_key(restaurant_id), *subs)
+        except RedisError:
+            # The Redis entries may outlive the change: drop every local entry of the
+            # restaurant so this worker at least goes back to the DB
+            self._local.discard_where(lambda key, _: key[1] == restaurant_id)
+            logger.warning(
+                "Membership cache invalidation of %s failed", restaurant_id, exc_info=True
+            )
+
+
+membership_cache = MembershipCache()
+
+
+def membership_changed(db: AsyncSession, restaurant_id: UUID, subs: Iterable[str]) -> None:
+    """Drop cached access for `subs` once the membership change is committed."""
+    subs = list(subs)
+    if subs:
+        after_commit(db, lambda: membership_cache.invalidate(restaurant_id, subs))
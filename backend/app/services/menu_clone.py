@@ -0,0 +1,145 @@
+"""Copy a restaurant's menu into another one (a chain opening a new location).
+
+Set-based: every source id gets a new one in a temporary id map (gen_random_uuid), then
+one INSERT ... SELECT per table copies the rows and remaps their references through it.
+No rows travel to the app, so a menu of thousands of rows clones in about a dozen
+round trips.
+"""
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import Table, column, exists, insert, literal, or_, select, table, text, union_all
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.menu import MenuCategory, MenuItem, MenuItemOptionGroup, OptionGroup, OptionItem
+from app.models.restaurant import Restaurant
+from app.schemas.menu import MenuCloneResult
+from app.services.menu_snapshot import menu_changed
+
+_ID_MAP = "menu_clone_ids"
+_id_map = table(
+    _ID_MAP, column("old_id", PG_UUID(as_uuid=True)), column("new_id", PG_UUID(as_uuid=True))
+)
+
+
+def _copied(source: Table, *remapped: str) -> list:
+    """Columns copied as they are: all but the id and the remapped references. Includes
+    menu_items.search_vector, which only depends on copied data."""
+    return [c for c in source.c if c.name not in ("id", *remapped)]
+
+
+async def _copy(
+    db: AsyncSession, source: Table, values: dict, joins: list, *remapped: str
+) -> int:
+    """INSERT INTO source SELECT new ids + `values` + copied columns FROM source JOIN id map."""
+    ids = _id_map.alias("ids")
+    copied = _copied(source, *remapped)
+    query = select(ids.c.new_id, *values.values(), *copied).select_from(source)
+    query = query.join(ids, ids.c.old_id == source.c.id)
+    for alias, onclause, outer in joins:
+        query = query.join(alias, onclause, isouter=outer)
+    r = await db.execute(
+        insert(source).from_select(["id", *values, *(c.name for c in copied)], query)
+    )
+    return r.rowcount
+
+
+async def clone_menu(db: AsyncSession, source_id: UUID, target_id: UUID) -> MenuCloneResult:
+    """Copy categories, option groups, options, items and their option group links from
+    `source_id` into `target_id`, whose menu must be empty (409 otherwise)."""
+    if source_id == target_id:
+        raise HTTPException(status_code=400, detail="Cannot clone a menu into itself")
+    # Menu writes end with menu_changed (UPDATE restaurants): locking both rows serializes
+    # them with the clone and keeps the source menu still while it is read. One statement
+    # in id order, so concurrent clones A->B and B->A queue instead of deadlocking.
+    await db.execute(
+        select(Restaurant.id)
+        .where(Restaurant.id.in_([source_id, target_id]))
+        .order_by(Restaurant.id)
+        .with_for_update()
+    )
+    has_menu = await db.scalar(
+        select(
+            or_(
+                exists().where(MenuCategory.restaurant_id == target_id),
+                exists().where(OptionGroup.restaurant_id == target_id),
+                exists().where(MenuItem.restaurant_id == target_id),
+            )
+        )
+    )
+    if has_menu:
+        raise HTTPException(status_code=409, detail="Target restaurant already has a menu")
+
+    await db.execute(
+        text(
+            f"CREATE TEMPORARY TABLE {_ID_MAP} "
+            "(old_id uuid PRIMARY KEY, new_id uuid NOT NULL DEFAULT gen_random_uuid()) "
+            "ON COMMIT DROP"
+        )
+    )
+    # UUIDs are unique across tables, so one map serves them all
+    await db.execute(
+        insert(_id_map).from_select(
+            ["old_id"],
+            union_all(
+                select(MenuCategory.id).where(MenuCategory.restaurant_id == source_id),
+                select(OptionGroup.id).where(OptionGroup.restaurant_id == source_id),
+                select(OptionItem.id)
+                .join(OptionGroup, OptionGroup.id == OptionItem.group_id)
+                .where(OptionGroup.restaurant_id == source_id),
+                select(MenuItem.id).where(MenuItem.restaurant_id == source_id),
+            ),
+        )
+    )
+    await db.execute(text(f"ANALYZE {_ID_MAP}"))
+
+    # Joining on the id map keeps only the source's rows
+    target = {"restaurant_id": literal(target_id, PG_UUID(as_uuid=True))}
+    categories = await _copy(db, MenuCategory.__table__, target, [], "restaurant_id")
+    groups = await _copy(db, OptionGroup.__table__, target, [], "restaurant_id")
+
+    options_table = OptionItem.__table__
+    group_ids = _id_map.alias("group_ids")
+    options = await _copy(
+        db,
+        options_table,
+        {"group_id": group_ids.c.new_id},
+        [(group_ids, group_ids.c.old_id == options_table.c.group_id, False)],
+        "group_id",
+    )
+
+    items_table = MenuItem.__table__
+    category_ids = _id_map.alias("category_ids")
+    items = await _copy(
+        db,
+        items_table,
+        {**target, "category_id": category_ids.c.new_id},
+        [(category_ids, category_ids.c.old_id == items_table.c.category_id, True)],
+        "restaurant_id",
+        "category_id",
+    )
+
+    links_table = MenuItemOptionGroup.__table__
+    item_ids = _id_map.alias("item_ids")
+    link_group_ids = _id_map.alias("link_group_ids")
+    r = await db.execute(
+        insert(links_table).from_select(
+            ["menu_item_id", "option_group_id", "position"],
+            select(item_ids.c.new_id, link_group_ids.c.new_id, links_table.c.position)
+            .select_from(links_table)
+            .join(item_ids, item_ids.c.old_id == links_table.c.menu_item_id)
+            .join(link_group_ids, link_group_ids.c.old_id == links_table.c.option_group_id),
+        )
+    )
+    links = r.rowcount
+
+    await menu_changed(db, target_id)
+    return MenuCloneResult(
+        source_restaurant_id=source_id,
+        categories=categories,
+        option_groups=groups,
+        options=options,
+        items=items,
+        option_group_links=links,
+    )
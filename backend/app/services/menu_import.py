@@ -0,0 +1,599 @@
+"""Bulk menu import and export, by name, as JSON (`MenuImport`) or CSV.
+
+An import merges a whole menu into a restaurant in one transaction. Categories and option
+groups are matched by name, options by name within their group and items by (category,
+label), or by label alone when the file leaves the category out, all case-insensitively.
+New rows are written with one batched INSERT per table, changed ones are updated, nothing
+is deleted. Only fields present in the file are compared, so a partial file leaves the
+rest alone. A dry run returns the same diff.
+
+CSV has one row per entity, `type` being category, option_group, option or item (columns
+in CSV_COLUMNS); tags and option_groups are `|`-separated, ingredients is JSON. An option's
+group must have its own option_group row (its name alone for an existing group).
+"""
+import csv
+import io
+import json
+from collections.abc import AsyncIterator, Callable, Iterable
+from dataclasses import dataclass, field
+from uuid import UUID, uuid4
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.database import read_session_maker
+from app.models.menu import MenuCategory, MenuItem, MenuItemOptionGroup, OptionGroup, OptionItem
+from app.schemas.menu import (
+    MenuCategoryCreate,
+    MenuImport,
+    MenuImportChange,
+    MenuImportItem,
+    MenuImportOptionGroup,
+    MenuImportResult,
+    OptionItemCreate,
+)
+from app.services.menu_search import refresh_search_vectors
+from app.services.menu_snapshot import menu_changed
+
+MAX_IMPORT_BYTES = 5 * 1024 * 1024
+EXPORT_BATCH = 500
+LIST_SEPARATOR = "|"
+
+CSV_COLUMNS = (
+    "type", "name", "category", "group", "description", "price", "price_extra",
+    "min_select", "max_select", "display_order", "is_active", "tags", "option_groups",
+    "image_url", "ingredients",
+)
+# Per row type: CSV column -> schema field (an option's `group` column names its parent)
+_CSV_FIELDS: dict[str, dict[str, str]] = {
+    "category": {
+        "name": "name", "description": "description", "display_order": "display_order",
+        "is_active": "is_active",
+    },
+    "option_group": {
+        "name": "name", "description": "description", "min_select": "min_select",
+        "max_select": "max_select", "is_active": "is_active",
+    },
+    "option": {"name": "name", "price_extra": "price_extra", "is_active": "is_active"},
+    "item": {
+        "name": "label", "category": "category", "description": "description",
+        "price": "price", "image_url": "image_url", "is_active": "is_active",
+        "display_order": "display_order", "tags": "tags", "option_groups": "option_groups",
+        "ingredients": "ingredients",
+    },
+}
+_CSV_MODELS: dict[str, type[BaseModel]] = {
+    "category": MenuCategoryCreate,
+    "option_group": MenuImportOptionGroup,
+    "option": OptionItemCreate,
+    "item": MenuImportItem,
+}
+
+_CATEGORY_FIELDS = ("name", "description", "display_order", "is_active")
+_GROUP_FIELDS = ("name", "description", "min_select", "max_select", "is_active")
+_OPTION_FIELDS = ("name", "price_extra", "is_active")
+_ITEM_FIELDS = (
+    "label", "description", "price", "image_url", "is_active", "display_order", "tags",
+    "ingredients",
+)
+
+
+def _key(name: str) -> str:
+    return name.strip().casefold()
+
+
+def _validation_errors(e: ValidationError, *prefix) -> list[dict]:
+    return [
+        {"loc": [*prefix, *err["loc"]], "msg": err["msg"], "type": err["type"]}
+        for err in e.errors(include_url=False)
+    ]
+
+
+# ============ Parsing ============
+
+def parse_menu_json(body: bytes) -> MenuImport:
+    try:
+        return MenuImport.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=_validation_errors(e, "body"),
+        )
+
+
+def parse_menu_csv(body: bytes) -> MenuImport:
+    """Rows become the same models as a JSON import; empty cells are left unset."""
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="CSV must be UTF-8"
+        )
+    reader = csv.DictReader(io.StringIO(text))
+    if not {"type", "name"} <= set(reader.fieldnames or ()):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="CSV needs a header row with at least the type and name columns",
+        )
+
+    errors: list[dict] = []
+    categories: list[MenuCategoryCreate] = []
+    groups: dict[str, MenuImportOptionGroup] = {}
+    group_rows: list[MenuImportOptionGroup] = []
+    options: list[tuple[int, str, OptionItemCreate]] = []
+    items: list[MenuImportItem] = []
+    for row in reader:
+        line = reader.line_num
+        kind = (row.get("type") or "").strip()
+        columns = _CSV_FIELDS.get(kind)
+        if columns is None:
+            errors.append(
+                {"loc": ["row", line, "type"], "msg": f"Unknown row type {kind!r}",
+                 "type": "value_error"}
+            )
+            continue
+        values: dict = {}
+        for column, name in columns.items():
+            cell = (row.get(column) or "").strip()
+            if cell:
+                values[name] = cell
+        for name in ("tags", "option_groups"):
+            if name in values:
+                values[name] = [v.strip() for v in values[name].split(LIST_SEPARATOR) if v.strip()]
+        try:
+            if "ingredients" in values:
+                values["ingredients"] = json.loads(values["ingredients"])
+            entity = _CSV_MODELS[kind].model_validate(values)
+        except json.JSONDecodeError:
+            errors.append(
+                {"loc": ["row", line, "ingredients"], "msg": "Invalid JSON",
+                 "type": "json_invalid"}
+            )
+            continue
+        except ValidationError as e:
+            errors.extend(_validation_errors(e, "row", line))
+            continue
+
+        if kind == "category":
+            categories.append(entity)
+        elif kind == "option_group":
+            groups.setdefault(_key(entity.name), entity)
+            group_rows.append(entity)
+        elif kind == "option":
+            group_name = (row.get("group") or "").strip()
+            if not group_name:
+                errors.append(
+                    {"loc": ["row", line, "group"], "msg": "Option rows need a group",
+                     "type": "missing"}
+                )
+                continue
+            options.append((line, group_name, entity))
+        else:
+            items.append(entity)
+
+    for line, group_name, option in options:
+        group = groups.get(_key(group_name))
+        if group is None:
+            # A typo must not create a group: declare it, even an existing one (name only)
+            errors.append(
+                {"loc": ["row", line, "group"],
+                 "msg": f"Option group {group_name!r} has no option_group row",
+                 "type": "value_error"}
+            )
+            continue
+        group.options.append(option)
+
+    if not errors:
+        try:
+            return MenuImport(categories=categories, option_groups=group_rows, items=items)
+        except ValidationError as e:
+            errors.extend(_validation_errors(e, "body"))
+    raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=errors)
+
+
+# ============ Import ============
+
+@dataclass
+class _Plan:
+    result: MenuImportResult
+    # New rows per table, in insert (foreign key) order
+    inserts: dict[type, list[dict]] = field(
+        default_factory=lambda: {
+            MenuCategory: [], OptionGroup: [], OptionItem: [], MenuItem: [],
+            MenuItemOptionGroup: [],
+        }
+    )
+    updates: list[tuple[object, dict[str, list]]] = field(default_factory=list)
+    relinks: list[tuple[MenuItem, list[UUID]]] = field(default_factory=list)
+    errors: list[dict] = field(default_factory=list)
+
+    def record(
+        self,
+        kind: str,
+        name: str,
+        parent: str | None,
+        current: object | None,
+        changes: dict[str, list] | None = None,
+    ) -> None:
+        if current is None:
+            self.result.created += 1
+            self.result.changes.append(
+                MenuImportChange(kind=kind, action="create", name=name, parent=parent)
+            )
+        elif changes:
+            self.result.updated += 1
+            self.result.changes.append(
+                MenuImportChange(
+                    kind=kind, action="update", name=name, parent=parent, fields=changes
+                )
+            )
+            self.updates.append((current, changes))
+        else:
+            self.result.unchanged += 1
+
+    def error(self, path: str, message: str) -> None:
+        self.errors.append({"path": path, "message": message})
+
+
+def _diff(current: object, incoming: BaseModel, fields: Iterable[str]) -> dict[str, list]:
+    """field -> [old, new] for the fields the file sets to another value."""
+    return {
+        name: [getattr(current, name), getattr(incoming, name)]
+        for name in fields
+        if name in incoming.model_fields_set and getattr(current, name) != getattr(incoming, name)
+    }
+
+
+def _by_key(objs: Iterable, key: Callable) -> dict:
+    out: dict = {}
+    for obj in objs:
+        out.setdefault(key(obj), []).append(obj)
+    return out
+
+
+class _Resolver:
+    """Name -> id over existing rows and rows created by the import."""
+
+    def __init__(self, plan: _Plan, what: str, whats: str, existing: Iterable) -> None:
+        self._plan = plan
+        self._what = what
+        self._whats = whats
+        self._existing = _by_key(existing, lambda o: _key(o.name))
+        self.ids: dict[str, UUID] = {
+            k: objs[0].id for k, objs in self._existing.items() if len(objs) == 1
+        }
+
+    def current(self, name: str, path: str) -> tuple[bool, object | None]:
+        """(ok, existing row or None); not ok when the menu has several with this name."""
+        found = self._existing.get(_key(name), [])
+        if len(found) > 1:
+            self._plan.error(path, f"Several {self._whats} named {name!r} in the menu")
+            return False, None
+        return True, (found[0] if found else None)
+
+    def resolve(self, name: str, path: str) -> UUID | None:
+        id_ = self.ids.get(_key(name))
+        if id_ is None:
+            if len(self._existing.get(_key(name), [])) > 1:
+                self._plan.error(path, f"Several {self._whats} named {name!r} in the menu")
+            else:
+                self._plan.error(path, f"Unknown {self._what} {name!r}")
+        return id_
+
+
+def plan_menu_import(
+    restaurant_id: UUID,
+    menu: MenuImport,
+    categories: list[MenuCategory],
+    groups: list[OptionGroup],
+    items: list[MenuItem],
+) -> _Plan:
+    """Validate `menu` against the current rows (groups with options, items with links)
+    and work out what to insert and update. Pure: no queries."""
+    plan = _Plan(MenuImportResult(dry_run=True))
+
+    category_names = _Resolver(plan, "category", "categories", categories)
+    seen: set[str] = set()
+    for i, incoming in enumerate(menu.categories):
+        path = f"categories[{i}]"
+        if _key(incoming.name) in seen:
+            plan.error(path, f"Category {incoming.name!r} is listed twice")
+            continue
+        seen.add(_key(incoming.name))
+        ok, current = category_names.current(incoming.name, path)
+        if not ok:
+            continue
+        if current is None:
+            row = {"id": uuid4(), "restaurant_id": restaurant_id, **incoming.model_dump()}
+            plan.inserts[MenuCategory].append(row)
+            category_names.ids[_key(incoming.name)] = row["id"]
+            plan.record("category", incoming.name, None, None)
+        else:
+            plan.record(
+                "category", incoming.name, None, current,
+                _diff(current, incoming, _CATEGORY_FIELDS),
+            )
+
+    group_names = _Resolver(plan, "option group", "option groups", groups)
+    seen = set()
+    for i, incoming in enumerate(menu.option_groups):
+        path = f"option_groups[{i}]"
+        if _key(incoming.name) in seen:
+            plan.error(path, f"Option group {incoming.name!r} is listed twice")
+            continue
+        seen.add(_key(incoming.name))
+        ok, current = group_names.current(incoming.name, path)
+        if not ok:
+            continue
+        if current is None:
+            group_id = uuid4()
+            plan.inserts[OptionGroup].append(
+                {
+                    "id": group_id,
+                    "restaurant_id": restaurant_id,
+                    **incoming.model_dump(exclude={"options"}),
+                }
+            )
+            group_names.ids[_key(incoming.name)] = group_id
+            plan.record("option_group", incoming.name, None, None)
+            existing_options: dict[str, list[OptionItem]] = {}
+        else:
+            group_id = current.id
+            plan.record(
+                "option_group", incoming.name, None, current,
+                _diff(current, incoming, _GROUP_FIELDS),
+            )
+            existing_options = _by_key(current.options, lambda o: _key(o.name))
+
+        seen_options: set[str] = set()
+        for j, option in enumerate(incoming.options):
+            option_path = f"{path}.options[{j}]"
+            key = _key(option.name)
+            if key in seen_options:
+                plan.error(option_path, f"Option {option.name!r} is listed twice")
+                continue
+            seen_options.add(key)
+            found = existing_options.get(key, [])
+            if len(found) > 1:
+                plan.error(option_path, f"Several options named {option.name!r} in the group")
+            elif not found:
+                plan.inserts[OptionItem].append(
+                    {"id": uuid4(), "group_id": group_id, **option.model_dump()}
+                )
+                plan.record("option", option.name, incoming.name, None)
+            else:
+                plan.record(
+                    "option", option.name, incoming.name, found[0],
+                    _diff(found[0], option, _OPTION_FIELDS),
+                )
+
+    group_by_id = {g.id: g.name for g in groups}
+    category_by_id = {c.id: c.name for c in categories}
+    existing_items = _by_key(items, lambda m: (m.category_id, _key(m.label)))
+    items_by_label = _by_key(items, lambda m: _key(m.label))
+    seen_items: set[tuple] = set()
+    for i, incoming in enumerate(menu.items):
+        path = f"items[{i}]"
+        category_set = "category" in incoming.model_fields_set
+        category_id = None
+        if incoming.category is not None:
+            category_id = category_names.resolve(incoming.category, f"{path}.category")
+        group_ids = [
+            group_names.resolve(name, f"{path}.option_groups") for name in incoming.option_groups
+        ]
+        if None in group_ids or (incoming.category is not None and category_id is None):
+            continue
+        group_ids = list(dict.fromkeys(group_ids))
+
+        # Without a category, the label alone must name at most one item
+        if category_set:
+            found = existing_items.get((category_id, _key(incoming.label)), [])
+            where = "in the category"
+        else:
+            found = items_by_label.get(_key(incoming.label), [])
+            where = "in the menu; give its category"
+        if len(found) > 1:
+            plan.error(path, f"Several items labelled {incoming.label!r} {where}")
+            continue
+        key = ("existing", found[0].id) if found else ("new", category_id, _key(incoming.label))
+        if key in seen_items:
+            plan.error(path, f"Item {incoming.label!r} is listed twice")
+            continue
+        seen_items.add(key)
+        if not found:
+            item_id = uuid4()
+            plan.inserts[MenuItem].append(
+                {
+                    "id": item_id,
+                    "restaurant_id": restaurant_id,
+                    "category_id": category_id,
+                    **incoming.model_dump(exclude={"category", "option_groups"}),
+                }
+            )
+            plan.inserts[MenuItemOptionGroup].extend(
+                {"menu_item_id": item_id, "option_group_id": g, "position": p}
+                for p, g in enumerate(group_ids)
+            )
+            plan.record("item", incoming.label, incoming.category, None)
+            continue
+        current = found[0]
+        category_name = (
+            incoming.category if category_set else category_by_id.get(current.category_id)
+        )
+        changes = _diff(current, incoming, _ITEM_FIELDS)
+        if "option_groups" in incoming.model_fields_set and current.option_group_ids != group_ids:
+            changes["option_groups"] = [
+                [group_by_id.get(g) for g in current.option_group_ids], incoming.option_groups
+            ]
+            plan.relinks.append((current, group_ids))
+        plan.record("item", incoming.label, category_name, current, changes)
+
+    return plan
+
+
+async def import_menu(
+    db: AsyncSession, restaurant_id: UUID, menu: MenuImport, dry_run: bool = False
+) -> MenuImportResult:
+    """Validate the whole menu, then (unless `dry_run`) write it: one INSERT per table for
+    new rows (SQLAlchemy batches the VALUES), ORM updates for changed ones, one search
+    vector refresh and one menu version bump. All in the request's transaction."""
+    r = await db.execute(select(MenuCategory).where(MenuCategory.restaurant_id == restaurant_id))
+    categories = list(r.scalars())
+    r = await db.execute(
+        select(OptionGroup)
+        .where(OptionGroup.restaurant_id == restaurant_id)
+        .options(selectinload(OptionGroup.options))
+    )
+    groups = list(r.scalars())
+    r = await db.execute(
+        select(MenuItem)
+        .where(MenuItem.restaurant_id == restaurant_id)
+        .options(selectinload(MenuItem.option_group_links))
+    )
+    items = list(r.scalars())
+
+    plan = plan_menu_import(restaurant_id, menu, categories, groups, items)
+    if plan.errors:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Invalid menu import", "errors": plan.errors},
+        )
+    plan.result.dry_run = dry_run
+    if dry_run or not (plan.result.created or plan.result.updated):
+        return plan.result
+
+    for model, rows in plan.inserts.items():
+        if rows:
+            await db.execute(insert(model), rows)
+    for current, changes in plan.updates:
+        for name, (_, new) in changes.items():
+            if name != "option_groups":
+                setattr(current, name, new)
+    for item, group_ids in plan.relinks:
+        reuse = {link.option_group_id: link for link in item.option_group_links}
+        links = []
+        for position, group_id in enumerate(group_ids):
+            link = reuse.get(group_id) or MenuItemOptionGroup(option_group_id=group_id)
+            link.position = position
+            links.append(link)
+        item.option_group_links = links
+    await refresh_search_vectors(db, restaurant_id)
+    # The new version makes cached snapshots, option rules and order matchers rebuild
+    await menu_changed(db, restaurant_id)
+    return plan.result
+
+
+# ============ Export ============
+
+def _csv_row(kind: str, entity: BaseModel, **extra: str) -> dict:
+    row = {"type": kind, **extra}
+    for column, name in _CSV_FIELDS[kind].items():
+        value = getattr(entity, name)
+        if value is None:
+            continue
+        if name == "ingredients":
+            value = json.dumps(value, ensure_ascii=False)
+        elif isinstance(value, list):
+            value = LIST_SEPARATOR.join(value)
+        elif isinstance(value, bool):
+            value = "true" if value else "false"
+        row[column] = value
+    return row
+
+
+async def _item_batches(
+    rows: AsyncResult, category_names: dict[UUID, str]
+) -> AsyncIterator[list[MenuImportItem]]:
+    async for partition in rows.partitions():
+        yield [
+            MenuImportItem(
+                label=item.label,
+                category=category_names.get(item.category_id),
+                description=item.description,
+                price=item.price,
+                image_url=item.image_url,
+                is_active=item.is_active,
+                display_order=item.display_order,
+                tags=item.tags,
+                ingredients=item.ingredients,
+                option_groups=group_names or [],
+            )
+            for item, group_names in partition
+        ]
+
+
+async def export_menu(restaurant_id: UUID, fmt: str = "json") -> AsyncIterator[str]:
+    """Stream the menu in the import format (`json` or `csv`).
+
+    Categories and groups are small and loaded first; items are read from a server-side
+    cursor EXPORT_BATCH at a time. Uses its own read session, since the response body is
+    sent after the request's dependencies are done.
+    """
+    async with read_session_maker() as db:
+        r = await db.execute(
+            select(MenuCategory)
+            .where(MenuCategory.restaurant_id == restaurant_id)
+            .order_by(MenuCategory.display_order, MenuCategory.name, MenuCategory.id)
+        )
+        rows = list(r.scalars())
+        categories = [MenuCategoryCreate.model_validate(c, from_attributes=True) for c in rows]
+        category_names = {c.id: c.name for c in rows}
+        r = await db.execute(
+            select(OptionGroup)
+            .where(OptionGroup.restaurant_id == restaurant_id)
+            .options(selectinload(OptionGroup.options))
+            .order_by(OptionGroup.name, OptionGroup.id)
+        )
+        groups = []
+        for g in r.scalars():
+            group = MenuImportOptionGroup.model_validate(g, from_attributes=True)
+            group.options.sort(key=lambda o: o.name)
+            groups.append(group)
+
+        item_groups = (
+            select(
+                func.array_agg(aggregate_order_by(OptionGroup.name, MenuItemOptionGroup.position))
+            )
+            .select_from(MenuItemOptionGroup)
+            .join(OptionGroup, OptionGroup.id == MenuItemOptionGroup.option_group_id)
+            .where(MenuItemOptionGroup.menu_item_id == MenuItem.id)
+            .scalar_subquery()
+        )
+        rows = await db.stream(
+            select(MenuItem, item_groups)
+            .where(MenuItem.restaurant_id == restaurant_id)
+            .order_by(MenuItem.display_order, MenuItem.label, MenuItem.id)
+            .execution_options(yield_per=EXPORT_BATCH)
+        )
+        batches = _item_batches(rows, category_names)
+
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS)
+            writer.writeheader()
+            writer.writerows(_csv_row("category", c) for c in categories)
+            for group in groups:
+                writer.writerow(_csv_row("option_group", group))
+                writer.writerows(_csv_row("option", o, group=group.name) for o in group.options)
+            async for batch in batches:
+                writer.writerows(_csv_row("item", item) for item in batch)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+            return
+
+        head = MenuImport(categories=categories, option_groups=groups).model_dump_json(
+            exclude={"items"}
+        )
+        yield head[:-1] + ',"items":['  # reopen the object for the streamed items
+        separator = ""
+        async for batch in batches:
+            if batch:
+                yield separator + ",".join(item.model_dump_json() for item in batch)
+                separator = ","
+        yield "]}"
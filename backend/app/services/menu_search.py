@@ -0,0 +1,139 @@
+"""Menu search: full-text (`menu_items.search_vector`) plus trigram similarity on labels.
+
+Both are GIN-indexed (migration 009), as is `tags` for containment filters. The vector is
+derived from the item and its active options, so menu writes call
+`refresh_search_vectors` for the items they touch.
+"""
+import re
+from collections.abc import Iterable
+from uuid import UUID
+
+from sqlalchemy import Float, func, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.models.menu import MenuItem, MenuItemOptionGroup, OptionGroup, OptionItem
+
+# Menus mix French and English (and dish names in neither): no stemming, no stop words
+SEARCH_CONFIG = "simple"
+
+_WORD = re.compile(r"\w+")
+
+
+def _weighted(text, weight: str):
+    return func.setweight(
+        func.to_tsvector(SEARCH_CONFIG, func.coalesce(text, "")), weight, type_=TSVECTOR
+    )
+
+
+def _option_names():
+    return (
+        select(func.string_agg(OptionItem.name, " "))
+        .join(MenuItemOptionGroup, MenuItemOptionGroup.option_group_id == OptionItem.group_id)
+        .join(OptionGroup, OptionGroup.id == OptionItem.group_id)
+        .where(
+            MenuItemOptionGroup.menu_item_id == MenuItem.id,
+            OptionItem.is_active.is_(True),
+            OptionGroup.is_active.is_(True),
+        )
+        .scalar_subquery()
+    )
+
+
+async def refresh_search_vectors(
+    db: AsyncSession,
+    restaurant_id: UUID,
+    item_ids: Iterable[UUID] | None = None,
+    group_id: UUID | None = None,
+) -> None:
+    """Recompute the vectors of `item_ids`, of the items offering `group_id`, or (neither
+    given) of the whole restaurant, in one UPDATE. Flushes pending changes first."""
+    await db.flush()
+    stmt = update(MenuItem).where(MenuItem.restaurant_id == restaurant_id)
+    if item_ids is not None:
+        item_ids = list(item_ids)
+        if not item_ids:
+            return
+        stmt = stmt.where(MenuItem.id.in_(item_ids))
+    if group_id is not None:
+        stmt = stmt.where(
+            MenuItem.id.in_(
+                select(MenuItemOptionGroup.menu_item_id).where(
+                    MenuItemOptionGroup.option_group_id == group_id
+                )
+            )
+        )
+    vector = (
+        _weighted(MenuItem.label, "A")
+        .op("||")(_weighted(func.array_to_string(MenuItem.tags, " "), "B"))
+        .op("||")(_weighted(_option_names(), "C"))
+        .op("||")(_weighted(MenuItem.description, "D"))
+    )
+    await db.execute(
+        stmt.values(search_vector=vector).execution_options(synchronize_session=False)
+    )
+
+
+def prefix_query(text: str) -> str | None:
+    """`tacos poul` -> `tacos:* & poul:*` (as-you-type matching); None if no words."""
+    words = _WORD.findall(text.lower())
+    return " & ".join(f"{w}:*" for w in words) if words else None
+
+
+async def search_menu_items(
+    db: AsyncSession,
+    restaurant_id: UUID,
+    q: str | None = None,
+    tags: list[str] | None = None,
+    active_only: bool = True,
+    offset: int = 0,
+    limit: int = 20,
+) -> tuple[int, list[tuple[MenuItem, float]]]:
+    """(total matches, page of (item, rank)), best first.
+
+    An item matches when every word of `q` prefixes a word of its label, tags, options or
+    description, or when `q` is similar to a word run of its label (typos). Rank adds the
+    full-text rank and that similarity. The total comes from a window count, so one
+    round trip (plus one for the items' option group links).
+    """
+    query = select(MenuItem).where(MenuItem.restaurant_id == restaurant_id)
+    if active_only:
+        query = query.where(MenuItem.is_active.is_(True))
+    if tags:
+        query = query.where(MenuItem.tags.contains(tags))
+
+    ts_query = prefix_query(q) if q else None
+    if ts_query is not None:
+        tsq = func.to_tsquery(SEARCH_CONFIG, ts_query)
+        needle = literal(q.strip())
+        query = query.where(
+            or_(
+                MenuItem.search_vector.op("@@")(tsq),
+                # word_similarity(q, label) above pg_trgm.word_similarity_threshold (0.6)
+                MenuItem.label.op("%>")(needle),
+            )
+        )
+        rank = func.ts_rank(MenuItem.search_vector, tsq, type_=Float) + func.word_similarity(
+            needle, MenuItem.label, type_=Float
+        )
+        order = (rank.desc(), MenuItem.label, MenuItem.id)
+    elif q:
+        return 0, []
+    else:
+        rank = literal(0.0, Float)
+        order = (MenuItem.display_order, MenuItem.label, MenuItem.id)
+
+    r = await db.execute(
+        query.add_columns(rank.label("rank"), func.count().over().label("total"))
+        .options(selectinload(MenuItem.option_group_links))
+        .order_by(*order)
+        .offset(offset)
+        .limit(limit)
+    )
+    rows = r.all()
+    if not rows and offset:
+        # Past the last page: the window count is not available, ask for it
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        return total or 0, []
+    return (rows[0].total if rows else 0), [(row.MenuItem, row.rank) for row in rows]
@@ -0,0 +1,182 @@
+import hashlib
+import logging
+from dataclasses import dataclass
+from uuid import UUID
+
+from redis.exceptions import RedisError
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import after_commit
+from app.core.redis import get_redis
+from app.models.menu import MenuCategory, MenuItem, OptionGroup
+from app.models.restaurant import Restaurant
+from app.schemas.menu import (
+    MenuCategoryRead,
+    MenuItemRead,
+    MenuSnapshot,
+    MenuSnapshotCategory,
+    MenuSnapshotItem,
+    OptionGroupWithItems,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CompiledSnapshot:
+    version: int
+    etag: str
+    body: bytes
+
+
+class MenuSnapshotCache:
+    """Compiled snapshot per restaurant, valid for one menu_version.
+
+    In-process first; with Redis enabled, a hash per restaurant lets other workers reuse
+    the compiled body. Redis is only a cache: when it fails, the snapshot is recompiled.
+    """
+
+    def __init__(self) -> None:
+        self._local = TTLCache(
+            maxsize=settings.menu_snapshot_cache_size, ttl=settings.menu_snapshot_ttl
+        )
+
+    @staticmethod
+    def _redis_key(restaurant_id: UUID) -> str:
+        return f"menu-snapshot:{restaurant_id}"
+
+    async def get(self, restaurant_id: UUID, version: int) -> CompiledSnapshot | None:
+        snap = self._local.get(restaurant_id)
+        if snap is not None and snap.version == version:
+            return snap
+        redis = get_redis()
+        if redis is None:
+            return None
+        try:
+            raw = await redis.hgetall(self._redis_key(restaurant_id))
+        except RedisError:
+            logger.warning("Menu snapshot cache read failed, recompiling", exc_info=True)
+            return None
+        if not raw or int(raw["version"]) != version:
+            return None
+        snap = CompiledSnapshot(version=version, etag=raw["etag"], body=raw["body"].encode())
+        self._local.set(restaurant_id, snap)
+        return snap
+
+    async def set(self, restaurant_id: UUID, snap: CompiledSnapshot) -> None:
+        self._local.set(restaurant_id, snap)
+        redis = get_redis()
+        if redis is None:
+            return
+        key = self._redis_key(restaurant_id)
+        try:
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.hset(
+                    key,
+                    mapping={
+                        "version": snap.version,
+                        "etag": snap.etag,
+                        "body": snap.body.decode(),
+                    },
+                )
+                pipe.expire(key, settings.menu_snapshot_ttl)
+                await pipe.execute()
+        except RedisError:
+            logger.warning("Menu snapshot cache write failed", exc_info=True)
+
+    async def invalidate(self, restaurant_id: UUID) -> None:
+        self._local.pop(restaurant_id)
+        redis = get_redis()
+        if redis is None:
+            return
+        try:
+            await redis.delete(self._redis_key(restaurant_id))
+        except RedisError:
+            # A stale Redis entry is never served: get() checks it against menu_version
+            logger.warning(
+                "Menu snapshot cache invalidation of %s failed", restaurant_id, exc_info=True
+            )
+
+
+menu_snapshots = MenuSnapshotCache()
+
+
+async def menu_changed(db: AsyncSession, restaurant_id: UUID) -> int:
+    """Bump the restaurant's menu_version; compiled menu caches are dropped after commit.
+
+    Returns the new version (for caches patched in place, see order_matcher).
+    """
+    version = await db.scalar(
+        update(Restaurant)
+        .where(Restaurant.id == restaurant_id)
+        .values(menu_version=Restaurant.menu_version + 1)
+        .returning(Restaurant.menu_version)
+    )
+    after_commit(db, lambda: menu_snapshots.invalidate(restaurant_id))
+    return version
+
+
+async def compile_menu_snapshot(db: AsyncSession, restaurant: Restaurant) -> CompiledSnapshot:
+    """Build the nested menu (categories -> items -> option groups -> options) in 4 queries."""
+    rid = restaurant.id
+    r = await db.execute(
+        select(MenuCategory)
+        .where(MenuCategory.restaurant_id == rid)
+        .order_by(MenuCategory.display_order, MenuCategory.name, MenuCategory.id)
+    )
+    categories = list(r.scalars().all())
+    r = await db.execute(
+        select(OptionGroup)
+        .where(OptionGroup.restaurant_id == rid)
+        .options(selectinload(OptionGroup.options))
+    )
+    groups: dict[UUID, OptionGroupWithItems] = {}
+    for g in r.scalars().all():
+        out = OptionGroupWithItems.model_validate(g)
+        out.options.sort(key=lambda o: (o.name, str(o.id)))
+        groups[g.id] = out
+    r = await db.execute(
+        select(MenuItem)
+        .where(MenuItem.restaurant_id == rid)
+        .options(selectinload(MenuItem.option_group_links))
+        .order_by(MenuItem.display_order, MenuItem.label, MenuItem.id)
+    )
+
+    by_category: dict[UUID | None, list[MenuSnapshotItem]] = {}
+    for mi in r.scalars().all():
+        item = MenuSnapshotItem(
+            **MenuItemRead.model_validate(mi).__dict__,
+            option_groups=[groups[g] for g in mi.option_group_ids if g in groups],
+        )
+        by_category.setdefault(mi.category_id, []).append(item)
+
+    known = {c.id for c in categories}
+    snapshot = MenuSnapshot(
+        restaurant_id=rid,
+        version=restaurant.menu_version,
+        categories=[
+            MenuSnapshotCategory(
+                **MenuCategoryRead.model_validate(c).__dict__,
+                items=by_category.get(c.id, []),
+            )
+            for c in categories
+        ],
+        uncategorized_items=[
+            item for cid, items in by_category.items() if cid not in known for item in items
+        ],
+    )
+    body = snapshot.model_dump_json().encode()
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return CompiledSnapshot(version=restaurant.menu_version, etag=etag, body=body)
+
+
+async def get_menu_snapshot(db: AsyncSession, restaurant: Restaurant) -> CompiledSnapshot:
+    snap = await menu_snapshots.get(restaurant.id, restaurant.menu_version)
+    if snap is None:
+        snap = await compile_menu_snapshot(db, restaurant)
+        await menu_snapshots.set(restaurant.id, snap)
+    return snap
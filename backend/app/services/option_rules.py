@@ -0,0 +1,186 @@
+"""Option selection rules (which groups an item offers, min/max per group), compiled per
+restaurant and checked in memory when orders are created."""
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from decimal import Decimal
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.menu import MenuItem, MenuItemOptionGroup, OptionGroup, OptionItem
+from app.models.restaurant import Restaurant
+
+
+@dataclass(frozen=True, slots=True)
+class GroupRule:
+    id: UUID
+    name: str
+    min_select: int
+    max_select: int
+
+
+@dataclass(frozen=True, slots=True)
+class OptionRef:
+    id: UUID
+    group_id: UUID
+    name: str
+    price_extra: Decimal
+
+
+@dataclass(frozen=True, slots=True)
+class OptionError:
+    line: int  # index in the order's items
+    menu_item_id: UUID
+    code: str  # unknown_option | not_offered | too_few | too_many
+    message: str
+    group_id: UUID | None = None
+    option_id: UUID | None = None
+
+    def as_dict(self) -> dict:
+        return {
+            "line": self.line,
+            "menu_item_id": str(self.menu_item_id),
+            "code": self.code,
+            "message": self.message,
+            "group_id": str(self.group_id) if self.group_id else None,
+            "option_id": str(self.option_id) if self.option_id else None,
+        }
+
+
+_NOTHING_OFFERED: tuple[tuple[GroupRule, ...], frozenset[UUID]] = ((), frozenset())
+
+
+class OptionRules:
+    """Compiled from the restaurant's item -> group links (in position order), active option
+    groups and active options.
+
+    Inactive groups are neither offered nor enforced; options of inactive groups are unknown.
+    """
+
+    def __init__(
+        self,
+        links: Iterable[tuple[UUID, UUID]],
+        groups: Iterable[OptionGroup],
+        options: Iterable[OptionItem],
+    ) -> None:
+        rules = {
+            g.id: GroupRule(g.id, g.name, g.min_select, g.max_select)
+            for g in groups
+            if g.is_active
+        }
+        self.options: dict[UUID, OptionRef] = {
+            o.id: OptionRef(o.id, o.group_id, o.name, o.price_extra)
+            for o in options
+            if o.is_active and o.group_id in rules
+        }
+        # menu item -> (offered groups in the item's order, their ids)
+        self.item_groups: dict[UUID, tuple[tuple[GroupRule, ...], frozenset[UUID]]] = {}
+        offered: dict[UUID, list[GroupRule]] = {}
+        for item_id, group_id in links:
+            rule = rules.get(group_id)
+            if rule is not None:
+                offered.setdefault(item_id, []).append(rule)
+        for item_id, item_rules in offered.items():
+            self.item_groups[item_id] = (tuple(item_rules), frozenset(r.id for r in item_rules))
+
+    def check(
+        self, lines: Sequence[tuple[UUID, Sequence[UUID]]]
+    ) -> tuple[list[list[OptionRef]], list[OptionError]]:
+        """For (menu_item_id, option_ids) per line: the resolved options and every error."""
+        resolved: list[list[OptionRef]] = []
+        errors: list[OptionError] = []
+        for index, (item_id, option_ids) in enumerate(lines):
+            groups, offered = self.item_groups.get(item_id, _NOTHING_OFFERED)
+            counts: dict[UUID, int] = {}
+            chosen: list[OptionRef] = []
+            for oid in dict.fromkeys(option_ids):
+                opt = self.options.get(oid)
+                if opt is None:
+                    errors.append(
+                        OptionError(
+                            index, item_id, "unknown_option",
+                            "Option not found or inactive", option_id=oid,
+                        )
+                    )
+                elif opt.group_id not in offered:
+                    errors.append(
+                        OptionError(
+                            index, item_id, "not_offered",
+                            f"{opt.name} is not offered for this item",
+                            group_id=opt.group_id, option_id=oid,
+                        )
+                    )
+                else:
+                    counts[opt.group_id] = counts.get(opt.group_id, 0) + 1
+                    chosen.append(opt)
+            for g in groups:
+                n = counts.get(g.id, 0)
+                if n < g.min_select:
+                    errors.append(
+                        OptionError(
+                            index, item_id, "too_few",
+                            f"{g.name}: choose at least {g.min_select}", group_id=g.id,
+                        )
+                    )
+                elif n > g.max_select:
+                    errors.append(
+                        OptionError(
+                            index, item_id, "too_many",
+                            f"{g.name}: choose at most {g.max_select}", group_id=g.id,
+                        )
+                    )
+            resolved.append(chosen)
+        return resolved, errors
+
+
+class OptionRulesCache:
+    """Per-worker compiled rules, valid for one restaurant menu_version."""
+
+    def __init__(self) -> None:
+        self._cache = TTLCache(
+            maxsize=settings.menu_snapshot_cache_size, ttl=settings.menu_snapshot_ttl
+        )
+
+    def get(self, restaurant_id: UUID, menu_version: int) -> OptionRules | None:
+        entry = self._cache.get(restaurant_id)
+        if entry is None or entry[0] != menu_version:
+            return None
+        return entry[1]
+
+    def set(self, restaurant_id: UUID, menu_version: int, rules: OptionRules) -> None:
+        self._cache.set(restaurant_id, (menu_version, rules))
+
+
+option_rules_cache = OptionRulesCache()
+
+
+async def load_option_rules(db: AsyncSession, restaurant_id: UUID) -> OptionRules:
+    """Three narrow queries (item links, groups, options), then one in-memory pass."""
+    r = await db.execute(
+        select(MenuItemOptionGroup.menu_item_id, MenuItemOptionGroup.option_group_id)
+        .join(MenuItem, MenuItem.id == MenuItemOptionGroup.menu_item_id)
+        .where(MenuItem.restaurant_id == restaurant_id)
+        .order_by(MenuItemOptionGroup.menu_item_id, MenuItemOptionGroup.position)
+    )
+    links = [tuple(row) for row in r.all()]
+    r = await db.execute(select(OptionGroup).where(OptionGroup.restaurant_id == restaurant_id))
+    groups = list(r.scalars().all())
+    r = await db.execute(
+        select(OptionItem)
+        .join(OptionGroup, OptionGroup.id == OptionItem.group_id)
+        .where(OptionGroup.restaurant_id == restaurant_id)
+    )
+    options = list(r.scalars().all())
+    return OptionRules(links, groups, options)
+
+
+async def get_option_rules(db: AsyncSession, restaurant_id: UUID) -> OptionRules:
+    restaurant = await db.get(Restaurant, restaurant_id)
+    rules = option_rules_cache.get(restaurant_id, restaurant.menu_version)
+    if rules is None:
+        rules = await load_option_rules(db, restaurant_id)
+        option_rules_cache.set(restaurant_id, restaurant.menu_version, rules)
+    return rules
@@ -0,0 +1,590 @@
+"""Natural-language order matching: "2 tacos XL poulet sauce algérienne, un coca" -> draft lines.
+
+Each restaurant gets a `MenuMatcher`: token postings for active item labels, category names,
+option and option group names, plus a character-trigram index over that vocabulary for typos
+and truncated words. It is built once, then patched in place by the menu routes after each
+commit (`order_matchers.patch`), so menu edits do not rebuild it. Matching is one greedy
+left-to-right pass over the utterance: quantities (digits or French/English number words)
+open the next line, item names open a line, option names attach to the current line.
+"""
+import heapq
+import re
+import unicodedata
+from collections import Counter
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import after_commit
+from app.models.menu import MenuCategory, MenuItem, OptionGroup, OptionItem
+from app.models.restaurant import Restaurant
+
+_TOKEN = re.compile(r"[a-z]+|\d+")
+
+NUMBER_WORDS = {
+    # French
+    "un": 1, "une": 1, "deux": 2, "trois": 3, "quatre": 4, "cinq": 5, "six": 6, "sept": 7,
+    "huit": 8, "neuf": 9, "dix": 10, "onze": 11, "douze": 12, "quinze": 15, "vingt": 20,
+    # English
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "dozen": 12,
+}
+MAX_QUANTITY = 99
+# "2 x tacos", "tacos x2", "deux fois"
+MULTIPLIERS = frozenset({"x", "fois", "times"})
+# "sans oignons": a removal, which an order line cannot express; reported as unmatched
+NEGATIONS = frozenset({"sans", "without", "no", "pas"})
+FILLER = frozenset({
+    "de", "du", "des", "d", "la", "le", "les", "l", "au", "aux", "avec", "et", "puis", "plus",
+    "pour", "moi", "je", "j", "voudrais", "veux", "prends", "prendre", "mettez", "mets",
+    "svp", "s", "il", "vous", "plait", "merci", "aussi", "encore", "autre", "autres",
+    "and", "with", "of", "the", "some", "for", "me", "i", "like", "want", "would",
+    "to", "get", "have", "please", "also", "another", "more", "then", "extra",
+})
+
+FUZZY_MIN_LENGTH = 4
+FUZZY_MIN_SCORE = 0.55
+PREFIX_MIN_LENGTH = 3
+_CANON_CACHE_SIZE = 10_000
+# Item candidates fully checked per position, and how far ahead they are pre-ranked
+_SHORTLIST = 8
+_WINDOW = 6
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase, strip accents, split into letter runs and digit runs ("33cl" -> 33, cl)."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return _TOKEN.findall("".join(c for c in text if not unicodedata.combining(c)))
+
+
+def stem(token: str) -> str:
+    """Drop a plural s/x so "tacos"/"taco", "frites"/"frite" and "cocas"/"coca" meet."""
+    if len(token) > 3 and token[-1] in "sx":
+        return token[:-1]
+    return token
+
+
+def _grams(token: str) -> frozenset[str]:
+    padded = f"#{token}#"
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (a swap counts as one edit), capped at limit + 1."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: list[int] = []
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        row = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            row[j] = min(prev[j] + 1, row[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                row[j] = min(row[j], prev2[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+        prev2, prev = prev, row
+    return prev[-1]
+
+
+def _name_tokens(name: str) -> frozenset[str]:
+    return frozenset(stem(t) for t in tokenize(name))
+
+
+@dataclass(slots=True)
+class _Entry:
+    """An active menu item (parent = category) or option (parent = group).
+
+    The index keys everything by `UUID.int`: hashing ints is several times cheaper than
+    hashing UUID objects, which dominates posting-list work.
+    """
+
+    id: UUID
+    name: str
+    tokens: frozenset[str]
+    parent: int | None
+    rank: tuple = ()  # tie-break, lower first
+    groups: tuple[int, ...] = ()  # items: offered option groups
+
+
+@dataclass(slots=True)
+class _Match:
+    entry: _Entry
+    end: int  # index after the last consumed token
+    hits: int  # own-name tokens matched
+    alternatives: list[UUID]
+
+
+@dataclass
+class MatchedLine:
+    menu_item_id: UUID
+    label: str
+    quantity: int
+    start: int
+    end: int
+    option_ids: list[UUID] = field(default_factory=list)
+    options: list[str] = field(default_factory=list)
+    alternatives: list[UUID] = field(default_factory=list)
+    matched_text: str = ""
+
+
+@dataclass
+class MatchResult:
+    lines: list[MatchedLine]
+    unmatched: list[str]
+
+
+class MenuMatcher:
+    def __init__(self) -> None:
+        self.items: dict[int, _Entry] = {}
+        self.options: dict[int, _Entry] = {}
+        self.categories: dict[int, frozenset[str]] = {}
+        self.groups: dict[int, frozenset[str]] = {}  # active groups only
+        self._item_postings: dict[str, set[int]] = {}
+        self._category_postings: dict[str, set[int]] = {}
+        self._category_items: dict[int, set[int]] = {}
+        self._option_postings: dict[str, set[int]] = {}
+        self._group_postings: dict[str, set[int]] = {}
+        self._group_options: dict[int, set[int]] = {}
+        self._vocab: Counter[str] = Counter()
+        self._gram_postings: dict[str, set[str]] = {}
+        self._canon: dict[str, str | None] = {}
+
+    # ---- vocabulary -------------------------------------------------------------------
+
+    def _add_vocab(self, tokens: Iterable[str]) -> None:
+        for t in tokens:
+            self._vocab[t] += 1
+            if self._vocab[t] == 1:
+                for g in _grams(t):
+                    self._gram_postings.setdefault(g, set()).add(t)
+                self._canon.clear()
+
+    def _remove_vocab(self, tokens: Iterable[str]) -> None:
+        for t in tokens:
+            self._vocab[t] -= 1
+            if self._vocab[t] <= 0:
+                del self._vocab[t]
+                for g in _grams(t):
+                    bucket = self._gram_postings.get(g)
+                    if bucket is not None:
+                        bucket.discard(t)
+                        if not bucket:
+                            del self._gram_postings[g]
+                self._canon.clear()
+
+    def canonical(self, word: str) -> str | None:
+        """The vocabulary token for an utterance word: exact, then prefix, then trigram."""
+        if word in self._canon:
+            return self._canon[word]
+        token = stem(word)
+        best: str | None = token if token in self._vocab else None
+        if best is None and len(token) >= PREFIX_MIN_LENGTH:
+            grams = _grams(token)
+            shared: Counter[str] = Counter()
+            for g in grams:
+                shared.update(self._gram_postings.get(g, ()))
+            best_score = 0.0
+            for candidate, common in shared.items():
+                if candidate.startswith(token):
+                    score = 1.0 + 1 / len(candidate)  # a truncated word: shortest completion
+                elif len(token) >= FUZZY_MIN_LENGTH:
+                    score = 2 * common / (len(grams) + len(_grams(candidate)))
+                    if score < FUZZY_MIN_SCORE:
+                        # Trigrams miss swapped letters ("pouelt"): allow one edit
+                        if len(token) < 5 or _edit_distance(token, candidate, 1) > 1:
+                            continue
+                        score = FUZZY_MIN_SCORE
+                else:
+                    continue
+                if score > best_score or (score == best_score and candidate < best):
+                    best, best_score = candidate, score
+        if len(self._canon) >= _CANON_CACHE_SIZE:
+            self._canon.clear()
+        self._canon[word] = best
+        return best
+
+    # ---- incremental updates ----------------------------------------------------------
+
+    @staticmethod
+    def _post(postings: dict[str, set[int]], tokens: Iterable[str], key: int) -> None:
+        for t in tokens:
+            postings.setdefault(t, set()).add(key)
+
+    @staticmethod
+    def _unpost(postings: dict[str, set[int]], tokens: Iterable[str], key: int) -> None:
+        for t in tokens:
+            bucket = postings.get(t)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del postings[t]
+
+    def set_category(self, category: MenuCategory) -> None:
+        self.remove_category(category.id, keep_items=True)
+        key = category.id.int
+        tokens = _name_tokens(category.name)
+        self.categories[key] = tokens
+        self._post(self._category_postings, tokens, key)
+        self._add_vocab(tokens)
+
+    def remove_category(self, category_id: UUID, keep_items: bool = False) -> None:
+        key = category_id.int
+        tokens = self.categories.pop(key, None)
+        if tokens is not None:
+            self._unpost(self._category_postings, tokens, key)
+            self._remove_vocab(tokens)
+        if not keep_items:
+            # Items of a deleted category become uncategorized (ON DELETE SET NULL)
+            for item_key in self._category_items.pop(key, ()):
+                self.items[item_key].parent = None
+
+    def set_group(self, group: OptionGroup) -> None:
+        """Options of an inactive group stay indexed but are never matched."""
+        key = group.id.int
+        self._remove_group_name(key)
+        if not group.is_active:
+            return
+        tokens = _name_tokens(group.name)
+        self.groups[key] = tokens
+        self._post(self._group_postings, tokens, key)
+        self._add_vocab(tokens)
+
+    def _remove_group_name(self, key: int) -> None:
+        tokens = self.groups.pop(key, None)
+        if tokens is not None:
+            self._unpost(self._group_postings, tokens, key)
+            self._remove_vocab(tokens)
+
+    def remove_group(self, group_id: UUID) -> None:
+        key = group_id.int
+        self._remove_group_name(key)
+        for option_key in list(self._group_options.get(key, ())):
+            self.remove_option(self.options[option_key].id)
+        self._group_options.pop(key, None)
+
+    def set_option(self, option: OptionItem) -> None:
+        self.remove_option(option.id)
+        if not option.is_active:
+            return
+        key = option.id.int
+        entry = _Entry(
+            option.id, option.name, _name_tokens(option.name), option.group_id.int,
+            (option.name, str(option.id)),
+        )
+        self.options[key] = entry
+        self._post(self._option_postings, entry.tokens, key)
+        self._group_options.setdefault(entry.parent, set()).add(key)
+        self._add_vocab(entry.tokens)
+
+    def remove_option(self, option_id: UUID) -> None:
+        key = option_id.int
+        entry = self.options.pop(key, None)
+        if entry is None:
+            return
+        self._unpost(self._option_postings, entry.tokens, key)
+        self._group_options.get(entry.parent, set()).discard(key)
+        self._remove_vocab(entry.tokens)
+
+    def set_item(self, item: MenuItem) -> None:
+        self.remove_item(item.id)
+        if not item.is_active:
+            return
+        key = item.id.int
+        entry = _Entry(
+            item.id,
+            item.label,
+            _name_tokens(item.label),
+            item.category_id.int if item.category_id else None,
+            (item.display_order, item.label, str(item.id)),
+            tuple(g.int for g in item.option_group_ids),
+        )
+        self.items[key] = entry
+        self._post(self._item_postings, entry.tokens, key)
+        if entry.parent is not None:
+            self._category_items.setdefault(entry.parent, set()).add(key)
+        self._add_vocab(entry.tokens)
+
+    def remove_item(self, item_id: UUID) -> None:
+        key = item_id.int
+        entry = self.items.pop(key, None)
+        if entry is None:
+            return
+        self._unpost(self._item_postings, entry.tokens, key)
+        if entry.parent is not None:
+            self._category_items.get(entry.parent, set()).discard(key)
+        self._remove_vocab(entry.tokens)
+
+    # ---- matching ---------------------------------------------------------------------
+
+    @staticmethod
+    def _best(
+        candidates: Iterable[_Entry],
+        canon: list[str | None],
+        start: int,
+        context: Callable[[_Entry], frozenset[str]],
+        trailing_context: bool = True,
+    ) -> _Match | None:
+        """Longest run from `start` of tokens in a candidate's name (or its category/group
+        name, which may be said around it); at least one must come from the name."""
+        scored = []
+        for entry in candidates:
+            extra = context(entry)
+            hit: set[str] = set()
+            end = last_hit = start
+            while end < len(canon):
+                token = canon[end]
+                if token in entry.tokens:
+                    hit.add(token)
+                    last_hit = end + 1
+                elif token is None or token not in extra:
+                    break
+                end += 1
+            if not trailing_context:
+                end = last_hit
+            if hit:
+                key = (-len(hit), -len(hit) / len(entry.tokens), -(end - start), entry.rank)
+                scored.append((key, end, entry))
+        if not scored:
+            return None
+        scored.sort(key=lambda s: s[0])
+        key, end, entry = scored[0]
+        alternatives = [e.id for k, _, e in scored[1:4] if k[0] == key[0]]
+        return _Match(entry, end, -key[0], alternatives)
+
+    def _match_item(self, canon: list[str | None], start: int) -> _Match | None:
+        token = canon[start]
+        ids = set(self._item_postings.get(token, ()))
+        for category_id in self._category_postings.get(token, ()):
+            ids |= self._category_items.get(category_id, set())
+        if len(ids) > _SHORTLIST:
+            # Many items share the first word ("tacos ..."): keep those naming the most
+            # of the next few words before checking contiguity
+            said = Counter()
+            for t in set(canon[start : start + _WINDOW]):
+                if t is not None:
+                    said.update(self._item_postings.get(t, ()))
+            ids = heapq.nsmallest(
+                _SHORTLIST,
+                ids,
+                key=lambda i: (-said[i], len(self.items[i].tokens), self.items[i].rank),
+            )
+        empty: frozenset[str] = frozenset()
+        return self._best(
+            (self.items[i] for i in ids),
+            canon,
+            start,
+            lambda e: self.categories.get(e.parent, empty),
+        )
+
+    def _match_option(
+        self, canon: list[str | None], start: int, groups: Iterable[int] | None
+    ) -> _Match | None:
+        """Options of `groups` (all active groups if None) named from `start`."""
+        token = canon[start]
+        ids = set(self._option_postings.get(token, ()))
+        for group_id in self._group_postings.get(token, ()):
+            ids |= self._group_options.get(group_id, set())
+        allowed = self.groups.keys() if groups is None else set(groups) & self.groups.keys()
+        return self._best(
+            (self.options[i] for i in ids if self.options[i].parent in allowed),
+            canon,
+            start,
+            lambda e: self.groups[e.parent],
+            # "grande frite": "frite" (of group "Taille frites") is the item, not the group
+            trailing_context=False,
+        )
+
+    def _attach(self, line: MatchedLine, option: _Match) -> None:
+        if option.entry.id not in line.option_ids:
+            line.option_ids.append(option.entry.id)
+            line.options.append(option.entry.name)
+
+    def match(self, text: str) -> MatchResult:
+        words = tokenize(text)
+        n = len(words)
+        numbers = [int(w) if w.isdigit() else NUMBER_WORDS.get(w) for w in words]
+        # Fillers and number words are only looked up exactly, and may only start a name
+        # that continues past them ("À point", "Tacos L" but not "la" or "un" alone)
+        weak = [
+            w in FILLER or (numbers[k] is not None and not w.isdigit())
+            for k, w in enumerate(words)
+        ]
+        canon = [
+            (stem(w) if stem(w) in self._vocab else None) if weak[k] else self.canonical(w)
+            for k, w in enumerate(words)
+        ]
+        lines: list[MatchedLine] = []
+        unmatched: list[str] = []
+        # Options said before their item ("une grande frite"), waiting for the next item
+        floating: list[tuple[_Match, str]] = []
+        pending: int | None = None
+        pending_at = 0
+        i = 0
+        while i < n:
+            word = words[i]
+            current = lines[-1] if lines else None
+            if word in MULTIPLIERS:
+                if pending is None and current and i + 1 < n and numbers[i + 1]:
+                    current.quantity = min(numbers[i + 1], MAX_QUANTITY)
+                    current.end = i + 2
+                    i += 2
+                else:
+                    i += 1
+                continue
+            if word in NEGATIONS:
+                j = i + 1
+                while j < n and words[j] in FILLER:
+                    j += 1
+                unmatched.append(" ".join(words[i : j + 1]))
+                i = j + 1
+                continue
+
+            item = option = None
+            if canon[i] is not None and not word.isdigit():
+                item = self._match_item(canon, i)
+                if current is not None:
+                    offered = self.items[current.menu_item_id.int].groups
+                    option = self._match_option(canon, i, offered)
+                if weak[i]:
+                    item = item if item and item.end - i > 1 and item.hits > 1 else None
+                    option = option if option and option.end - i > 1 and option.hits > 1 else None
+            # After a quantity, a name opens a new line; otherwise options of the current
+            # item win ties ("tacos poulet": the meat, not a chicken item)
+            if option is not None and (
+                item is None or (pending is None and option.hits >= item.hits)
+            ):
+                self._attach(current, option)
+                current.end = option.end
+                pending = None
+                i = option.end
+                continue
+            if item is not None:
+                line = MatchedLine(
+                    menu_item_id=item.entry.id,
+                    label=item.entry.name,
+                    quantity=min(pending or 1, MAX_QUANTITY),
+                    start=pending_at if pending is not None else i,
+                    end=item.end,
+                    alternatives=item.alternatives,
+                )
+                offered = set(item.entry.groups)
+                for before, said in floating:
+                    if before.entry.parent in offered:
+                        self._attach(line, before)
+                    else:
+                        unmatched.append(said)
+                floating.clear()
+                lines.append(line)
+                pending = None
+                i = item.end
+                continue
+            if numbers[i] is not None:
+                pending, pending_at = numbers[i], i
+                i += 1
+                continue
+            if canon[i] is not None:
+                stray = self._match_option(canon, i, None)
+                if stray is not None and not (weak[i] and stray.end - i < 2):
+                    floating.append((stray, " ".join(words[i : stray.end])))
+                    i = stray.end
+                    continue
+            if word not in FILLER:
+                unmatched.append(word)
+            i += 1
+        unmatched.extend(said for _, said in floating)
+        for line in lines:
+            line.matched_text = " ".join(words[line.start : line.end])
+        return MatchResult(lines, unmatched)
+
+
+class OrderMatchers:
+    """Per-worker matchers, valid for one restaurant menu_version.
+
+    A menu write patches the cached matcher after commit if it is exactly one version
+    behind; otherwise (e.g. another worker changed the menu) it is rebuilt on next use.
+    """
+
+    def __init__(self) -> None:
+        self._cache = TTLCache(
+            maxsize=settings.menu_snapshot_cache_size, ttl=settings.menu_snapshot_ttl
+        )
+
+    def get(self, restaurant_id: UUID, menu_version: int) -> MenuMatcher | None:
+        entry = self._cache.get(restaurant_id)
+        if entry is None or entry[0] != menu_version:
+            return None
+        return entry[1]
+
+    def set(self, restaurant_id: UUID, menu_version: int, matcher: MenuMatcher) -> None:
+        self._cache.set(restaurant_id, (menu_version, matcher))
+
+    def advance(
+        self, restaurant_id: UUID, menu_version: int, apply: Callable[[MenuMatcher], None]
+    ) -> None:
+        entry = self._cache.get(restaurant_id)
+        if entry is None:
+            return
+        if entry[0] != menu_version - 1:
+            self._cache.pop(restaurant_id)
+            return
+        apply(entry[1])
+        self.set(restaurant_id, menu_version, entry[1])
+
+    def patch(
+        self,
+        db: AsyncSession,
+        restaurant_id: UUID,
+        menu_version: int,
+        apply: Callable[[MenuMatcher], None],
+    ) -> None:
+        """After commit, bring the cached matcher from `menu_version - 1` to `menu_version`."""
+
+        async def _advance() -> None:
+            self.advance(restaurant_id, menu_version, apply)
+
+        after_commit(db, _advance)
+
+
+order_matchers = OrderMatchers()
+
+
+async def load_order_matcher(db: AsyncSession, restaurant_id: UUID) -> MenuMatcher:
+    """Four queries (categories, groups, options, active items with their links)."""
+    matcher = MenuMatcher()
+    r = await db.execute(select(MenuCategory).where(MenuCategory.restaurant_id == restaurant_id))
+    for category in r.scalars():
+        matcher.set_category(category)
+    r = await db.execute(select(OptionGroup).where(OptionGroup.restaurant_id == restaurant_id))
+    for group in r.scalars():
+        matcher.set_group(group)
+    r = await db.execute(
+        select(OptionItem)
+        .join(OptionGroup, OptionGroup.id == OptionItem.group_id)
+        .where(OptionGroup.restaurant_id == restaurant_id)
+    )
+    for option in r.scalars():
+        matcher.set_option(option)
+    r = await db.execute(
+        select(MenuItem)
+        .where(MenuItem.restaurant_id == restaurant_id, MenuItem.is_active.is_(True))
+        .options(selectinload(MenuItem.option_group_links))
+    )
+    for item in r.scalars():
+        matcher.set_item(item)
+    return matcher
+
+
+async def get_order_matcher(db: AsyncSession, restaurant_id: UUID) -> MenuMatcher:
+    restaurant = await db.get(Restaurant, restaurant_id)
+    matcher = order_matchers.get(restaurant_id, restaurant.menu_version)
+    if matcher is None:
+        matcher = await load_order_matcher(db, restaurant_id)
+        order_matchers.set(restaurant_id, restaurant.menu_version, matcher)
+    return matcher
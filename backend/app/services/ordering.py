@@ -1,38 +1,105 @@
+from dataclasses import dataclass
+from decimal import Decimal
+from functools import lru_cache
 from uuid import UUID
 
-from sqlalchemy import select
+from sqlalchemy import Row, func, insert, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.core.database import after_commit
+from app.core.metrics import orders_created, restaurant_labels
 from app.models.menu import MenuItem
 from app.models.order import Order, OrderItem
-from app.schemas.order import OrderCreate
+from app.models.restaurant import Restaurant
+from app.schemas.order import (
+    OrderBulkStatusResult,
+    OrderBulkStatusUpdate,
+    OrderCreate,
+    OrderItemRead,
+    OrderRead,
+    OrderStatusOutcome,
+)
+from app.services.events import order_events
+from app.services.option_rules import get_option_rules
+from app.services.stock import STOCK_CONSUMING_STATUSES, move_order_stock
+
+
+@dataclass
+class PricedLine:
+    menu_item: MenuItem
+    quantity: int
+    options: list[dict]  # normalized chosen options: id, group_id, name, price_extra
+    unit_price: Decimal  # menu price + option extras
+    line_total: Decimal
 
 
 async def validate_order_items(
     db: AsyncSession,
     restaurant_id: UUID,
     payload: OrderCreate,
-) -> list[tuple[MenuItem, int, dict | list | None]]:
-    """Validate each line: menu item exists, belongs to restaurant, is active. Return (menu_item, qty, options)."""
-    result: list[tuple[MenuItem, int, dict | list | None]] = []
-    for line in payload.items:
-        r = await db.execute(
-            select(MenuItem).where(
-                MenuItem.id == line.menu_item_id,
-                MenuItem.restaurant_id == restaurant_id,
-                MenuItem.is_active.is_(True),
-            )
+) -> list[PricedLine]:
+    """Validate and price all lines: one query for menu items, then option selections
+    against the restaurant's compiled option rules (cached until the menu changes).
+
+    Each menu item must exist, belong to the restaurant and be active; each option must be
+    active, in an active group offered by the line's menu item, and every offered group's
+    min/max selection must hold. All option problems are reported at once, one structured
+    error per problem.
+    """
+    from fastapi import HTTPException
+
+    ids = list(dict.fromkeys(line.menu_item_id for line in payload.items))
+    r = await db.execute(
+        select(MenuItem).where(
+            MenuItem.id.in_(ids),
+            MenuItem.restaurant_id == restaurant_id,
+            MenuItem.is_active.is_(True),
+        )
+    )
+    by_id = {mi.id: mi for mi in r.scalars()}
+    missing = [str(i) for i in ids if i not in by_id]
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Menu items not found or inactive: {', '.join(missing)}",
+        )
+
+    rules = await get_option_rules(db, restaurant_id)
+    resolved, errors = rules.check(
+        [(line.menu_item_id, line.option_ids) for line in payload.items]
+    )
+    if errors:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "message": "Invalid option selection",
+                "errors": [e.as_dict() for e in errors],
+            },
         )
-        mi = r.scalar_one_or_none()
-        if not mi:
-            from fastapi import HTTPException
 
-            raise HTTPException(
-                status_code=400,
-                detail=f"Menu item {line.menu_item_id} not found or inactive",
+    lines: list[PricedLine] = []
+    for line, chosen in zip(payload.items, resolved):
+        mi = by_id[line.menu_item_id]
+        unit_price = mi.price + sum((o.price_extra for o in chosen), Decimal("0"))
+        lines.append(
+            PricedLine(
+                menu_item=mi,
+                quantity=line.quantity,
+                options=[
+                    {
+                        "id": str(o.id),
+                        "group_id": str(o.group_id),
+                        "name": o.name,
+                        "price_extra": str(o.price_extra),
+                    }
+                    for o in chosen
+                ],
+                unit_price=unit_price,
+                line_total=unit_price * line.quantity,
             )
-        result.append((mi, line.quantity, line.options))
-    return result
+        )
+    return lines
 
 
 async def create_order(
@@ -40,37 +107,133 @@ async def create_order(
     restaurant_id: UUID,
     payload: OrderCreate,
 ) -> Order:
-    validated = await validate_order_items(db, restaurant_id, payload)
-    order = Order(restaurant_id=restaurant_id, status="draft")
+    """Create a priced draft order in a constant number of round trips (validate, order, items).
+
+    The returned order has `items` populated, so callers need no refresh or re-select.
+    """
+    lines = await validate_order_items(db, restaurant_id, payload)
+    order = Order(
+        restaurant_id=restaurant_id,
+        status="draft",
+        total=sum((line.line_total for line in lines), Decimal("0")),
+    )
     db.add(order)
     await db.flush()
-    for mi, qty, opts in validated:
-        item = OrderItem(
-            order_id=order.id,
-            menu_item_id=mi.id,
-            quantity=qty,
-            unit_price=mi.price,
-            options=opts,
+    r = await db.scalars(
+        insert(OrderItem).returning(OrderItem, sort_by_parameter_order=True),
+        [
+            {
+                "order_id": order.id,
+                "menu_item_id": line.menu_item.id,
+                "quantity": line.quantity,
+                "unit_price": line.unit_price,
+                "line_total": line.line_total,
+                "options": line.options or None,
+            }
+            for line in lines
+        ],
+    )
+    set_committed_value(order, "items", list(r))
+
+    async def _publish() -> None:
+        orders_created.inc(restaurant_labels(restaurant_id))
+        await order_events.publish(
+            restaurant_id,
+            "order.created",
+            OrderRead.model_validate(order).model_dump(mode="json"),
         )
-        db.add(item)
-    await db.flush()
+
+    after_commit(db, _publish)
     return order
 
 
-def _allowed_transitions() -> dict[str, tuple[str, ...]]:
-    return {
-        "draft": ("confirmed", "cancelled"),
-        "confirmed": ("preparing", "cancelled"),
-        "preparing": ("ready", "cancelled"),
-        "ready": ("delivered",),
-        "delivered": (),
-        "cancelled": (),
-    }
+DEFAULT_TRANSITIONS: dict[str, tuple[str, ...]] = {
+    "draft": ("confirmed", "cancelled"),
+    "confirmed": ("preparing", "cancelled"),
+    "preparing": ("ready", "cancelled"),
+    "ready": ("delivered",),
+    "delivered": (),
+    "cancelled": (),
+}
+
+
+@dataclass(frozen=True)
+class TransitionTable:
+    # target status -> statuses it can be reached from (the UPDATE guard)
+    predecessors: dict[str, tuple[str, ...]]
+
+
+@lru_cache(maxsize=256)
+def _compile(spec: tuple[tuple[str, tuple[str, ...]], ...]) -> TransitionTable:
+    predecessors: dict[str, list[str]] = {}
+    for current, nexts in spec:
+        for next_ in nexts:
+            predecessors.setdefault(next_, []).append(current)
+    return TransitionTable(
+        predecessors={k: tuple(sorted(v)) for k, v in predecessors.items()},
+    )
+
+
+def compile_transitions(raw: dict[str, list[str]] | None) -> TransitionTable:
+    """Transition table for a restaurant's `order_transitions` (None = default workflow).
+
+    Compiled once per distinct table and shared.
+    """
+    spec = DEFAULT_TRANSITIONS if raw is None else raw
+    return _compile(tuple(sorted((k, tuple(sorted(v))) for k, v in spec.items())))
+
+
+async def _guarded_transition(
+    db: AsyncSession,
+    restaurant_id: UUID,
+    order_ids: list[UUID],
+    new_status: str,
+) -> list[Row]:
+    """Move orders to `new_status` with one guarded UPDATE.
+
+    Rows are locked (in id order, so overlapping batches do not deadlock) and updated only
+    if their current status may lead to `new_status`. One row per existing order:
+    (id, previous_status, updated_id, total, created_at, updated_at); updated_id is NULL when
+    the transition was not allowed. Orders missing from the result do not exist.
+    """
+    restaurant = await db.get(Restaurant, restaurant_id)
+    table = compile_transitions(restaurant.order_transitions if restaurant else None)
+    old = (
+        select(Order.id, Order.status)
+        .where(Order.id.in_(order_ids), Order.restaurant_id == restaurant_id)
+        .order_by(Order.id)
+        .with_for_update()
+        .cte("old")
+    )
+    updated = (
+        update(Order)
+        .where(Order.id == old.c.id, old.c.status.in_(table.predecessors.get(new_status, ())))
+        .values(status=new_status, updated_at=func.now())
+        .returning(Order.id, Order.total, Order.created_at, Order.updated_at)
+        .cte("updated")
+    )
+    r = await db.execute(
+        select(
+            old.c.id,
+            old.c.status.label("previous_status"),
+            updated.c.id.label("updated_id"),
+            updated.c.total,
+            updated.c.created_at,
+            updated.c.updated_at,
+        ).select_from(old.outerjoin(updated, updated.c.id == old.c.id))
+    )
+    return list(r.all())
 
 
-def can_transition(current: str, next_: str) -> bool:
-    allowed = _allowed_transitions().get(current, ())
-    return next_ in allowed
+async def _move_stock_for(
+    db: AsyncSession, restaurant_id: UUID, changes: list[tuple[UUID, str]], new_status: str
+) -> None:
+    """Consume or restore stock for (order_id, previous_status) pairs entering/leaving
+    a stock-consuming status."""
+    consuming = new_status in STOCK_CONSUMING_STATUSES
+    moved = [oid for oid, prev in changes if (prev in STOCK_CONSUMING_STATUSES) != consuming]
+    if moved:
+        await move_order_stock(db, restaurant_id, moved, restore=not consuming)
 
 
 async def update_order_status(
@@ -78,22 +241,125 @@ async def update_order_status(
     restaurant_id: UUID,
     order_id: UUID,
     new_status: str,
-) -> Order:
+) -> OrderRead:
+    """Move an order to `new_status` in one guarded statement (see _guarded_transition).
+
+    The statement returns the previous status, so no row means 404 and a row without an
+    update means 409, without another read.
+    """
     from fastapi import HTTPException
 
-    r = await db.execute(
-        select(Order).where(
-            Order.id == order_id,
-            Order.restaurant_id == restaurant_id,
-        )
-    )
-    order = r.scalar_one_or_none()
-    if not order:
+    rows = await _guarded_transition(db, restaurant_id, [order_id], new_status)
+    if not rows:
         raise HTTPException(status_code=404, detail="Order not found")
-    if not can_transition(order.status, new_status):
+    row = rows[0]
+    previous_status = row.previous_status
+    if row.updated_id is None:
         raise HTTPException(
             status_code=409,
-            detail=f"Cannot transition from {order.status} to {new_status}",
+            detail=f"Cannot transition from {previous_status} to {new_status}",
+        )
+    await _move_stock_for(db, restaurant_id, [(order_id, previous_status)], new_status)
+
+    r = await db.execute(select(OrderItem).where(OrderItem.order_id == order_id))
+    order = OrderRead(
+        id=order_id,
+        restaurant_id=restaurant_id,
+        status=new_status,
+        total=row.total,
+        created_at=row.created_at,
+        updated_at=row.updated_at,
+        items=[OrderItemRead.model_validate(oi) for oi in r.scalars()],
+    )
+
+    async def _publish() -> None:
+        await order_events.publish(
+            restaurant_id,
+            "order.status_changed",
+            {
+                "id": str(order_id),
+                "status": new_status,
+                "previous_status": previous_status,
+                "updated_at": order.updated_at.isoformat(),
+            },
         )
-    order.status = new_status
+
+    after_commit(db, _publish)
     return order
+
+
+async def bulk_update_order_status(
+    db: AsyncSession,
+    restaurant_id: UUID,
+    payload: OrderBulkStatusUpdate,
+) -> OrderBulkStatusResult:
+    """Apply one target status to many orders with a single guarded UPDATE.
+
+    Each order is reported as updated, not_found or invalid_transition. With `atomic`,
+    any failure raises 409 (with the per-order outcomes) and the transaction rolls back.
+    Stock moves for the whole batch at once, so a stock shortfall fails the batch. One
+    "orders.status_changed" event carries every change.
+    """
+    from fastapi import HTTPException
+
+    order_ids = list(dict.fromkeys(payload.order_ids))
+    new_status = payload.status
+    rows = await _guarded_transition(db, restaurant_id, order_ids, new_status)
+    by_id = {row.id: row for row in rows}
+    results: list[OrderStatusOutcome] = []
+    for oid in order_ids:
+        row = by_id.get(oid)
+        if row is None:
+            results.append(OrderStatusOutcome(id=oid, outcome="not_found"))
+        elif row.updated_id is None:
+            results.append(
+                OrderStatusOutcome(
+                    id=oid, outcome="invalid_transition", previous_status=row.previous_status
+                )
+            )
+        else:
+            results.append(
+                OrderStatusOutcome(
+                    id=oid,
+                    outcome="updated",
+                    previous_status=row.previous_status,
+                    updated_at=row.updated_at,
+                )
+            )
+    result = OrderBulkStatusResult(status=new_status, results=results)
+    failed = [o for o in results if o.outcome != "updated"]
+    if payload.atomic and failed:
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "message": f"Not every order can move to {new_status}; nothing was changed",
+                "results": [o.model_dump(mode="json") for o in failed],
+            },
+        )
+
+    changed = [o for o in results if o.outcome == "updated"]
+    if not changed:
+        return result
+    await _move_stock_for(
+        db, restaurant_id, [(o.id, o.previous_status) for o in changed], new_status
+    )
+
+    async def _publish() -> None:
+        await order_events.publish(
+            restaurant_id,
+            "orders.status_changed",
+            {
+                "status": new_status,
+                "orders": [
+                    {
+                        "id": str(o.id),
+                        "previous_status": o.previous_status,
+                        "updated_at": o.updated_at.isoformat(),
+                    }
+                    for o in changed
+                ],
+            },
+        )
+
+    after_commit(db, _publish)
+    return result
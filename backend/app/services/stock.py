@@ -1,37 +1,418 @@
+from dataclasses import dataclass
 from uuid import UUID
 
-from sqlalchemy import select
+from fastapi import HTTPException
+from sqlalchemy import Float, and_, column, delete, insert, or_, select, update, values
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import after_commit
+from app.models.inventory import InventoryItem, InventoryLevel
 from app.models.menu import MenuItem
+from app.models.order import OrderItem, OrderStockMovement
+from app.models.restaurant import Restaurant
 from app.schemas.inventory import AvailabilityItem, AvailabilityResponse
 
 
+@dataclass(frozen=True)
+class IngredientRef:
+    """One entry of MenuItem.ingredients, before it is linked to an InventoryItem.
+
+    Accepted JSON shapes:
+      ["tomate", "mozzarella"]                                  names only
+      {"tomate": 0.1, "mozzarella": 0.05}                       name -> quantity per portion
+      [{"name": "poulet", "quantity": 0.15, "optional": false,
+        "substitutes": ["dinde"]}, {"inventory_item_id": "..."}]
+    `quantity` is per portion; without it only the `in_stock` flag is checked.
+    """
+
+    name: str | None
+    inventory_item_id: str | None = None
+    quantity: float | None = None
+    optional: bool = False
+    substitutes: tuple[str, ...] = ()
+
+
+def parse_ingredients(raw: dict | list | None) -> list[IngredientRef]:
+    if not raw:
+        return []
+    if isinstance(raw, dict):
+        return [
+            IngredientRef(name=str(k), quantity=float(v) if isinstance(v, (int, float)) else None)
+            for k, v in raw.items()
+        ]
+    refs: list[IngredientRef] = []
+    for entry in raw:
+        if isinstance(entry, str):
+            refs.append(IngredientRef(name=entry))
+        elif isinstance(entry, dict):
+            qty = entry.get("quantity")
+            refs.append(
+                IngredientRef(
+                    name=entry.get("name"),
+                    inventory_item_id=entry.get("inventory_item_id"),
+                    quantity=float(qty) if isinstance(qty, (int, float)) else None,
+                    optional=bool(entry.get("optional", False)),
+                    substitutes=tuple(str(s) for s in entry.get("substitutes") or ()),
+                )
+            )
+    return refs
+
+
+def _norm(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+class InventoryIndex:
+    """Resolves ingredient references (inventory id or name) to inventory item ids."""
+
+    def __init__(self, inventory: list[InventoryItem]) -> None:
+        self.names: dict[UUID, str] = {inv.id: inv.name for inv in inventory}
+        self._by_key: dict[str, UUID] = {}
+        for inv in inventory:
+            self._by_key[str(inv.id)] = inv.id
+            self._by_key.setdefault(_norm(inv.name), inv.id)
+
+    def resolve(self, key: str | None) -> UUID | None:
+        if not key:
+            return None
+        return self._by_key.get(key) or self._by_key.get(_norm(key))
+
+    def resolve_ref(self, ref: IngredientRef) -> UUID | None:
+        return self.resolve(ref.inventory_item_id) or self.resolve(ref.name)
+
+
+@dataclass(frozen=True)
+class _Requirement:
+    inventory_item_id: UUID
+    quantity: float | None
+    optional: bool
+    substitutes: tuple[UUID, ...]
+
+
+def resolve_requirements(
+    ingredients: dict | list | None, index: InventoryIndex
+) -> list[_Requirement]:
+    """Stock-tracked ingredients of a menu item; unknown names are not tracked."""
+    reqs: list[_Requirement] = []
+    for ref in parse_ingredients(ingredients):
+        inv_id = index.resolve_ref(ref)
+        if inv_id is None:
+            continue
+        subs = tuple(s for s in map(index.resolve, ref.substitutes) if s is not None)
+        reqs.append(_Requirement(inv_id, ref.quantity, ref.optional, subs))
+    return reqs
+
+
+class AvailabilityEngine:
+    """Availability of every active menu item, computed from preloaded menu + stock.
+
+    A reverse index (inventory item -> dependent menu items, substitutes included)
+    lets `update_level` recompute only the menu items touched by one stock change.
+    """
+
+    def __init__(self, items: list[MenuItem], inventory: list[InventoryItem]) -> None:
+        index = InventoryIndex(inventory)
+        self._names = index.names
+        # inventory id -> (quantity, in_stock); items without a level row are untracked
+        self._stock: dict[UUID, tuple[float, bool]] = {
+            inv.id: (inv.levels[0].quantity, inv.levels[0].in_stock)
+            for inv in inventory
+            if inv.levels
+        }
+        self._labels: dict[UUID, str] = {}
+        self._requirements: dict[UUID, list[_Requirement]] = {}
+        self._dependents: dict[UUID, set[UUID]] = {}
+        for mi in items:
+            self._labels[mi.id] = mi.label
+            reqs = resolve_requirements(mi.ingredients, index)
+            for req in reqs:
+                for dep in (req.inventory_item_id, *req.substitutes):
+                    self._dependents.setdefault(dep, set()).add(mi.id)
+            self._requirements[mi.id] = reqs
+        self._results: dict[UUID, AvailabilityItem] = {
+            mi_id: self._evaluate(mi_id) for mi_id in self._labels
+        }
+        self._ordered = sorted(self._labels, key=lambda i: self._labels[i])
+
+    def _usable(self, inv_id: UUID, quantity: float | None) -> bool:
+        level = self._stock.get(inv_id)
+        if level is None:
+            return True
+        qty, in_stock = level
+        return in_stock and (quantity is None or qty >= quantity)
+
+    def _evaluate(self, mi_id: UUID) -> AvailabilityItem:
+        missing: list[str] = []
+        subs: list[dict] = []
+        for req in self._requirements[mi_id]:
+            if self._usable(req.inventory_item_id, req.quantity):
+                continue
+            name = self._names[req.inventory_item_id]
+            alternatives = [s for s in req.substitutes if self._usable(s, req.quantity)]
+            if alternatives:
+                subs.append(
+                    {
+                        "ingredient": name,
+                        "inventory_item_id": str(req.inventory_item_id),
+                        "substitutes": [
+                            {"inventory_item_id": str(s), "name": self._names[s]}
+                            for s in alternatives
+                        ],
+                    }
+                )
+            elif req.optional:
+                subs.append(
+                    {
+                        "ingredient": name,
+                        "inventory_item_id": str(req.inventory_item_id),
+                        "omit": True,
+                    }
+                )
+            else:
+                missing.append(name)
+        return AvailabilityItem(
+            menu_item_id=mi_id,
+            label=self._labels[mi_id],
+            available=not missing,
+            reason=f"Out of stock: {', '.join(missing)}" if missing else None,
+            substitutions=subs,
+        )
+
+    def results(self) -> list[AvailabilityItem]:
+        return [self._results[mi_id] for mi_id in self._ordered]
+
+    def update_level(
+        self, inventory_item_id: UUID, quantity: float, in_stock: bool
+    ) -> list[AvailabilityItem]:
+        """Apply one stock change; recompute and return only the dependent menu items."""
+        if inventory_item_id not in self._names:
+            return []
+        self._stock[inventory_item_id] = (quantity, in_stock)
+        changed = []
+        for mi_id in self._dependents.get(inventory_item_id, ()):
+            self._results[mi_id] = self._evaluate(mi_id)
+            changed.append(self._results[mi_id])
+        return changed
+
+
+class AvailabilityEngines:
+    """Per-worker engines, reused while the menu version matches and the stock view is fresh.
+
+    Stock changes made through this worker are applied incrementally; changes from other
+    workers are picked up when `availability_cache_ttl` expires.
+    """
+
+    def __init__(self) -> None:
+        self._cache = TTLCache(maxsize=256, ttl=settings.availability_cache_ttl)
+
+    def get(self, restaurant_id: UUID, menu_version: int) -> AvailabilityEngine | None:
+        entry = self._cache.get(restaurant_id)
+        if entry is None or entry[0] != menu_version:
+            return None
+        return entry[1]
+
+    def set(self, restaurant_id: UUID, menu_version: int, engine: AvailabilityEngine) -> None:
+        self._cache.set(restaurant_id, (menu_version, engine))
+
+    def level_changed(
+        self, restaurant_id: UUID, inventory_item_id: UUID, quantity: float, in_stock: bool
+    ) -> None:
+        entry = self._cache.get(restaurant_id)
+        if entry is not None:
+            entry[1].update_level(inventory_item_id, quantity, in_stock)
+
+    def invalidate(self, restaurant_id: UUID) -> None:
+        self._cache.pop(restaurant_id)
+
+
+availability_engines = AvailabilityEngines()
+
+
+async def load_availability_engine(db: AsyncSession, restaurant_id: UUID) -> AvailabilityEngine:
+    """Two queries (active menu items, inventory with levels), then one in-memory pass."""
+    r = await db.execute(
+        select(MenuItem).where(
+            MenuItem.restaurant_id == restaurant_id, MenuItem.is_active.is_(True)
+        )
+    )
+    items = list(r.scalars().all())
+    r = await db.execute(
+        select(InventoryItem)
+        .where(InventoryItem.restaurant_id == restaurant_id)
+        .options(selectinload(InventoryItem.levels))
+    )
+    inventory = list(r.scalars().all())
+    return AvailabilityEngine(items, inventory)
+
+
 async def get_availability(
     db: AsyncSession,
     restaurant_id: UUID,
 ) -> AvailabilityResponse:
-    """Compute availability per menu item. MVP: no inventory link; all active items available."""
-    q = (
-        select(MenuItem)
-        .where(MenuItem.restaurant_id == restaurant_id, MenuItem.is_active.is_(True))
-        .order_by(MenuItem.label)
+    """Availability per active menu item, from its ingredients vs inventory levels."""
+    restaurant = await db.get(Restaurant, restaurant_id)
+    engine = availability_engines.get(restaurant_id, restaurant.menu_version)
+    if engine is None:
+        engine = await load_availability_engine(db, restaurant_id)
+        availability_engines.set(restaurant_id, restaurant.menu_version, engine)
+    return AvailabilityResponse(restaurant_id=restaurant_id, items=engine.results())
+
+
+# Order statuses whose ingredients have been taken out of stock
+STOCK_CONSUMING_STATUSES = frozenset({"confirmed", "preparing", "ready", "delivered"})
+
+
+async def move_order_stock(
+    db: AsyncSession,
+    restaurant_id: UUID,
+    order_ids: list[UUID],
+    restore: bool = False,
+) -> None:
+    """Take the ingredients of `order_ids` out of stock (or put them back with `restore`).
+
+    Ingredients resolve as in the AvailabilityEngine: a quantified ingredient that is
+    short is taken from its first substitute with enough stock, and an optional one is
+    left out. What each order took is recorded (OrderStockMovement), and `restore` puts
+    back exactly that, whatever the recipes have become since.
+    """
+    if restore:
+        r = await db.execute(
+            delete(OrderStockMovement)
+            .where(OrderStockMovement.order_id.in_(order_ids))
+            .returning(OrderStockMovement.inventory_item_id, OrderStockMovement.quantity)
+        )
+        amounts: dict[UUID, float] = {}
+        for inv_id, qty in r.all():
+            amounts[inv_id] = amounts.get(inv_id, 0.0) + qty
+        if amounts:
+            moved = await _move_levels(db, amounts, restore=True)
+            _levels_moved(db, restaurant_id, moved)
+        return
+
+    r = await db.execute(
+        select(OrderItem.order_id, OrderItem.quantity, MenuItem.ingredients)
+        .join(MenuItem, MenuItem.id == OrderItem.menu_item_id)
+        .where(OrderItem.order_id.in_(order_ids))
+        .order_by(OrderItem.order_id, OrderItem.id)
     )
-    r = await db.execute(q)
-    items = list(r.scalars().all())
-    out: list[AvailabilityItem] = []
-    for mi in items:
-        # MVP: simple logic — active => available. Extensible: check ingredients vs inventory_levels.
-        available = True
-        reason: str | None = None
-        subs: list[dict] = []
-        # Placeholder for future: if ingredients reference inventory and out-of-stock, set available=False, reason, substitutions.
-        out.append(
-            AvailabilityItem(
-                menu_item_id=mi.id,
-                label=mi.label,
-                available=available,
-                reason=reason,
-                substitutions=subs,
+    lines = r.all()
+    if not any(ingredients for _, _, ingredients in lines):
+        return
+    r = await db.execute(
+        select(InventoryItem)
+        .where(InventoryItem.restaurant_id == restaurant_id)
+        .options(selectinload(InventoryItem.levels))
+    )
+    inventory = list(r.scalars().all())
+    index = InventoryIndex(inventory)
+    # Stock left for the lines still to allocate; items without a level are not tracked
+    left: dict[UUID, float] = {
+        inv.id: inv.levels[0].quantity if inv.levels[0].in_stock else 0.0
+        for inv in inventory
+        if inv.levels
+    }
+
+    taken: dict[tuple[UUID, UUID], float] = {}
+    for order_id, qty, ingredients in lines:
+        for req in resolve_requirements(ingredients, index):
+            if req.quantity is None:
+                continue
+            need = req.quantity * qty
+            inv_id = next(
+                (
+                    i
+                    for i in (req.inventory_item_id, *req.substitutes)
+                    if i not in left or left[i] >= need
+                ),
+                None,
             )
+            if inv_id is None:
+                if req.optional:
+                    continue
+                inv_id = req.inventory_item_id  # short: the guarded UPDATE reports it
+            if inv_id not in left:
+                continue
+            left[inv_id] -= need
+            taken[(order_id, inv_id)] = taken.get((order_id, inv_id), 0.0) + need
+    if not taken:
+        return
+
+    amounts = {}
+    for (_, inv_id), qty in taken.items():
+        amounts[inv_id] = amounts.get(inv_id, 0.0) + qty
+    moved = await _move_levels(db, amounts, restore=False)
+    if len(moved) < len(amounts):
+        short = sorted(index.names[i] for i in amounts.keys() - {row[0] for row in moved})
+        raise HTTPException(
+            status_code=409,
+            detail=f"Insufficient stock: {', '.join(short)}",
+        )
+    _levels_moved(db, restaurant_id, moved)
+    await db.execute(
+        insert(OrderStockMovement),
+        [
+            {"order_id": order_id, "inventory_item_id": inv_id, "quantity": qty}
+            for (order_id, inv_id), qty in sorted(taken.items())
+        ],
+    )
+
+
+async def _move_levels(db: AsyncSession, amounts: dict[UUID, float], restore: bool) -> list:
+    """Move all levels in one UPDATE ... FROM (VALUES ...); returns the rows moved
+    (inventory_item_id, quantity, in_stock).
+
+    Rows are locked in inventory_item_id order so concurrent confirmations serialize
+    instead of deadlocking, and consumption re-checks `in_stock and quantity >= amount`
+    on the locked row, so no update is lost and no level goes negative.
+    """
+    v = values(
+        column("inventory_item_id", PG_UUID(as_uuid=True)),
+        column("qty", Float),
+        name="v",
+    ).data(sorted(amounts.items()))
+    locked = (
+        select(InventoryLevel.id)
+        .where(InventoryLevel.inventory_item_id.in_(amounts))
+        .order_by(InventoryLevel.inventory_item_id)
+        .with_for_update()
+    )
+    stmt = update(InventoryLevel).where(
+        InventoryLevel.inventory_item_id == v.c.inventory_item_id,
+        InventoryLevel.id.in_(locked),
+    )
+    if restore:
+        stmt = stmt.values(
+            quantity=InventoryLevel.quantity + v.c.qty,
+            # Re-enable only levels that were switched off by running out
+            in_stock=or_(
+                InventoryLevel.in_stock,
+                and_(InventoryLevel.quantity <= 0, InventoryLevel.quantity + v.c.qty > 0),
+            ),
         )
-    return AvailabilityResponse(restaurant_id=restaurant_id, items=out)
+    else:
+        stmt = stmt.where(
+            InventoryLevel.in_stock.is_(True), InventoryLevel.quantity >= v.c.qty
+        ).values(
+            quantity=InventoryLevel.quantity - v.c.qty,
+            in_stock=InventoryLevel.quantity - v.c.qty > 0,
+        )
+    r = await db.execute(
+        stmt.returning(
+            InventoryLevel.inventory_item_id, InventoryLevel.quantity, InventoryLevel.in_stock
+        ).execution_options(synchronize_session=False)
+    )
+    return r.all()
+
+
+def _levels_moved(db: AsyncSession, restaurant_id: UUID, moved: list) -> None:
+    """Apply the new levels to this worker's availability engine once committed."""
+
+    async def _refresh_availability() -> None:
+        for inv_id, quantity, in_stock in moved:
+            availability_engines.level_changed(restaurant_id, inv_id, quantity, in_stock)
+
+    after_commit(db, _refresh_availability)
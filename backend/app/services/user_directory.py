@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+from urllib.parse import quote
+
+import httpx
+
+from app.core.config import settings
+from app.schemas.user import KeycloakUser
+
+logger = logging.getLogger(__name__)
+
+# Renew the admin token this many seconds before Keycloak expires it
+TOKEN_REFRESH_MARGIN = 15
+
+
+class _Entry:
+    __slots__ = ("user", "haystack")
+
+    def __init__(self, user: KeycloakUser) -> None:
+        self.user = user
+        self.haystack = " ".join(
+            (v or "").lower() for v in (user.username, user.email, user.firstName, user.lastName)
+        )
+
+
+def _to_user(raw: dict) -> KeycloakUser:
+    return KeycloakUser(
+        id=raw["id"],
+        username=raw.get("username", ""),
+        email=raw.get("email"),
+        firstName=raw.get("firstName"),
+        lastName=raw.get("lastName"),
+        enabled=raw.get("enabled", False),
+    )
+
+
+class UserDirectory:
+    """Realm users from the Keycloak Admin API, cached per worker.
+
+    The admin token is reused until shortly before it expires, and all calls share one
+    pooled client. Users are paged in once and resynced every `sync_interval` seconds
+    (by `run_syncer()`, or on the next read once stale); role filters use the
+    role-members endpoint, and roles that have been asked for are resynced alongside.
+    Only realm roles (listed and resynced the same way) are looked up, so arbitrary
+    `role` values cannot grow the cache.
+    Concurrent syncs of the same data share one in-flight request. If a resync fails,
+    the last known directory keeps being served.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        realm: str,
+        admin_realm: str = "master",
+        client_id: str = "admin-cli",
+        username: str = "admin",
+        password: str = "admin",
+        sync_interval: float = 60,
+        page_size: int = 500,
+        client: httpx.AsyncClient | None = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.realm = realm
+        self.admin_realm = admin_realm
+        self.client_id = client_id
+        self.username = username
+        self.password = password
+        self.sync_interval = sync_interval
+        self.page_size = page_size
+        self.requests = 0
+        self._client = client
+        self._token: str | None = None
+        self._token_expires_at = 0.0
+        self._token_lock = asyncio.Lock()
+        self._users: list[_Entry] = []
+        self._roles: dict[str, list[_Entry]] = {}
+        self._role_names: set[str] = set()
+        # "users" | "roles" | "role:<name>" -> monotonic time
+        self._synced_at: dict[str, float] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=10.0,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+            )
+        return self._client
+
+    async def _admin_token(self) -> str:
+        if self._token is not None and time.monotonic() < self._token_expires_at:
+            return self._token
+        async with self._token_lock:
+            if self._token is not None and time.monotonic() < self._token_expires_at:
+                return self._token
+            self.requests += 1
+            r = await self._get_client().post(
+                f"/realms/{self.admin_realm}/protocol/openid-connect/token",
+                data={
+                    "grant_type": "password",
+                    "client_id": self.client_id,
+                    "username": self.username,
+                    "password": self.password,
+                },
+            )
+            r.raise_for_status()
+            body = r.json()
+            self._token = body["access_token"]
+            lifetime = float(body.get("expires_in", 60))
+            self._token_expires_at = time.monotonic() + max(
+                lifetime - TOKEN_REFRESH_MARGIN, lifetime / 2
+            )
+            return self._token
+
+    async def _get(self, path: str, params: dict[str, Any]) -> Any:
+        for attempt in range(2):
+            token = await self._admin_token()
+            self.requests += 1
+            r = await self._get_client().get(
+                f"/admin/realms/{self.realm}{path}",
+                params=params,
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            if r.status_code == 401 and attempt == 0:
+                self._token = None  # revoked or expired early: log in again once
+                continue
+            r.raise_for_status()
+            return r.json()
+
+    async def _paged(self, path: str) -> list[dict]:
+        out: list[dict] = []
+        first = 0
+        while True:
+            page = await self._get(
+                path, {"first": first, "max": self.page_size, "briefRepresentation": "true"}
+            )
+            out.extend(page)
+            if len(page) < self.page_size:
+                return out
+            first += self.page_size
+
+    async def _once(self, key: str, load: Callable[[], Awaitable[bool | None]]) -> None:
+        """Run `load` unless the same key is already loading; then wait for that one.
+
+        A load returning False found nothing to keep and is not recorded as synced.
+        """
+        fut = self._inflight.get(key)
+        if fut is None:
+
+            async def run() -> None:
+                try:
+                    if await load() is not False:
+                        self._synced_at[key] = time.monotonic()
+                finally:
+                    del self._inflight[key]
+
+            fut = self._inflight[key] = asyncio.ensure_future(run())
+        await asyncio.shield(fut)
+
+    async def _load_users(self) -> None:
+        raw = await self._paged("/users")
+        users = [_Entry(_to_user(u)) for u in raw]
+        users.sort(key=lambda e: (e.user.username, e.user.id))
+        self._users = users
+
+    async def _load_role_names(self) -> None:
+        raw = await self._paged("/roles")
+        self._role_names = {r["name"] for r in raw}
+
+    def _role_loader(self, role: str) -> Callable[[], Awaitable[bool | None]]:
+        async def load() -> bool | None:
+            try:
+                raw = await self._paged(f"/roles/{quote(role, safe='')}/users")
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code != 404:
+                    raise
+                # Deleted since the role list was synced: nobody has it
+                self._roles.pop(role, None)
+                self._synced_at.pop(f"role:{role}", None)
+                self._role_names.discard(role)
+                return False
+            members = [_Entry(_to_user(u)) for u in raw]
+            members.sort(key=lambda e: (e.user.username, e.user.id))
+            self._roles[role] = members
+
+        return load
+
+    async def _ensure(self, key: str, load: Callable[[], Awaitable[None]]) -> None:
+        synced_at = self._synced_at.get(key)
+        if synced_at is not None and time.monotonic() - synced_at < self.sync_interval:
+            return
+        try:
+            await self._once(key, load)
+        except Exception:
+            if synced_at is None:
+                raise
+            logger.exception("User directory sync of %s failed, serving cached data", key)
+
+    async def sync(self) -> None:
+        """Resync the user list and every role that has been queried so far."""
+        jobs = [self._once("users", self._load_users)]
+        if "roles" in self._synced_at:
+            jobs.append(self._once("roles", self._load_role_names))
+        jobs += [self._once(f"role:{r}", self._role_loader(r)) for r in list(self._roles)]
+        await asyncio.gather(*jobs)
+
+    async def list_users(
+        self,
+        role: str | None = None,
+        search: str | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> tuple[int, list[KeycloakUser]]:
+        """(total matching, page of users), ordered by username."""
+        if role:
+            await self._ensure("roles", self._load_role_names)
+            if role not in self._role_names:
+                return 0, []
+            await self._ensure(f"role:{role}", self._role_loader(role))
+            entries = self._roles.get(role, [])
+        else:
+            await self._ensure("users", self._load_users)
+            entries = self._users
+        if search:
+            needle = search.lower()
+            entries = [e for e in entries if needle in e.haystack]
+        end = None if limit is None else offset + limit
+        return len(entries), [e.user for e in entries[offset:end]]
+
+    async def run_syncer(self) -> None:
+        """Background loop: keep the directory fresh once it has been used."""
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            if not self._synced_at:
+                continue
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("User directory background sync failed")
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+user_directory = UserDirectory(
+    settings.keycloak_admin_url,
+    settings.keycloak_realm,
+    admin_realm=settings.keycloak_admin_realm,
+    client_id=settings.keycloak_admin_client_id,
+    username=settings.keycloak_admin_username,
+    password=settings.keycloak_admin_password,
+    sync_interval=settings.user_directory_sync_interval,
+    page_size=settings.user_directory_page_size,
+)
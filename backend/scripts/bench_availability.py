@@ -0,0 +1,70 @@
+"""Benchmark: availability engine on a 500-item, 300-ingredient menu.
+
+Run from backend/:  PYTHONPATH=. python scripts/bench_availability.py
+"""
+import random
+import time
+import uuid
+
+from app.models.inventory import InventoryItem, InventoryLevel
+from app.models.menu import MenuItem
+from app.services.stock import AvailabilityEngine
+
+N_ITEMS = 500
+N_INGREDIENTS = 300
+PER_ITEM = 8
+ROUNDS = 50
+
+
+def _fixture() -> tuple[list[MenuItem], list[InventoryItem]]:
+    rng = random.Random(42)
+    inventory = []
+    for i in range(N_INGREDIENTS):
+        inv = InventoryItem(id=uuid.uuid4(), name=f"ingredient {i}", unit="kg")
+        inv.levels = [
+            InventoryLevel(quantity=rng.uniform(0, 5), in_stock=rng.random() > 0.05)
+        ]
+        inventory.append(inv)
+    items = []
+    for i in range(N_ITEMS):
+        picks = rng.sample(range(N_INGREDIENTS), PER_ITEM)
+        ingredients = [
+            {
+                "name": f"ingredient {p}",
+                "quantity": round(rng.uniform(0.05, 0.5), 2),
+                "optional": rng.random() < 0.2,
+                "substitutes": [f"ingredient {rng.randrange(N_INGREDIENTS)}"],
+            }
+            for p in picks
+        ]
+        items.append(MenuItem(id=uuid.uuid4(), label=f"item {i}", ingredients=ingredients))
+    return items, inventory
+
+
+def main() -> None:
+    items, inventory = _fixture()
+
+    t0 = time.perf_counter()
+    for _ in range(ROUNDS):
+        engine = AvailabilityEngine(items, inventory)
+        engine.results()
+    full = (time.perf_counter() - t0) / ROUNDS
+
+    rng = random.Random(7)
+    t0 = time.perf_counter()
+    touched = 0
+    for _ in range(ROUNDS * 20):
+        inv = rng.choice(inventory)
+        touched += len(engine.update_level(inv.id, rng.uniform(0, 5), rng.random() > 0.1))
+    incremental = (time.perf_counter() - t0) / (ROUNDS * 20)
+
+    unavailable = sum(not r.available for r in engine.results())
+    print(f"menu: {N_ITEMS} items x {PER_ITEM} ingredients, {N_INGREDIENTS} inventory items")
+    print(f"full build + evaluate: {full * 1e3:8.2f} ms")
+    print(f"single level change:   {incremental * 1e3:8.3f} ms "
+          f"(avg {touched / (ROUNDS * 20):.1f} items recomputed)")
+    print(f"unavailable items:     {unavailable}")
+
+
+if __name__ == "__main__":
+    main()
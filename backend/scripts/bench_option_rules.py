@@ -0,0 +1,111 @@
+"""Benchmark: compiled option rules on a 200-item menu with 40 option groups.
+
+Run from backend/:  PYTHONPATH=. python scripts/bench_option_rules.py
+"""
+import random
+import time
+import uuid
+from decimal import Decimal
+
+from app.models.menu import MenuItem, MenuItemOptionGroup, OptionGroup, OptionItem
+from app.services.option_rules import OptionRules
+
+N_ITEMS = 200
+N_GROUPS = 40
+OPTIONS_PER_GROUP = 8
+GROUPS_PER_ITEM = 5
+ORDER_LINES = 50
+ROUNDS = 200
+
+
+def _fixture() -> tuple[list[MenuItem], list[OptionGroup], list[OptionItem]]:
+    """Items carry their links (option_group_links) the way selectinload returns them."""
+    rng = random.Random(42)
+    groups = []
+    options = []
+    for g in range(N_GROUPS):
+        min_select = rng.choice((0, 0, 1))
+        group = OptionGroup(
+            id=uuid.uuid4(),
+            name=f"group {g}",
+            min_select=min_select,
+            max_select=max(min_select, rng.choice((1, 2, 3))),
+            is_active=True,
+        )
+        groups.append(group)
+        for o in range(OPTIONS_PER_GROUP):
+            options.append(
+                OptionItem(
+                    id=uuid.uuid4(),
+                    group_id=group.id,
+                    name=f"option {g}.{o}",
+                    price_extra=Decimal(rng.choice(("0.00", "0.50", "1.00"))),
+                    is_active=rng.random() > 0.05,
+                )
+            )
+    items = [
+        MenuItem(
+            id=uuid.uuid4(),
+            label=f"item {i}",
+            option_group_links=[
+                MenuItemOptionGroup(option_group_id=g.id, position=p)
+                for p, g in enumerate(rng.sample(groups, GROUPS_PER_ITEM))
+            ],
+        )
+        for i in range(N_ITEMS)
+    ]
+    return items, groups, options
+
+
+def _orders(items, groups, options, n: int) -> list[list[tuple[uuid.UUID, list[uuid.UUID]]]]:
+    """Valid orders (active options, counts within limits); every 10th has one extra pick."""
+    rng = random.Random(7)
+    by_group: dict[uuid.UUID, list[uuid.UUID]] = {}
+    for o in options:
+        if o.is_active:
+            by_group.setdefault(o.group_id, []).append(o.id)
+    rules = {g.id: g for g in groups}
+    orders = []
+    for _ in range(n):
+        lines = []
+        for mi in rng.sample(items, ORDER_LINES):
+            chosen = []
+            for gid in mi.option_group_ids:
+                g = rules[gid]
+                k = min(rng.randint(g.min_select, g.max_select), len(by_group[g.id]))
+                chosen += rng.sample(by_group[g.id], k)
+            lines.append((mi.id, chosen))
+        if len(orders) % 10 == 0:
+            lines[0][1].append(rng.choice(options).id)
+        orders.append(lines)
+    return orders
+
+
+def main() -> None:
+    items, groups, options = _fixture()
+
+    t0 = time.perf_counter()
+    links = [(mi.id, gid) for mi in items for gid in mi.option_group_ids]
+    for _ in range(ROUNDS):
+        rules = OptionRules(links, groups, options)
+    compile_s = (time.perf_counter() - t0) / ROUNDS
+
+    orders = _orders(items, groups, options, ROUNDS)
+    t0 = time.perf_counter()
+    rejected = 0
+    for lines in orders:
+        _, errors = rules.check(lines)
+        rejected += bool(errors)
+    check_s = (time.perf_counter() - t0) / ROUNDS
+
+    selections = sum(len(ids) for lines in orders for _, ids in lines) / ROUNDS
+    print(f"menu: {N_ITEMS} items x {GROUPS_PER_ITEM} groups, "
+          f"{N_GROUPS} groups x {OPTIONS_PER_GROUP} options")
+    print(f"compile:              {compile_s * 1e3:8.2f} ms")
+    print(f"check order:          {check_s * 1e6:8.1f} us "
+          f"({ORDER_LINES} lines, avg {selections:.0f} options)")
+    print(f"orders rejected:      {rejected}/{ROUNDS} (one bad pick in every 10th)")
+
+
+if __name__ == "__main__":
+    main()
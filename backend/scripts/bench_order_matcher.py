@@ -0,0 +1,118 @@
+"""Benchmark: order matcher accuracy and latency on scripts/order_matcher_corpus.json.
+
+The corpus menu is padded with synthetic items (as in a large restaurant) so latency is
+measured on a realistic vocabulary; accuracy counts utterances whose every line (item,
+quantity, options) matches.
+
+Run from backend/:  PYTHONPATH=. python scripts/bench_order_matcher.py [-v]
+"""
+import json
+import sys
+import time
+import uuid
+from decimal import Decimal
+from pathlib import Path
+
+from app.models.menu import MenuCategory, MenuItem, MenuItemOptionGroup, OptionGroup, OptionItem
+from app.services.order_matcher import MenuMatcher
+
+CORPUS = Path(__file__).with_name("order_matcher_corpus.json")
+FILLER_ITEMS = 1000
+ROUNDS = 200
+
+
+def _menu(spec: dict) -> tuple[list, list, list, list]:
+    categories, groups, options, items = [], [], [], []
+    group_ids = {}
+    for name, g in spec["groups"].items():
+        group = OptionGroup(
+            id=uuid.uuid4(), name=name, min_select=g["min"], max_select=g["max"], is_active=True
+        )
+        groups.append(group)
+        group_ids[name] = group.id
+        for option_name in g["options"]:
+            options.append(
+                OptionItem(
+                    id=uuid.uuid4(), group_id=group.id, name=option_name,
+                    price_extra=Decimal("0.50"), is_active=True,
+                )
+            )
+    order = 0
+    for category_name, labels in spec["categories"].items():
+        category = MenuCategory(id=uuid.uuid4(), name=category_name)
+        categories.append(category)
+        for label in labels + [f"{category_name} spécial {n}" for n in range(FILLER_ITEMS // 6)]:
+            order += 1
+            items.append(
+                MenuItem(
+                    id=uuid.uuid4(), label=label, category_id=category.id, price=Decimal("5"),
+                    is_active=True, display_order=order,
+                    option_group_links=[
+                        MenuItemOptionGroup(option_group_id=group_ids[g], position=p)
+                        for p, g in enumerate(spec["item_groups"].get(label, []))
+                    ],
+                )
+            )
+    return categories, groups, options, items
+
+
+def _build(categories, groups, options, items) -> MenuMatcher:
+    matcher = MenuMatcher()
+    for c in categories:
+        matcher.set_category(c)
+    for g in groups:
+        matcher.set_group(g)
+    for o in options:
+        matcher.set_option(o)
+    for i in items:
+        matcher.set_item(i)
+    return matcher
+
+
+def main() -> None:
+    verbose = "-v" in sys.argv
+    corpus = json.loads(CORPUS.read_text())
+    categories, groups, options, items = _menu(corpus["menu"])
+
+    t0 = time.perf_counter()
+    matcher = _build(categories, groups, options, items)
+    build = time.perf_counter() - t0
+
+    correct_utterances = correct_lines = total_lines = 0
+    for case in corpus["cases"]:
+        result = matcher.match(case["text"])
+        got = [(l.label, l.quantity, sorted(l.options)) for l in result.lines]
+        want = [(label, qty, sorted(opts)) for label, qty, opts in case["lines"]]
+        total_lines += len(want)
+        correct_lines += sum(1 for g, w in zip(got, want) if g == w)
+        correct_utterances += got == want
+        if verbose and got != want:
+            print(f"MISS {case['text']!r}\n  got  {got}\n  want {want}\n  unmatched {result.unmatched}")
+
+    texts = [case["text"] for case in corpus["cases"]]
+    timings = []
+    for _ in range(ROUNDS):
+        for text in texts:
+            t0 = time.perf_counter()
+            matcher.match(text)
+            timings.append(time.perf_counter() - t0)
+    timings.sort()
+
+    t0 = time.perf_counter()
+    for item in items[:200]:
+        item.label = item.label + " maison"
+        matcher.set_item(item)
+    patch = (time.perf_counter() - t0) / 200
+
+    print(f"menu: {len(items)} items, {len(categories)} categories, "
+          f"{len(groups)} groups, {len(options)} options")
+    print(f"build:                {build * 1e3:8.2f} ms")
+    print(f"incremental item edit:{patch * 1e6:8.1f} us")
+    print(f"match p50:            {timings[len(timings) // 2] * 1e6:8.1f} us")
+    print(f"match p99:            {timings[int(len(timings) * 0.99)] * 1e6:8.1f} us")
+    print(f"accuracy:             {correct_utterances}/{len(texts)} utterances, "
+          f"{correct_lines}/{total_lines} lines")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Microbenchmark: per-request cost of _decode_token with and without the verified-token cache.
+
+Run from backend/:  PYTHONPATH=. python scripts/bench_token_cache.py
+"""
+import asyncio
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from app.core.config import settings
+from app.core.security import _decode_token, jwks_store, token_cache
+
+N = 2000
+
+
+def _make_token() -> tuple[str, dict]:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public = jwk.construct(
+        key.public_key().public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        ),
+        "RS256",
+    ).to_dict()
+    public["kid"] = "bench"
+    claims = {
+        "sub": "bench-user",
+        "iss": settings.keycloak_issuer,
+        "aud": settings.keycloak_audience,
+        "exp": int(time.time()) + 3600,
+        "realm_access": {"roles": ["staff"]},
+    }
+    token = jwt.encode(claims, pem.decode(), algorithm="RS256", headers={"kid": "bench"})
+    return token, {"keys": [public]}
+
+
+async def main() -> None:
+    token, jwks = _make_token()
+    jwks_store.load(jwks)
+
+    t0 = time.perf_counter()
+    for _ in range(N):
+        token_cache.clear()
+        await _decode_token(token)
+    cold = (time.perf_counter() - t0) / N
+
+    token_cache.clear()
+    await _decode_token(token)
+    t0 = time.perf_counter()
+    for _ in range(N):
+        await _decode_token(token)
+    warm = (time.perf_counter() - t0) / N
+
+    print(f"full verification: {cold * 1e6:8.1f} us/request")
+    print(f"cache hit:         {warm * 1e6:8.1f} us/request")
+    print(f"speedup:           {cold / warm:8.1f}x")
+    print(f"cache stats:       {token_cache.stats()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
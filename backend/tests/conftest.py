@@ -0,0 +1,9 @@
+import os
+
+# Set before the app is imported: query budgets raise in the test environment, and the
+# route tests run against a disposable database (skipped when TEST_DATABASE_URL is unset)
+os.environ["ENVIRONMENT"] = "test"
+os.environ["REDIS_ENABLED"] = "false"
+if os.environ.get("TEST_DATABASE_URL"):
+    os.environ["DATABASE_URL"] = os.environ["TEST_DATABASE_URL"]
+    os.environ.pop("DATABASE_READ_URL", None)
@@ -0,0 +1,204 @@
+"""JWKSKeyStore against a stub JWKS endpoint (httpx.MockTransport)."""
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+
+from app.core import security
+from app.core.config import settings
+from app.core.security import JWKSKeyStore, JWKSUnavailable
+
+JWKS_URI = "http://keycloak.test/realms/food/protocol/openid-connect/certs"
+
+
+def _signing_key(kid: str) -> tuple[bytes, dict]:
+    """(private PEM, public JWK) for a fresh RSA key."""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return private, {**jwk.construct(public, "RS256").to_dict(), "kid": kid, "use": "sig"}
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+class StubJWKS:
+    """Serves `keys`, or `status` when it is set; counts requests."""
+
+    def __init__(self, *keys: dict) -> None:
+        self.keys = list(keys)
+        self.status: int | None = None
+        self.calls = 0
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        assert str(request.url) == JWKS_URI
+        self.calls += 1
+        await asyncio.sleep(0.01)  # long enough for concurrent callers to pile up
+        if self.status is not None:
+            return httpx.Response(self.status)
+        return httpx.Response(200, json={"keys": self.keys})
+
+    def store(self, **kwargs) -> JWKSKeyStore:
+        client = httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+        return JWKSKeyStore(JWKS_URI, client=client, **kwargs)
+
+
+@pytest.fixture(scope="module")
+def keys() -> dict[str, tuple[bytes, dict]]:
+    return {kid: _signing_key(kid) for kid in ("k1", "k2")}
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(security, "time", clock)
+    return clock
+
+
+async def test_concurrent_misses_share_one_fetch(keys):
+    stub = StubJWKS(keys["k1"][1])
+    store = stub.store()
+
+    entries = await asyncio.gather(*(store.get_key("k1") for _ in range(20)))
+
+    assert stub.calls == 1
+    assert store.fetches == 1
+    assert all(entry is not None and entry[0] == "RS256" for entry in entries)
+    await store.aclose()
+
+
+async def test_fresh_keys_are_not_refetched(keys, clock):
+    stub = StubJWKS(keys["k1"][1])
+    store = stub.store(ttl=600)
+
+    await store.get_key("k1")
+    clock.now += 599
+    assert await store.get_key("k1") is not None
+    assert stub.calls == 1
+
+    clock.now += 1
+    assert await store.get_key("k1") is not None
+    assert stub.calls == 2
+
+
+async def test_failed_refresh_keeps_cached_keys(keys, clock):
+    stub = StubJWKS(keys["k1"][1])
+    store = stub.store(ttl=600, min_refresh_interval=10)
+    await store.get_key("k1")
+
+    clock.now += 600
+    stub.status = 503
+    assert await store.get_key("k1") is not None
+    assert store.kids == ["k1"]
+    assert stub.calls == 2
+
+    # Retried after the minimum interval, not on every request
+    clock.now += 5
+    assert await store.get_key("k1") is not None
+    assert stub.calls == 2
+    clock.now += 5
+    stub.status = None
+    assert await store.get_key("k1") is not None
+    assert stub.calls == 3
+    assert store.expires_in == pytest.approx(600)
+
+
+async def test_cold_start_failure_is_rate_limited(keys, clock):
+    stub = StubJWKS(keys["k1"][1])
+    stub.status = 503
+    store = stub.store(min_refresh_interval=10)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await store.get_key("k1")
+    # Until the interval has passed, requests fail fast instead of hitting Keycloak,
+    # and still as "provider unavailable", not as an unknown key
+    with pytest.raises(JWKSUnavailable):
+        await store.get_key("k1")
+    assert stub.calls == 1
+
+    clock.now += 10
+    stub.status = None
+    assert await store.get_key("k1") is not None
+    assert stub.calls == 2
+
+
+async def test_token_during_cold_start_outage_is_503(keys, clock, monkeypatch):
+    stub = StubJWKS(keys["k1"][1])
+    stub.status = 503
+    monkeypatch.setattr(security, "jwks_store", stub.store(min_refresh_interval=10))
+    token = jwt.encode(
+        {"sub": "user-1"}, keys["k1"][0].decode(), algorithm="RS256", headers={"kid": "k1"}
+    )
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc:
+            await security._decode_token(token)
+        assert exc.value.status_code == 503
+    assert stub.calls == 1
+
+
+async def test_rotated_kid_triggers_one_refetch(keys, clock):
+    stub = StubJWKS(keys["k1"][1])
+    store = stub.store(ttl=600, min_refresh_interval=10)
+    await store.get_key("k1")
+    security.token_cache.set(b"old-token", ("k1", "payload"))
+
+    clock.now += 10
+    stub.keys = [keys["k2"][1]]
+    entry = await store.get_key("k2")
+
+    assert entry is not None
+    assert stub.calls == 2
+    assert store.kids == ["k2"]
+    # Tokens verified with the dropped key are no longer served from the cache
+    assert security.token_cache.get(b"old-token") is None
+
+
+async def test_unknown_kids_refetch_at_most_once_per_interval(keys, clock):
+    stub = StubJWKS(keys["k1"][1])
+    store = stub.store(ttl=600, min_refresh_interval=10)
+    await store.get_key("k1")
+
+    clock.now += 10
+    for i in range(50):
+        assert await store.get_key(f"forged-{i}") is None
+    assert stub.calls == 2
+
+
+async def test_token_signed_by_rotated_key_verifies(keys, clock, monkeypatch):
+    stub = StubJWKS(keys["k1"][1])
+    store = stub.store(min_refresh_interval=10)
+    monkeypatch.setattr(security, "jwks_store", store)
+    await store.get_key("k1")
+
+    clock.now += 10
+    stub.keys = [keys["k1"][1], keys["k2"][1]]
+    claims = {
+        "sub": "user-1",
+        "iss": settings.keycloak_issuer,
+        "aud": settings.keycloak_audience,
+        "exp": int(time.time()) + 300,
+        "realm_access": {"roles": ["staff"]},
+    }
+    token = jwt.encode(claims, keys["k2"][0].decode(), algorithm="RS256", headers={"kid": "k2"})
+
+    payload = await security._decode_token(token)
+
+    assert payload.sub == "user-1"
+    assert stub.calls == 2
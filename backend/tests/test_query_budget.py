@@ -0,0 +1,140 @@
+"""Query budgets of the routes that used to run a query per row or per check.
+
+Runs the app in-process (httpx.ASGITransport, so assert_query_budget sees its requests)
+against TEST_DATABASE_URL, a disposable PostgreSQL database migrated to head.
+"""
+import os
+from pathlib import Path
+from uuid import uuid4
+
+import httpx
+import pytest
+
+if not os.environ.get("TEST_DATABASE_URL"):
+    pytest.skip("TEST_DATABASE_URL is not set", allow_module_level=True)
+
+from alembic import command  # noqa: E402
+from alembic.config import Config  # noqa: E402
+
+from app.core.database import engine  # noqa: E402
+from app.core.security import CurrentUser, get_current_user  # noqa: E402
+from app.core.sql_stats import assert_query_budget  # noqa: E402
+from app.main import app  # noqa: E402
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+ADMIN = CurrentUser(sub="admin-1", preferred_username="admin", email=None, roles=["platform_admin"])
+STAFF = CurrentUser(sub="staff-1", preferred_username="staff", email=None, roles=["staff"])
+
+
+class Auth:
+    user = ADMIN
+
+
+@pytest.fixture(scope="session")
+def migrated() -> None:
+    config = Config(str(BACKEND / "alembic.ini"))
+    config.set_main_option("script_location", str(BACKEND / "alembic"))
+    command.upgrade(config, "head")
+
+
+@pytest.fixture
+def auth() -> Auth:
+    return Auth()
+
+
+@pytest.fixture
+async def client(migrated, auth):
+    app.dependency_overrides[get_current_user] = lambda: auth.user
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
+    # Pooled connections belong to this test's event loop
+    await engine.dispose()
+
+
+@pytest.fixture
+async def restaurant(client) -> str:
+    r = await client.post("/restaurants", json={"name": f"Budget {uuid4().hex[:12]}"})
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+async def _menu_item(client: httpx.AsyncClient, restaurant: str, label: str) -> str:
+    r = await client.post(
+        f"/restaurants/{restaurant}/menu/items", json={"label": label, "price": "8.50"}
+    )
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+def _order(item_ids: list[str]) -> dict:
+    return {"items": [{"menu_item_id": i, "quantity": 2} for i in item_ids]}
+
+
+def _counts(seen: list) -> list[int]:
+    return [stats.count for _, stats in seen]
+
+
+async def test_order_creation_does_not_query_per_line(client, restaurant):
+    items = [await _menu_item(client, restaurant, f"Plat {i}") for i in range(5)]
+    url = f"/restaurants/{restaurant}/orders"
+    # Compiles the option rules, cached until the menu changes
+    assert (await client.post(url, json=_order(items[:1]))).status_code == 201
+
+    with assert_query_budget(5) as seen:
+        one = await client.post(url, json=_order(items[:1]))
+        many = await client.post(url, json=_order(items * 4))
+
+    assert one.status_code == many.status_code == 201
+    assert len(many.json()["items"]) == 20
+    assert _counts(seen)[0] == _counts(seen)[1]
+
+
+async def test_member_reassignment_does_not_query_per_user(client, restaurant):
+    url = f"/restaurants/{restaurant}"
+    r = await client.patch(url, json={"staff_user_ids": ["s-0"], "manager_user_ids": ["m-0"]})
+    assert r.status_code == 200, r.text
+
+    with assert_query_budget(4) as seen:
+        few = await client.patch(url, json={"staff_user_ids": ["s-1"]})
+        many = await client.patch(
+            url,
+            json={
+                "staff_user_ids": [f"s-{i}" for i in range(2, 32)],
+                "manager_user_ids": [f"m-{i}" for i in range(1, 31)],
+            },
+        )
+
+    assert few.status_code == many.status_code == 200
+    assert _counts(seen)[0] == _counts(seen)[1]
+    managers = await client.get(f"{url}/managers")
+    assert sorted(managers.json()) == sorted(f"m-{i}" for i in range(1, 31))
+
+
+async def test_membership_check_adds_no_query(client, auth, restaurant):
+    url = f"/restaurants/{restaurant}/menu/categories"
+    r = await client.patch(f"/restaurants/{restaurant}", json={"staff_user_ids": [STAFF.sub]})
+    assert r.status_code == 200, r.text
+
+    with assert_query_budget(2) as seen:
+        assert (await client.get(url)).status_code == 200
+        auth.user = STAFF
+        # Cache miss: membership and restaurant in one query; then a cache hit
+        assert (await client.get(url)).status_code == 200
+        assert (await client.get(url)).status_code == 200
+
+    assert len(set(_counts(seen))) == 1
+
+
+async def test_removed_member_loses_access(client, auth, restaurant):
+    url = f"/restaurants/{restaurant}/menu/categories"
+    await client.patch(f"/restaurants/{restaurant}", json={"staff_user_ids": [STAFF.sub]})
+    auth.user = STAFF
+    assert (await client.get(url)).status_code == 200
+
+    auth.user = ADMIN
+    await client.patch(f"/restaurants/{restaurant}", json={"staff_user_ids": []})
+    auth.user = STAFF
+    assert (await client.get(url)).status_code == 403
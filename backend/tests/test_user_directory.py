@@ -0,0 +1,214 @@
+"""UserDirectory against a stub Keycloak admin API (httpx.MockTransport)."""
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import user_directory as user_directory_module
+from app.services.user_directory import UserDirectory
+
+REALM_PATH = "/admin/realms/food"
+TOKEN_PATH = "/realms/master/protocol/openid-connect/token"
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def _user(i: int) -> dict:
+    return {
+        "id": f"id-{i:02d}",
+        "username": f"user{i:02d}",
+        "email": f"user{i:02d}@example.com",
+        "firstName": "Chef" if i % 3 == 0 else "Serveur",
+        "enabled": True,
+    }
+
+
+class StubKeycloak:
+    """Admin API subset: token, /users, /roles and /roles/{role}/users, paged by first/max."""
+
+    def __init__(self, users: list[dict], roles: dict[str, list[str]]) -> None:
+        self.users = users
+        self.roles = roles
+        self.tokens = 0
+        self.gets: list[str] = []
+        self.status: int | None = None
+        self.revoked: set[str] = set()
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path == TOKEN_PATH:
+            assert request.method == "POST"
+            self.tokens += 1
+            return httpx.Response(
+                200, json={"access_token": f"token-{self.tokens}", "expires_in": 60}
+            )
+        assert path.startswith(REALM_PATH)
+        self.gets.append(path[len(REALM_PATH):])
+        await asyncio.sleep(0.01)  # long enough for concurrent callers to pile up
+        if request.headers["Authorization"].removeprefix("Bearer ") in self.revoked:
+            return httpx.Response(401)
+        if self.status is not None:
+            return httpx.Response(self.status)
+        rows = self._rows(path[len(REALM_PATH):])
+        if rows is None:
+            return httpx.Response(404)
+        first = int(request.url.params["first"])
+        size = int(request.url.params["max"])
+        return httpx.Response(200, json=rows[first:first + size])
+
+    def _rows(self, path: str) -> list[dict] | None:
+        if path == "/users":
+            return self.users
+        if path == "/roles":
+            return [{"name": name} for name in self.roles]
+        name = path.removeprefix("/roles/").removesuffix("/users")
+        if name not in self.roles:
+            return None
+        return [u for u in self.users if u["id"] in self.roles[name]]
+
+    def directory(self, **kwargs) -> UserDirectory:
+        client = httpx.AsyncClient(
+            base_url="http://keycloak.test", transport=httpx.MockTransport(self.handler)
+        )
+        return UserDirectory("http://keycloak.test", "food", client=client, **kwargs)
+
+
+@pytest.fixture
+def stub() -> StubKeycloak:
+    users = [_user(i) for i in reversed(range(5))]
+    return StubKeycloak(users, {"manager": ["id-01", "id-03"], "staff": []})
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(user_directory_module, "time", clock)
+    return clock
+
+
+async def test_pages_users_once_with_one_token(stub):
+    directory = stub.directory(page_size=2)
+
+    total, users = await directory.list_users()
+    again = await directory.list_users()
+
+    assert total == 5
+    assert [u.username for u in users] == [f"user{i:02d}" for i in range(5)]
+    assert again == (total, users)
+    assert stub.gets == ["/users"] * 3
+    assert stub.tokens == 1
+
+
+async def test_search_offset_and_limit(stub):
+    directory = stub.directory()
+
+    total, users = await directory.list_users(search="CHEF", offset=1, limit=1)
+
+    assert total == 2
+    assert [u.username for u in users] == ["user03"]
+
+
+async def test_role_members_use_the_role_endpoint(stub):
+    directory = stub.directory(page_size=1)
+
+    total, users = await directory.list_users(role="manager")
+
+    assert total == 2
+    assert [u.id for u in users] == ["id-01", "id-03"]
+    assert stub.gets.count("/roles") == 3
+    assert stub.gets.count("/roles/manager/users") == 3
+    assert "/users" not in stub.gets
+
+
+async def test_unknown_roles_are_not_fetched_or_cached(stub):
+    directory = stub.directory()
+
+    for i in range(20):
+        assert await directory.list_users(role=f"nope-{i}") == (0, [])
+
+    assert stub.gets == ["/roles"]
+    assert set(directory._synced_at) == {"roles"}
+
+
+async def test_role_deleted_since_the_role_list_was_synced(stub):
+    directory = stub.directory()
+    await directory.list_users(role="staff")
+    del stub.roles["staff"]
+    directory._synced_at.pop("role:staff")
+
+    assert await directory.list_users(role="staff") == (0, [])
+    assert "role:staff" not in directory._synced_at
+    assert "staff" not in directory._roles
+
+
+async def test_concurrent_reads_share_one_sync(stub):
+    directory = stub.directory()
+
+    results = await asyncio.gather(*(directory.list_users() for _ in range(10)))
+
+    assert all(total == 5 for total, _ in results)
+    assert stub.gets == ["/users"]
+    assert stub.tokens == 1
+
+
+async def test_stale_directory_is_resynced(stub, clock):
+    directory = stub.directory(sync_interval=60)
+    await directory.list_users()
+
+    stub.users = stub.users[:2]
+    clock.now += 59
+    assert (await directory.list_users())[0] == 5
+    clock.now += 1
+    assert (await directory.list_users())[0] == 2
+    assert stub.gets == ["/users"] * 2
+
+
+async def test_failed_resync_serves_cached_users(stub, clock):
+    directory = stub.directory(sync_interval=60)
+    await directory.list_users(role="manager")
+
+    clock.now += 60
+    stub.status = 503
+    total, users = await directory.list_users(role="manager")
+
+    assert total == 2
+    assert [u.id for u in users] == ["id-01", "id-03"]
+
+
+async def test_first_sync_failure_is_raised(stub):
+    stub.status = 503
+    directory = stub.directory()
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await directory.list_users()
+    assert directory._synced_at == {}
+
+
+async def test_token_is_renewed_before_it_expires(stub, clock):
+    directory = stub.directory(sync_interval=3600)
+    await directory.list_users()
+
+    # expires_in=60 minus the refresh margin
+    clock.now += 44
+    await directory.sync()
+    assert stub.tokens == 1
+    clock.now += 1
+    await directory.sync()
+    assert stub.tokens == 2
+
+
+async def test_revoked_token_logs_in_again_once(stub):
+    directory = stub.directory()
+    await directory.list_users()
+    stub.revoked.add("token-1")
+
+    await directory.sync()
+
+    assert stub.tokens == 2
+    assert stub.gets == ["/users"] * 3
@@ -11,9 +11,25 @@ import {
   DialogHeader,
   DialogTitle,
 } from "@/components/ui/dialog";
-import { menu, orders, type MenuItem } from "@/lib/api";
+import {
+  menu,
+  optionGroups,
+  orders,
+  type MenuItem,
+  type Order,
+  type OptionGroupWithItems,
+} from "@/lib/api";
 
-type Line = { menu_item_id: string; label: string; price: string; quantity: number };
+// One line per menu item + option selection
+type Line = {
+  key: string;
+  menu_item_id: string;
+  label: string;
+  price: string;
+  quantity: number;
+  option_ids: string[];
+  option_names: string[];
+};
 
 export function CreateOrderDialog({
   restaurantId,
@@ -24,49 +40,120 @@ export function CreateOrderDialog({
   restaurantId: string;
   open: boolean;
   onOpenChange: (open: boolean) => void;
-  onSuccess: () => void;
+  onSuccess: (order: Order) => void;
 }) {
   const [items, setItems] = useState<MenuItem[]>([]);
+  const [groups, setGroups] = useState<Record<string, OptionGroupWithItems>>({});
   const [lines, setLines] = useState<Line[]>([]);
+  // Item whose options are being chosen, and the chosen option ids per group
+  const [picking, setPicking] = useState<MenuItem | null>(null);
+  const [picked, setPicked] = useState<Record<string, string[]>>({});
   const [loading, setLoading] = useState(false);
   const [submitLoading, setSubmitLoading] = useState(false);
   const [error, setError] = useState("");
+  // Same key for resubmits of an unchanged order, so a retry cannot create a duplicate
+  const [idempotencyKey, setIdempotencyKey] = useState("");
+
+  useEffect(() => {
+    setIdempotencyKey(crypto.randomUUID());
+  }, [open, lines]);
 
   useEffect(() => {
     if (!open) return;
     setError("");
     setLines([]);
+    setPicking(null);
     (async () => {
       setLoading(true);
-      const res = await menu.list(restaurantId);
+      const [itemsRes, groupsRes] = await Promise.all([
+        menu.list(restaurantId),
+        optionGroups.list(restaurantId),
+      ]);
       setLoading(false);
-      if (res.data) setItems(res.data.filter((i) => i.is_active));
+      if (itemsRes.data) setItems(itemsRes.data.filter((i) => i.is_active));
+      if (groupsRes.data) {
+        setGroups(Object.fromEntries(groupsRes.data.map((g) => [g.id, g])));
+      }
     })();
   }, [open, restaurantId]);
 
-  function add(line: Line) {
-    const i = lines.findIndex((l) => l.menu_item_id === line.menu_item_id);
+  /** Active groups offered by the item, with their active options. */
+  function groupsOf(m: MenuItem): OptionGroupWithItems[] {
+    return (m.option_group_ids ?? [])
+      .map((id) => groups[id])
+      .filter((g) => g && g.is_active)
+      .map((g) => ({ ...g, options: g.options.filter((o) => o.is_active) }))
+      .filter((g) => g.options.length > 0);
+  }
+
+  function add(m: MenuItem, optionIds: string[] = []) {
+    const names = groupsOf(m)
+      .flatMap((g) => g.options)
+      .filter((o) => optionIds.includes(o.id))
+      .map((o) => o.name);
+    const key = [m.id, ...[...optionIds].sort()].join(":");
+    const i = lines.findIndex((l) => l.key === key);
     if (i >= 0) {
       const next = [...lines];
-      next[i].quantity += 1;
+      next[i] = { ...next[i], quantity: next[i].quantity + 1 };
       setLines(next);
     } else {
-      setLines([...lines, { ...line, quantity: 1 }]);
+      setLines([
+        ...lines,
+        {
+          key,
+          menu_item_id: m.id,
+          label: m.label,
+          price: m.price,
+          quantity: 1,
+          option_ids: optionIds,
+          option_names: names,
+        },
+      ]);
     }
   }
 
-  function sub(menuItemId: string) {
-    const i = lines.findIndex((l) => l.menu_item_id === menuItemId);
+  function sub(key: string) {
+    const i = lines.findIndex((l) => l.key === key);
     if (i < 0) return;
     const next = [...lines];
     if (next[i].quantity <= 1) {
       next.splice(i, 1);
     } else {
-      next[i].quantity -= 1;
+      next[i] = { ...next[i], quantity: next[i].quantity - 1 };
     }
     setLines(next);
   }
 
+  function startPicking(m: MenuItem) {
+    if (groupsOf(m).length === 0) {
+      add(m);
+      return;
+    }
+    setPicking(m);
+    setPicked({});
+  }
+
+  function toggleOption(group: OptionGroupWithItems, optionId: string) {
+    const current = picked[group.id] ?? [];
+    let next: string[];
+    if (current.includes(optionId)) {
+      next = current.filter((id) => id !== optionId);
+    } else if (group.max_select === 1) {
+      next = [optionId];
+    } else if (current.length < group.max_select) {
+      next = [...current, optionId];
+    } else {
+      return;
+    }
+    setPicked({ ...picked, [group.id]: next });
+  }
+
+  const pickingGroups = picking ? groupsOf(picking) : [];
+  const pickingComplete = pickingGroups.every(
+    (g) => (picked[g.id]?.length ?? 0) >= g.min_select
+  );
+
   async function handleSubmit(e: React.FormEvent) {
     e.preventDefault();
     if (lines.length === 0) {
@@ -75,19 +162,24 @@ export function CreateOrderDialog({
     }
     setError("");
     setSubmitLoading(true);
-    const res = await orders.create(restaurantId, {
-      items: lines.map((l) => ({
-        menu_item_id: l.menu_item_id,
-        quantity: l.quantity,
-      })),
-    });
+    const res = await orders.create(
+      restaurantId,
+      {
+        items: lines.map((l) => ({
+          menu_item_id: l.menu_item_id,
+          quantity: l.quantity,
+          ...(l.option_ids.length > 0 ? { option_ids: l.option_ids } : {}),
+        })),
+      },
+      idempotencyKey
+    );
     setSubmitLoading(false);
-    if (res.error) {
-      setError(res.error.detail || res.error.error || "Erreur");
+    if (res.error || !res.data) {
+      setError(res.error?.detail || res.error?.error || "Erreur");
       return;
     }
     onOpenChange(false);
-    onSuccess();
+    onSuccess(res.data);
   }
 
   return (
@@ -96,7 +188,7 @@ export function CreateOrderDialog({
         <DialogHeader>
           <DialogTitle>Nouvelle commande</DialogTitle>
           <DialogDescription>
-            Choisis les articles et les quantités.
+            Choisis les articles, leurs suppléments et les quantités.
           </DialogDescription>
         </DialogHeader>
         <form onSubmit={handleSubmit} className="space-y-4">
@@ -112,8 +204,10 @@ export function CreateOrderDialog({
           ) : (
             <div className="space-y-2">
               {items.map((m) => {
-                const line = lines.find((l) => l.menu_item_id === m.id);
-                const q = line?.quantity ?? 0;
+                const hasOptions = groupsOf(m).length > 0;
+                const q = lines
+                  .filter((l) => l.menu_item_id === m.id)
+                  .reduce((a, l) => a + l.quantity, 0);
                 return (
                   <div
                     key={m.id}
@@ -131,7 +225,8 @@ export function CreateOrderDialog({
                         variant="outline"
                         size="icon"
                         onClick={() => sub(m.id)}
-                        disabled={q === 0}
+                        disabled={q === 0 || hasOptions}
+                        title={hasOptions ? "Retirer depuis la liste des lignes" : undefined}
                       >
                         <Minus className="h-4 w-4" />
                       </Button>
@@ -142,14 +237,7 @@ export function CreateOrderDialog({
                         type="button"
                         variant="outline"
                         size="icon"
-                        onClick={() =>
-                          add({
-                            menu_item_id: m.id,
-                            label: m.label,
-                            price: m.price,
-                            quantity: 1,
-                          })
-                        }
+                        onClick={() => startPicking(m)}
                       >
                         <Plus className="h-4 w-4" />
                       </Button>
@@ -159,6 +247,90 @@ export function CreateOrderDialog({
               })}
             </div>
           )}
+          {picking && (
+            <div className="space-y-3 rounded-xl border-2 border-terracotta/40 bg-white px-4 py-3">
+              <p className="font-medium">Suppléments : {picking.label}</p>
+              {pickingGroups.map((g) => {
+                const chosen = picked[g.id] ?? [];
+                return (
+                  <div key={g.id} className="space-y-1">
+                    <p className="text-sm font-medium">
+                      {g.name}{" "}
+                      <span className="text-muted">
+                        ({g.min_select > 0 ? `min ${g.min_select}, ` : ""}max {g.max_select})
+                      </span>
+                    </p>
+                    {g.options.map((o) => (
+                      <label key={o.id} className="flex items-center gap-2">
+                        <input
+                          type={g.max_select === 1 ? "radio" : "checkbox"}
+                          name={`group-${g.id}`}
+                          checked={chosen.includes(o.id)}
+                          onChange={() => toggleOption(g, o.id)}
+                          className="h-4 w-4 rounded border-sand text-terracotta"
+                        />
+                        <span className="text-sm">
+                          {o.name}
+                          {parseFloat(o.price_extra) > 0 &&
+                            ` (+${parseFloat(o.price_extra).toFixed(2)} €)`}
+                        </span>
+                      </label>
+                    ))}
+                  </div>
+                );
+              })}
+              <div className="flex justify-end gap-2">
+                <Button type="button" variant="secondary" onClick={() => setPicking(null)}>
+                  Annuler
+                </Button>
+                <Button
+                  type="button"
+                  disabled={!pickingComplete}
+                  onClick={() => {
+                    add(picking, Object.values(picked).flat());
+                    setPicking(null);
+                  }}
+                >
+                  Ajouter
+                </Button>
+              </div>
+            </div>
+          )}
+          {lines.some((l) => l.option_ids.length > 0) && (
+            <div className="space-y-2">
+              {lines.map((l) => (
+                <div
+                  key={l.key}
+                  className="flex items-center justify-between rounded-xl border-2 border-sand bg-white px-4 py-2 text-sm"
+                >
+                  <div>
+                    <span className="font-medium">
+                      {l.quantity} × {l.label}
+                    </span>
+                    {l.option_names.length > 0 && (
+                      <span className="ml-2 text-muted">{l.option_names.join(", ")}</span>
+                    )}
+                  </div>
+                  <div className="flex items-center gap-2">
+                    <Button type="button" variant="outline" size="icon" onClick={() => sub(l.key)}>
+                      <Minus className="h-4 w-4" />
+                    </Button>
+                    <Button
+                      type="button"
+                      variant="outline"
+                      size="icon"
+                      onClick={() => {
+                        const m = items.find((i) => i.id === l.menu_item_id);
+                        if (m) add(m, l.option_ids);
+                      }}
+                    >
+                      <Plus className="h-4 w-4" />
+                    </Button>
+                  </div>
+                </div>
+              ))}
+            </div>
+          )}
           {lines.length > 0 && (
             <p className="text-sm text-muted">
               Total : {lines.length} ligne(s),{" "}
@@ -40,7 +40,7 @@ export function OrderStatusDialog({
   order: Order;
   open: boolean;
   onOpenChange: (open: boolean) => void;
-  onSuccess: () => void;
+  onSuccess: (order: Order) => void;
 }) {
   const [next, setNext] = useState("");
   const [loading, setLoading] = useState(false);
@@ -56,13 +56,13 @@ export function OrderStatusDialog({
       status: next,
     });
     setLoading(false);
-    if (res.error) {
-      setError(res.error.detail || res.error.error || "Erreur");
+    if (res.error || !res.data) {
+      setError(res.error?.detail || res.error?.error || "Erreur");
       return;
     }
     setNext("");
     onOpenChange(false);
-    onSuccess();
+    onSuccess(res.data);
   }
 
   return (
@@ -82,11 +82,13 @@ export function OrderStatusDialog({
           <ul className="space-y-1 text-sm">
             {order.items.map((i) => (
               <li key={i.id}>
-                {i.quantity}× article {i.menu_item_id.slice(0, 8)} —{" "}
-                {parseFloat(i.unit_price).toFixed(2)} €
+                {i.quantity}× article {i.menu_item_id.slice(0, 8)}
+                {i.options?.length ? ` (${i.options.map((o) => o.name).join(", ")})` : ""} —{" "}
+                {parseFloat(i.line_total).toFixed(2)} €
               </li>
             ))}
           </ul>
+          <div className="text-sm font-medium">Total : {parseFloat(order.total).toFixed(2)} €</div>
           {error && (
             <div className="rounded-xl border-2 border-red-200 bg-red-50 px-4 py-3 text-sm text-red-800">
               {error}
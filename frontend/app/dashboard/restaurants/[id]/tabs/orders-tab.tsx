@@ -42,6 +42,37 @@ export function OrdersTab({ restaurantId }: { restaurantId: string }) {
     fetchList();
   }, [restaurantId]);
 
+  // Live updates instead of re-fetching the whole list after each change
+  useEffect(() => {
+    const controller = new AbortController();
+    orders.stream(
+      restaurantId,
+      (event) => {
+        if (event.type === "order.created") {
+          const created = event.data;
+          setList((prev) =>
+            prev.some((o) => o.id === created.id) ? prev : [created, ...prev]
+          );
+        } else if (event.type === "order.status_changed") {
+          const { id, status, updated_at } = event.data;
+          setList((prev) =>
+            prev.map((o) => (o.id === id ? { ...o, status, updated_at } : o))
+          );
+        } else if (event.type === "orders.status_changed") {
+          const { status, orders: changed } = event.data;
+          const byId = new Map(changed.map((c) => [c.id, c.updated_at]));
+          setList((prev) =>
+            prev.map((o) =>
+              byId.has(o.id) ? { ...o, status, updated_at: byId.get(o.id)! } : o
+            )
+          );
+        }
+      },
+      controller.signal
+    );
+    return () => controller.abort();
+  }, [restaurantId]);
+
   return (
     <>
       <Card>
@@ -102,7 +133,12 @@ export function OrdersTab({ restaurantId }: { restaurantId: string }) {
         restaurantId={restaurantId}
         open={createOpen}
         onOpenChange={setCreateOpen}
-        onSuccess={fetchList}
+        onSuccess={(created) =>
+          // Also shown when the live stream is down; the stream's copy is then skipped
+          setList((prev) =>
+            prev.some((o) => o.id === created.id) ? prev : [created, ...prev]
+          )
+        }
       />
       {statusOrder && (
         <OrderStatusDialog
@@ -110,7 +146,9 @@ export function OrdersTab({ restaurantId }: { restaurantId: string }) {
           order={statusOrder}
           open={!!statusOrder}
           onOpenChange={(open) => !open && setStatusOrder(null)}
-          onSuccess={fetchList}
+          onSuccess={(updated) =>
+            setList((prev) => prev.map((o) => (o.id === updated.id ? updated : o)))
+          }
         />
       )}
     </>
@@ -1,6 +1,6 @@
 import { API_URL } from "./utils";
 
-export type ApiError = { detail?: string; error?: string };
+export type ApiError = { detail?: string; error?: string; errors?: { message: string }[] };
 
 async function getToken(): Promise<string | null> {
   if (typeof window === "undefined") return null;
@@ -31,7 +31,21 @@ export async function api<T>(
   }
 
   if (!r.ok) {
-    const err = data as ApiError;
+    const err = data as ApiError | null;
+    // Structured details ({ message, errors }) are flattened into a readable string
+    const detail = err?.detail as unknown;
+    if (detail && typeof detail === "object" && "message" in detail) {
+      const { message, errors } = detail as { message: string; errors?: { message: string }[] };
+      err!.errors = errors;
+      err!.detail = [message, ...(errors ?? []).map((e) => e.message)].join(" — ");
+    } else if (Array.isArray(detail)) {
+      // Request validation (422): [{ loc: ["body", "items", 0, ...], msg }]
+      const errors = (detail as { loc?: (string | number)[]; msg: string }[]).map((e) => ({
+        message: [...(e.loc ?? []).filter((p) => p !== "body"), e.msg].join(" : "),
+      }));
+      err!.errors = errors;
+      err!.detail = errors.map((e) => e.message).join(" — ");
+    }
     return {
       error: err ?? { detail: "Request failed" },
       status: r.status,
@@ -117,6 +131,19 @@ export const menu = {
     const params = categoryId ? `?category_id=${categoryId}` : "";
     return api<MenuItem[]>(`/restaurants/${restaurantId}/menu/items${params}`);
   },
+  search: (
+    restaurantId: string,
+    params: { q?: string; tags?: string[]; offset?: number; limit?: number }
+  ) => {
+    const qs = new URLSearchParams();
+    if (params.q) qs.set("q", params.q);
+    for (const tag of params.tags ?? []) qs.append("tags", tag);
+    if (params.offset) qs.set("offset", String(params.offset));
+    if (params.limit) qs.set("limit", String(params.limit));
+    return api<(MenuItem & { rank: number })[]>(
+      `/restaurants/${restaurantId}/menu/items/search?${qs}`
+    );
+  },
   get: (restaurantId: string, itemId: string) =>
     api<MenuItem>(`/restaurants/${restaurantId}/menu/items/${itemId}`),
   create: (restaurantId: string, body: MenuItemCreate) =>
@@ -164,10 +191,12 @@ export const orders = {
   },
   get: (restaurantId: string, orderId: string) =>
     api<Order>(`/restaurants/${restaurantId}/orders/${orderId}`),
-  create: (restaurantId: string, body: OrderCreate) =>
+  /** Pass the same idempotencyKey when retrying a submission so it cannot create a duplicate. */
+  create: (restaurantId: string, body: OrderCreate, idempotencyKey?: string) =>
     api<Order>(`/restaurants/${restaurantId}/orders`, {
       method: "POST",
       body: JSON.stringify(body),
+      headers: idempotencyKey ? { "Idempotency-Key": idempotencyKey } : undefined,
     }),
   updateStatus: (
     restaurantId: string,
@@ -178,6 +207,62 @@ export const orders = {
       `/restaurants/${restaurantId}/orders/${orderId}/status`,
       { method: "PATCH", body: JSON.stringify(body) }
     ),
+  /** Move many orders to one status; with atomic, any failure rejects the whole batch (409). */
+  updateStatusBulk: (
+    restaurantId: string,
+    body: { order_ids: string[]; status: string; atomic?: boolean }
+  ) =>
+    api<{ status: string; results: OrderStatusOutcome[] }>(
+      `/restaurants/${restaurantId}/orders/status`,
+      { method: "PATCH", body: JSON.stringify(body) }
+    ),
+  /** Live order events (SSE over fetch, so the bearer token can be sent). Reconnects with Last-Event-ID until aborted. */
+  stream: async (
+    restaurantId: string,
+    onEvent: (event: OrderEvent) => void,
+    signal: AbortSignal
+  ) => {
+    let lastEventId: string | null = null;
+    while (!signal.aborted) {
+      try {
+        const token = await getToken();
+        const headers: Record<string, string> = { Accept: "text/event-stream" };
+        if (token) headers["Authorization"] = `Bearer ${token}`;
+        if (lastEventId) headers["Last-Event-ID"] = lastEventId;
+        const r = await fetch(`${API_URL}/restaurants/${restaurantId}/orders/events`, {
+          headers,
+          signal,
+        });
+        if (!r.ok || !r.body) throw new Error(`stream failed: ${r.status}`);
+        const reader = r.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = "";
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += value;
+          let sep: number;
+          while ((sep = buffer.indexOf("\n\n")) >= 0) {
+            const frame = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            let id: string | null = null;
+            let type = "message";
+            let data = "";
+            for (const line of frame.split("\n")) {
+              if (line.startsWith("id: ")) id = line.slice(4);
+              else if (line.startsWith("event: ")) type = line.slice(7);
+              else if (line.startsWith("data: ")) data += line.slice(6);
+            }
+            if (!data) continue;
+            if (id) lastEventId = id;
+            onEvent({ id, type, data: JSON.parse(data) } as OrderEvent);
+          }
+        }
+      } catch {
+        if (signal.aborted) return;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+    }
+  },
 };
 
 // Types (match backend schemas)
@@ -347,6 +432,9 @@ export interface Order {
   id: string;
   restaurant_id: string;
   status: string;
+  total: string;
+  created_at: string;
+  updated_at: string;
   items: OrderItem[];
 }
 
@@ -355,11 +443,35 @@ export interface OrderItem {
   menu_item_id: string;
   quantity: number;
   unit_price: string;
-  options?: unknown;
+  line_total: string;
+  options?: { id: string; group_id: string; name: string; price_extra: string }[] | null;
+}
+
+export type OrderEvent =
+  | { id: string | null; type: "order.created"; data: Order }
+  | {
+      id: string | null;
+      type: "order.status_changed";
+      data: { id: string; status: string; previous_status: string; updated_at: string };
+    }
+  | {
+      id: string | null;
+      type: "orders.status_changed";
+      data: {
+        status: string;
+        orders: { id: string; previous_status: string; updated_at: string }[];
+      };
+    };
+
+export interface OrderStatusOutcome {
+  id: string;
+  outcome: "updated" | "not_found" | "invalid_transition";
+  previous_status?: string | null;
+  updated_at?: string | null;
 }
 
 export interface OrderCreate {
-  items: { menu_item_id: string; quantity: number; options?: unknown }[];
+  items: { menu_item_id: string; quantity: number; option_ids?: string[] }[];
 }
 
 export interface KeycloakUser {